@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Parser and endpoint micro-benchmarks for the Dokemon API
+
+Times every parser in src/utils/parsers.py and the list/info routes (through
+the Flask test client, with run_docker_command stubbed to return synthetic
+output and the result cache and read coalescing off) at several row counts,
+and reports throughput, allocated blocks and peak traced memory.
+
+Usage:
+    python benchmarks/run_benchmarks.py                     # run and print
+    python benchmarks/run_benchmarks.py --sizes 10,1000     # smaller run
+    python benchmarks/run_benchmarks.py --save              # write the baseline
+    python benchmarks/run_benchmarks.py --compare           # fail on regressions
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic
+from utils import parsers
+
+DEFAULT_SIZES = [10, 1000, 10000, 100000]
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+
+PARSER_CASES = [
+    ("parse_container_list", "containers", "json"),
+    ("parse_container_list", "containers", "table"),
+    ("parse_image_list", "images", "json"),
+    ("parse_image_list", "images", "table"),
+    ("parse_network_list", "networks", "json"),
+    ("parse_network_list", "networks", "table"),
+    ("parse_volume_list", "volumes", "json"),
+    ("parse_volume_list", "volumes", "table"),
+    ("parse_docker_info", "info", "text"),
+]
+
+# (path, synthetic resource, response key that must hold one row per synthetic row)
+ROUTE_CASES = [
+    ("/api/v1/containers?all=true", "containers", "containers"),
+    ("/api/v1/images", "images", "images"),
+    ("/api/v1/networks", "networks", "networks"),
+    ("/api/v1/volumes", "volumes", "volumes"),
+    ("/api/v1/system/info", "info", None),
+    ("/api/v1/system/summary", "info", None),
+]
+
+# Which synthetic output a stubbed docker command should return
+COMMAND_RESOURCES = [
+    ("docker ps", "containers"),
+    ("docker images", "images"),
+    ("docker network ls", "networks"),
+    ("docker volume ls", "volumes"),
+    ("docker info", "info"),
+]
+
+def measure(func, min_time=0.2, max_repeats=50):
+    """Time func() and trace its memory; returns (best seconds, allocated blocks, peak bytes)"""
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_repeats and (not timings or time.perf_counter() - started < min_time):
+        gc.collect()
+        t0 = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - t0)
+
+    # Separate pass for memory: tracemalloc slows everything down
+    gc.collect()
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    result = func()
+    blocks = sys.getallocatedblocks() - blocks_before
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return min(timings), max(blocks, 0), peak
+
+def bench_parsers(sizes, results):
+    for name, resource, fmt in PARSER_CASES:
+        parser = getattr(parsers, name)
+        for size in sizes:
+            output = synthetic.GENERATORS[resource](size, fmt=fmt)
+            seconds, blocks, peak = measure(lambda: parser(output))
+            results[f"parser:{name}:{fmt}:{size}"] = _record(size, seconds, blocks, peak)
+            _print_row(f"{name} [{fmt}]", size, results[f"parser:{name}:{fmt}:{size}"])
+
+def bench_routes(sizes, results):
+    # Import the app from a scratch directory: create_app() initialises data/dokemon.db
+    os.chdir(tempfile.mkdtemp(prefix='dokemon-bench-'))
+    from app import create_app
+    from utils import docker_backend
+
+    app = create_app()
+    app.logger.disabled = True
+    # Every call has to parse: cached or coalesced results would only time the cache lookup
+    app.config.update(CACHE_ENABLED=False, COALESCE_ENABLED=False)
+    client = app.test_client()
+    outputs = {}
+
+    def fake_run_docker_command(command, keep_output=False):
+        text = ' '.join(command) if isinstance(command, list) else command
+        for prefix, resource in COMMAND_RESOURCES:
+            if text.startswith(prefix):
+                return {"success": True, "output": outputs[resource]}, 200
+        return {"success": True, "output": ""}, 200
+
+    docker_backend.run_docker_command = fake_run_docker_command
+
+    for path, resource, key in ROUTE_CASES:
+        for size in sizes:
+            outputs[resource] = synthetic.GENERATORS[resource](size, fmt='text' if resource == 'info' else 'json')
+
+            def call():
+                response = client.get(path)
+                assert response.status_code == 200, response.get_data(as_text=True)[:200]
+                if key:
+                    rows = len(response.get_json()[key])
+                    assert rows == size, f"GET {path} returned {rows} rows instead of {size}"
+                return response
+
+            seconds, blocks, peak = measure(call, max_repeats=20)
+            results[f"route:GET {path}:{size}"] = _record(size, seconds, blocks, peak)
+            _print_row(f"GET {path}", size, results[f"route:GET {path}:{size}"])
+
+def _record(size, seconds, blocks, peak):
+    return {
+        "rows": size,
+        "seconds": round(seconds, 6),
+        "rows_per_sec": round(size / seconds, 1) if seconds else None,
+        "allocated_blocks": blocks,
+        "peak_kib": round(peak / 1024, 1)
+    }
+
+def _print_row(label, size, record):
+    print(f"{label:<45} {size:>7} rows  {record['seconds'] * 1000:>10.3f} ms  "
+          f"{record['rows_per_sec'] or 0:>12.0f} rows/s  {record['allocated_blocks']:>9} blocks  "
+          f"{record['peak_kib']:>10.1f} KiB peak")
+
+def compare(results, baseline_path, threshold):
+    """Print timing ratios against the baseline; returns the number of regressions"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    regressions = 0
+    print(f"\nComparison against {baseline_path} (threshold {threshold:.2f}x)")
+    for key, record in sorted(results.items()):
+        if key not in baseline or not baseline[key]["seconds"]:
+            continue
+        ratio = record["seconds"] / baseline[key]["seconds"]
+        marker = ""
+        if ratio > threshold:
+            marker = "  REGRESSION"
+            regressions += 1
+        print(f"{key:<70} {ratio:>6.2f}x{marker}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Dokemon API parser and endpoint benchmarks")
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated row counts (default: %(default)s)")
+    parser.add_argument('--only', choices=['parsers', 'routes'], help="Run only one group")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="Write the results to the baseline file")
+    parser.add_argument('--compare', action='store_true', help="Compare with the baseline; exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Slowdown ratio counted as a regression")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    baseline_path = os.path.abspath(args.baseline)
+    results = {}
+
+    if args.only != 'routes':
+        bench_parsers(sizes, results)
+    if args.only != 'parsers':
+        bench_routes(sizes, results)
+
+    regressions = 0
+    if args.compare and os.path.exists(baseline_path):
+        regressions = compare(results, baseline_path, args.threshold)
+
+    if args.save:
+        with open(baseline_path, 'w') as f:
+            json.dump({
+                "created": datetime.now().isoformat(timespec='seconds'),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline written to {baseline_path}")
+
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Synthetic docker CLI outputs for the Dokemon API benchmarks
+"""
+
+import json
+import random
+
+STATUSES = ["Up 2 hours", "Up 3 days (healthy)", "Exited (0) 5 minutes ago", "Created", "Up 1 minute (Paused)"]
+IMAGES = ["nginx:latest", "redis:7-alpine", "postgres:16", "ghcr.io/acme/api:1.4.2", "busybox"]
+
+def _hex_id(rng, length=64):
+    return ''.join(rng.choice('0123456789abcdef') for _ in range(length))
+
+def _table(header, rows):
+    # Pad columns the way the CLI's tabwriter does (3 spaces between columns)
+    widths = [max(len(header[i]), *(len(row[i]) for row in rows)) if rows else len(header[i]) for i in range(len(header))]
+    lines = ['   '.join(cell.ljust(widths[i]) for i, cell in enumerate(header)).rstrip()]
+    for row in rows:
+        lines.append('   '.join(cell.ljust(widths[i]) for i, cell in enumerate(row)).rstrip())
+    return '\n'.join(lines)
+
+def containers(count, fmt='json', seed=1):
+    """`docker ps -a` output with `count` containers"""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        status = rng.choice(STATUSES)
+        items.append({
+            "ID": _hex_id(rng), "Image": rng.choice(IMAGES), "Command": "\"docker-entrypoint.sh server --port 8080\"",
+            "CreatedAt": "2024-05-01 10:00:00 +0000 UTC", "RunningFor": "2 hours ago", "Status": status,
+            "State": "running" if status.startswith("Up") else "exited",
+            "Ports": "0.0.0.0:%d->80/tcp, :::%d->80/tcp" % (8000 + i % 1000, 8000 + i % 1000) if i % 3 == 0 else "",
+            "Names": "app_%d" % i, "Labels": "com.docker.compose.project=stack%d,tier=web" % (i % 20),
+            "Mounts": "data_%d" % i, "Networks": "stack%d_default" % (i % 20), "Size": "0B", "LocalVolumes": "1"
+        })
+    if fmt == 'json':
+        return '\n'.join(json.dumps(item) for item in items)
+    header = ["CONTAINER ID", "IMAGE", "COMMAND", "CREATED", "STATUS", "PORTS", "NAMES"]
+    return _table(header, [[c["ID"][:12], c["Image"], "\"docker-entrypoint.s…\"", c["RunningFor"], c["Status"], c["Ports"], c["Names"]] for c in items])
+
+def images(count, fmt='json', seed=2):
+    """`docker images` output with `count` images"""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        items.append({
+            "ID": "sha256:" + _hex_id(rng), "Repository": "registry.example.com/team%d/service%d" % (i % 50, i),
+            "Tag": "v1.%d.%d" % (i % 10, i % 7), "Digest": "sha256:" + _hex_id(rng),
+            "CreatedAt": "2024-05-01 10:00:00 +0000 UTC", "CreatedSince": "3 weeks ago", "Size": "%dMB" % rng.randint(5, 900),
+            "Containers": "N/A", "SharedSize": "N/A", "UniqueSize": "N/A", "VirtualSize": "N/A"
+        })
+    if fmt == 'json':
+        return '\n'.join(json.dumps(item) for item in items)
+    header = ["REPOSITORY", "TAG", "IMAGE ID", "CREATED", "SIZE"]
+    return _table(header, [[m["Repository"], m["Tag"], m["ID"][7:19], m["CreatedSince"], m["Size"]] for m in items])
+
+def networks(count, fmt='json', seed=3):
+    """`docker network ls` output with `count` networks"""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        items.append({
+            "ID": _hex_id(rng), "Name": "stack%d_default" % i, "Driver": "bridge" if i % 5 else "overlay",
+            "Scope": "local" if i % 5 else "swarm", "IPv6": "false", "Internal": "false",
+            "Labels": "com.docker.compose.network=default", "CreatedAt": "2024-05-01 10:00:00.123456789 +0000 UTC"
+        })
+    if fmt == 'json':
+        return '\n'.join(json.dumps(item) for item in items)
+    header = ["NETWORK ID", "NAME", "DRIVER", "SCOPE"]
+    return _table(header, [[n["ID"][:12], n["Name"], n["Driver"], n["Scope"]] for n in items])
+
+def volumes(count, fmt='json', seed=4):
+    """`docker volume ls` output with `count` volumes"""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        name = _hex_id(rng) if i % 2 else "stack%d_data" % i
+        items.append({
+            "Driver": "local", "Name": name, "Scope": "local", "Labels": "", "Links": "N/A",
+            "Mountpoint": "/var/lib/docker/volumes/%s/_data" % name, "Size": "N/A"
+        })
+    if fmt == 'json':
+        return '\n'.join(json.dumps(item) for item in items)
+    header = ["DRIVER", "VOLUME NAME"]
+    return _table(header, [[v["Driver"], v["Name"]] for v in items])
+
+def docker_info(count, fmt='text', seed=5):
+    """`docker info` output; `count` scales the number of plugin and label lines"""
+    lines = [
+        "Client:", " Version:    24.0.5", " Context:    default", " Debug Mode: false", " Plugins:",
+        "  buildx: Docker Buildx (Docker Inc.)", "  compose: Docker Compose (Docker Inc.)", "",
+        "Server:", " Containers: %d" % count, "  Running: %d" % (count // 2), "  Paused: 0",
+        "  Stopped: %d" % (count - count // 2), " Images: %d" % count, " Server Version: 24.0.5",
+        " Storage Driver: overlay2", "  Backing Filesystem: extfs", " Logging Driver: json-file",
+        " Cgroup Driver: systemd", " Cgroup Version: 2", " Plugins:", "  Volume: local",
+        "  Network: bridge host ipvlan macvlan null overlay", " Security Options:", "  seccomp",
+        "   Profile: builtin", "  cgroupns", " Kernel Version: 6.1.0-13-amd64", " Operating System: Debian GNU/Linux 12",
+        " OSType: linux", " Architecture: x86_64", " CPUs: 16", " Total Memory: 62.51GiB", " Name: host-01",
+        " Docker Root Dir: /var/lib/docker", " Debug Mode: false", " Labels:"
+    ]
+    lines += ["  node.label.%d=value%d" % (i, i) for i in range(count)]
+    return '\n'.join(lines)
+
+GENERATORS = {
+    "containers": containers,
+    "images": images,
+    "networks": networks,
+    "volumes": volumes,
+    "info": docker_info
+}
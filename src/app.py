@@ -13,6 +13,7 @@ from routes.networks import networks_bp
 from routes.volumes import volumes_bp
 from routes.system import system_bp
 from routes.users import users_bp
+from routes.jobs import jobs_bp
 
 def create_app():
     """Application factory pattern"""
@@ -30,6 +31,14 @@ def create_app():
     from routes.users import init_users
     init_users()
     
+    # Invalidate cached read results on writes and label cached responses
+    from utils.result_cache import init_result_cache
+    init_result_cache(app)
+    
+    # Report time spent queueing for Docker process slots
+    from utils.admission import init_admission
+    init_admission(app)
+    
     # Register all blueprints
     app.register_blueprint(health_bp)           # Health check and API docs at /health and /
     app.register_blueprint(containers_bp)       # Container management at /api/v1/containers
@@ -38,6 +47,7 @@ def create_app():
     app.register_blueprint(volumes_bp)          # Volume management at /api/v1/volumes
     app.register_blueprint(system_bp)           # System operations at /api/v1/system
     app.register_blueprint(users_bp)            # User management at /api/v1/users
+    app.register_blueprint(jobs_bp)             # Background jobs at /api/v1/jobs
     
     return app
 
@@ -57,6 +67,7 @@ def print_startup_info(app):
     print("   - Volumes: /api/v1/volumes/*")
     print("   - System: /api/v1/system/*")
     print("   - Users: /api/v1/users/*")
+    print("   - Jobs: /api/v1/jobs/*")
     print("\n[AUTH] Authentication:")
     print("   - Create User: POST /api/v1/users")
     print("   - Login: POST /api/v1/users/login")
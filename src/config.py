@@ -18,6 +18,66 @@ class Config:
     # Docker configuration
     DOCKER_TIMEOUT = int(os.environ.get('DOKEMON_DOCKER_TIMEOUT', 30))
     DOCKER_VERSION_TIMEOUT = int(os.environ.get('DOKEMON_VERSION_TIMEOUT', 5))
+    DOCKER_HEALTH_INTERVAL = int(os.environ.get('DOKEMON_HEALTH_INTERVAL', 15))  # 0 disables the background monitor
+    DOCKER_HEALTH_TTL = int(os.environ.get('DOKEMON_HEALTH_TTL', 30))
+    BREAKER_THRESHOLD = int(os.environ.get('DOKEMON_BREAKER_THRESHOLD', 5))  # consecutive daemon failures that open the circuit (0 disables)
+    BREAKER_RESET_TIMEOUT = int(os.environ.get('DOKEMON_BREAKER_RESET_TIMEOUT', 30))  # seconds the circuit stays open before one probe
+    # Concurrent docker processes and Engine API requests per class, across all workers (flock'ed slot files)
+    ADMISSION_ENABLED = os.environ.get('DOKEMON_ADMISSION', 'true').lower() == 'true'
+    ADMISSION_LIMITS = os.environ.get('DOKEMON_ADMISSION_LIMITS', 'read=16,mutate=8,long=8')  # 0 leaves a class unlimited
+    ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('DOKEMON_ADMISSION_QUEUE_TIMEOUT', 10))  # seconds a request waits for a slot
+    ADMISSION_DIR = os.environ.get('DOKEMON_ADMISSION_DIR')  # slot files (default: $TMPDIR/dokemon-admission)
+    
+    # Docker backend: 'cli' shells out to the docker CLI, 'api' talks to the Engine API
+    # over DOCKER_HOST (default unix:///var/run/docker.sock) and falls back to the CLI
+    DOCKER_BACKEND = os.environ.get('DOKEMON_DOCKER_BACKEND', 'cli').lower()
+    DOCKER_HOST = os.environ.get('DOCKER_HOST')
+    DOCKER_API_POOL_SIZE = int(os.environ.get('DOKEMON_API_POOL_SIZE', 4))  # keep-alive connections per worker
+    
+    # Event-driven inventory serving the list endpoints from memory
+    INVENTORY_ENABLED = os.environ.get('DOKEMON_INVENTORY', 'false').lower() == 'true'
+    INVENTORY_RESYNC_INTERVAL = int(os.environ.get('DOKEMON_INVENTORY_RESYNC', 300))
+    INVENTORY_MAX_LAG = int(os.environ.get('DOKEMON_INVENTORY_MAX_LAG', 30))
+    
+    # Streamed responses (log follow, pull progress); each stream holds one gunicorn thread
+    STREAM_HEARTBEAT = int(os.environ.get('DOKEMON_STREAM_HEARTBEAT', 15))
+    STREAM_BUFFER = int(os.environ.get('DOKEMON_STREAM_BUFFER', 256))  # events queued per stream
+    LOG_MAX_FOLLOWERS = int(os.environ.get('DOKEMON_LOG_MAX_FOLLOWERS', 4))  # per worker, keep below GUNICORN_THREADS
+    LOG_MAX_LINE = int(os.environ.get('DOKEMON_LOG_MAX_LINE', 16384))  # longer lines are split
+    PULL_MAX_STREAMS = int(os.environ.get('DOKEMON_PULL_MAX_STREAMS', 4))  # per worker
+    PULL_PROGRESS_INTERVAL = float(os.environ.get('DOKEMON_PULL_PROGRESS_INTERVAL', 0.25))  # seconds between byte updates per layer
+    PULL_BATCH_CONCURRENCY = int(os.environ.get('DOKEMON_PULL_BATCH_CONCURRENCY', 4))  # max parallel pulls per batch request
+    BUILD_MAX_STREAMS = int(os.environ.get('DOKEMON_BUILD_MAX_STREAMS', 2))  # concurrent context-upload builds per worker
+    BULK_MAX_PARALLELISM = int(os.environ.get('DOKEMON_BULK_MAX_PARALLELISM', 8))  # max actions in flight per bulk request
+    BULK_MAX_STREAMS = int(os.environ.get('DOKEMON_BULK_MAX_STREAMS', 2))  # concurrent streamed bulk requests per worker
+    INSPECT_BATCH_SIZE = int(os.environ.get('DOKEMON_INSPECT_BATCH_SIZE', 100))  # container IDs per `docker inspect` call
+    INSPECT_MAX_IDS = int(os.environ.get('DOKEMON_INSPECT_MAX_IDS', 1000))  # IDs accepted per batch inspect request
+    INSPECT_CACHE_SIZE = int(os.environ.get('DOKEMON_INSPECT_CACHE_SIZE', 512))  # cached inspect documents per worker (0 disables)
+    STATS_CONCURRENCY = int(os.environ.get('DOKEMON_STATS_CONCURRENCY', 16))  # concurrent Engine API stats samples per request
+    STATS_BACKEND = os.environ.get('DOKEMON_STATS_BACKEND', 'docker').lower()  # 'docker' or 'cgroup' (read /sys/fs/cgroup directly)
+    CGROUP_ROOT = os.environ.get('DOKEMON_CGROUP_ROOT', '/sys/fs/cgroup')  # host cgroup v2 hierarchy as mounted in this container
+    CGROUP_RATE_INTERVAL = float(os.environ.get('DOKEMON_CGROUP_RATE_INTERVAL', 1.0))  # minimum seconds between samples a rate is computed from
+    # Metrics history: a per-worker sampler keeping fixed-size ring buffers per container
+    HISTORY_ENABLED = os.environ.get('DOKEMON_HISTORY', 'false').lower() == 'true'
+    HISTORY_RESOLUTIONS = os.environ.get('DOKEMON_HISTORY_RESOLUTIONS', '1s:10m,1m:24h')  # step:retention pairs
+    HISTORY_MAX_CONTAINERS = int(os.environ.get('DOKEMON_HISTORY_MAX_CONTAINERS', 100))
+    HISTORY_DIR = os.environ.get('DOKEMON_HISTORY_DIR')  # sampler lock and shared sample (default: $TMPDIR/dokemon-history)
+    # Identical concurrent read commands share one execution
+    COALESCE_ENABLED = os.environ.get('DOKEMON_COALESCE', 'true').lower() == 'true'
+    COALESCE_ACROSS_WORKERS = os.environ.get('DOKEMON_COALESCE_ACROSS_WORKERS', 'false').lower() == 'true'
+    COALESCE_DIR = os.environ.get('DOKEMON_COALESCE_DIR')  # lock/result files for cross-worker coalescing (default: $TMPDIR/dokemon-coalesce)
+    # Short-lived per-worker cache of read results, invalidated by this worker's writes
+    CACHE_ENABLED = os.environ.get('DOKEMON_CACHE', 'true').lower() == 'true'
+    CACHE_TTLS = os.environ.get('DOKEMON_CACHE_TTLS', 'containers=1,images=30,networks=10,volumes=10,info=10')  # seconds per resource (0 disables)
+    CACHE_STALE_WHILE_REVALIDATE = float(os.environ.get('DOKEMON_CACHE_STALE_WHILE_REVALIDATE', 10))  # seconds past the TTL served while refreshing
+    CACHE_MAX_STALE = float(os.environ.get('DOKEMON_CACHE_MAX_STALE', 300))  # seconds past the TTL served when the daemon fails (0 disables)
+    
+    # Background jobs (POST /api/v1/jobs, or ?async=true on pull/build/run/prune)
+    JOB_WORKERS = int(os.environ.get('DOKEMON_JOB_WORKERS', 4))  # job threads per gunicorn worker
+    JOB_LIMITS = os.environ.get('DOKEMON_JOB_LIMITS', 'pull=4,build=2,run=4,prune=1')  # running jobs per kind, all workers
+    JOB_TIMEOUT = int(os.environ.get('DOKEMON_JOB_TIMEOUT', 3600))
+    JOB_RETENTION = int(os.environ.get('DOKEMON_JOB_RETENTION', 3600))  # seconds finished jobs are kept
+    JOB_OUTPUT_LINES = int(os.environ.get('DOKEMON_JOB_OUTPUT_LINES', 200))
     
     # Security configuration
     ALLOWED_HOSTS = os.environ.get('DOKEMON_ALLOWED_HOSTS', '*').split(',')
@@ -12,14 +12,21 @@ backlog = 2048
 
 # Worker processes
 workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
-worker_class = "sync"
+# Threaded workers: a streaming response (log follow) holds a thread, not a whole worker.
+# The worker timeout only covers the worker's heartbeat, so long streams are not killed.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
 
-# Restart workers after this many requests, to help prevent memory leaks
-max_requests = 1000
+# Restart workers after this many requests, to help prevent memory leaks. Off by
+# default: a recycled worker hands its background jobs back to the queue, and
+# pulls and builds then start over on another worker
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
 max_requests_jitter = 50
+# How long an exiting worker lets its running jobs finish before handing them back
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
 
 # Logging
 accesslog = "-"  # Log to stdout
@@ -44,3 +51,18 @@ limit_request_field_size = 8190
 
 # Performance
 preload_app = True  # Load application code before forking workers
+
+def post_worker_init(worker):
+    """Start per-worker background services (threads do not survive the fork)"""
+    from utils.inventory import start_inventory
+    from utils.jobs import start_jobs
+    from utils.metrics_history import start_history
+    start_inventory(worker.wsgi)
+    start_jobs(worker.wsgi)
+    start_history(worker.wsgi)
+
+def worker_exit(server, worker):
+    """Let the worker's background jobs finish, or requeue them, so they are not left marked as running"""
+    from utils.jobs import stop_jobs
+    # Leave a margin before the arbiter kills the worker at graceful_timeout
+    stop_jobs(grace=max(worker.cfg.graceful_timeout - 5, 0))
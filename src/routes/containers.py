@@ -1,81 +1,285 @@
 #!/usr/bin/env python3
 
-from flask import Blueprint, jsonify, request
-import json
+import time
+from flask import Blueprint, current_app, jsonify, request
 from utils.docker_utils import run_docker_command
-from utils.parsers import parse_container_list
+from utils import docker_backend
+from utils.listing import parse_container_query, paginate
+from utils.projection import project, requested_fields
+from utils.etag import conditional_jsonify, content_digest
+from utils.parsers import parse_duration, parse_time_param
+from utils.jobs import accepted_job_response, wants_async
+from utils.bulk import BULK_ACTIONS, CONTAINER_REF_PATTERN, resolve_targets, run_bulk
+from utils.cgroup_metrics import collect_stats
+from utils.streaming import StreamPump, get_stream_slots, stream_format, stream_response, wants_stream
 
 # Create blueprint for container management
 containers_bp = Blueprint('containers', __name__, url_prefix='/api/v1/containers')
 
 @containers_bp.route('', methods=['GET'])
 def list_containers():
-    """List all containers"""
+    """List containers with optional filters, sorting and cursor pagination"""
     show_all = request.args.get('all', 'false').lower() == 'true'
-    command = "docker ps -a" if show_all else "docker ps"
+    try:
+        query = parse_container_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    response, status = run_docker_command(command)
-    if status == 200:
-        containers = parse_container_list(response["output"])
-        return jsonify({"containers": containers})
+    # In the daemon's own order the cursor and limit are pushed down as well;
+    # one extra row tells us whether there is a next page
+    filters = dict(query.filters)
+    limit = None
+    if query.default_order and query.limit:
+        limit = query.limit + 1
+        if query.cursor:
+            filters['before'] = [query.cursor[1]]
+    
+    response, status = docker_backend.list_containers(show_all, filters, limit)
+    if status != 200 and 'before' in filters:
+        # The cursor's container is gone; page through the full list instead
+        limit = None
+        response, status = docker_backend.list_containers(show_all, query.filters)
+    if status != 200:
+        return jsonify(response), status
+    
+    presorted = limit is not None and response.get("source") == "daemon"
+    try:
+        containers, next_cursor = paginate(response["containers"], query, presorted)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    def build():
+        result = {"containers": project(containers, requested_fields())}
+        if query.paginated:
+            result["next_cursor"] = next_cursor
+        return result
+    
+    return conditional_jsonify(response.get("version"), build)
+
+@containers_bp.route('/bulk', methods=['POST'])
+def bulk_action():
+    """Start, stop, restart, kill, pause, unpause or remove many containers in parallel"""
+    data = request.get_json()
+    if not data or data.get('action') not in BULK_ACTIONS:
+        return jsonify({"error": f"action is required. Valid values: {', '.join(BULK_ACTIONS)}"}), 400
+    ids = data.get('ids')
+    selector = data.get('selector')
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, str) and CONTAINER_REF_PATTERN.fullmatch(i) for i in ids)):
+        return jsonify({"error": "ids must be a list of container IDs or names"}), 400
+    if not ids and not selector:
+        return jsonify({"error": "ids or selector is required"}), 400
+    
+    max_parallelism = current_app.config.get('BULK_MAX_PARALLELISM', 8)
+    try:
+        parallelism = min(int(data.get('parallelism', max_parallelism)), max_parallelism)
+        max_failures = int(data['max_failures']) if data.get('max_failures') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "parallelism and max_failures must be positive integers"}), 400
+    if parallelism < 1 or (max_failures is not None and max_failures < 1):
+        return jsonify({"error": "parallelism and max_failures must be positive integers"}), 400
+    
+    try:
+        targets, error = resolve_targets(ids, selector)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if error:
+        response, status = error
+        return jsonify(response), status
+    
+    action = data['action']
+    force = bool(data.get('force', False))
+    if wants_stream():
+        fmt = stream_format()
+        if fmt is None:
+            return jsonify({"error": "format must be 'ndjson' or 'sse'"}), 400
+        slots = get_stream_slots('bulk')
+        if not slots.acquire():
+            return jsonify({"error": "Too many concurrent bulk streams, try again later", "success": False}), 429
+        try:
+            pump = StreamPump([run_bulk(targets, action, parallelism, force, max_failures)],
+                              current_app.config.get('STREAM_BUFFER', 256))
+        except Exception:
+            slots.release()
+            raise
+        return stream_response(pump, fmt, current_app.config.get('STREAM_HEARTBEAT', 15), on_close=slots.release)
+    
+    started = time.monotonic()
+    by_id = {result["container_id"]: result for result in run_bulk(targets, action, parallelism, force, max_failures)}
+    results = [by_id[container_id] for container_id in targets]
+    summary = {"action": action, "targets": len(targets)}
+    for status in ('succeeded', 'failed', 'skipped'):
+        summary[status] = sum(1 for result in results if result["status"] == status)
+    summary["seconds"] = round(time.monotonic() - started, 3)
+    
+    return jsonify({"success": summary["failed"] == 0 and summary["skipped"] == 0, "results": results, "summary": summary})
+
+@containers_bp.route('/inspect', methods=['GET', 'POST'])
+def inspect_containers():
+    """Inspect many containers in one request (?ids=a,b,c or a JSON body {"ids": [...]})"""
+    if request.method == 'POST':
+        data = request.get_json()
+        ids = data.get('ids') if data else None
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            return jsonify({"error": "ids must be a list of container IDs or names"}), 400
     else:
+        ids = [i for value in request.args.getlist('ids') for i in value.split(',')]
+    ids = list(dict.fromkeys(i.strip() for i in ids if i.strip()))
+    if not ids:
+        return jsonify({"error": "ids is required"}), 400
+    max_ids = current_app.config.get('INSPECT_MAX_IDS', 1000)
+    if len(ids) > max_ids:
+        return jsonify({"error": f"At most {max_ids} ids per request"}), 400
+    
+    response, status = docker_backend.inspect_containers(ids, current_app.config.get('INSPECT_BATCH_SIZE', 100))
+    if status != 200:
+        return jsonify(response), status
+    
+    fields = requested_fields()
+    return conditional_jsonify(content_digest(response), lambda: {
+        "success": True,
+        "containers": {container_id: project(info, fields) for container_id, info in response["containers"].items()},
+        "errors": response["errors"]
+    })
+
+@containers_bp.route('/stats', methods=['GET'])
+def containers_stats():
+    """Numeric resource usage of all running containers, or of those matching id/name/image/label filters"""
+    try:
+        query = parse_container_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    container_ids = None
+    if query.filters:
+        response, status = docker_backend.list_containers(False, query.filters)
+        if status != 200:
+            return jsonify(response), status
+        container_ids = [container.get("id") or container.get("container_id") for container in response["containers"]]
+    
+    response, status = collect_stats(container_ids, current_app.config.get('STATS_CONCURRENCY', 16))
+    if status != 200:
+        return jsonify(response), status
+    return jsonify({"success": True, "stats": project(response["stats"], requested_fields()), "errors": response["errors"]})
+
+@containers_bp.route('/<container_id>/stats', methods=['GET'])
+def container_stats(container_id):
+    """Numeric resource usage of one container"""
+    response, status = collect_stats([container_id])
+    if status != 200:
         return jsonify(response), status
+    if not response["stats"]:
+        error = response["errors"].get(container_id, f"No such container: {container_id}")
+        return jsonify({"success": False, "error": error}), 400
+    return jsonify({"success": True, "stats": project(response["stats"][0], requested_fields())})
+
+@containers_bp.route('/<container_id>/history', methods=['GET'])
+def container_history(container_id):
+    """min/max/avg/percentiles of a container's recorded metrics over a window, optionally with points"""
+    from utils.metrics_history import HISTORY_METRICS, get_history
+    
+    history = get_history()
+    if history is None:
+        return jsonify({"error": "Metrics history is disabled (set DOKEMON_HISTORY=true)", "success": False}), 400
+    window = parse_duration(request.args.get('window', '10m'))
+    if not window or window <= 0:
+        return jsonify({"error": "window must be a duration like 90s, 10m or 1h30m"}), 400
+    metrics = [m.strip() for m in request.args.get('metrics', ','.join(HISTORY_METRICS)).split(',') if m.strip()]
+    invalid = set(metrics) - set(HISTORY_METRICS)
+    if invalid or not metrics:
+        return jsonify({"error": f"Invalid metrics: {', '.join(sorted(invalid))}. Valid values: {', '.join(HISTORY_METRICS)}"}), 400
+    max_points = None
+    if request.args.get('points', 'false').lower() == 'true':
+        try:
+            max_points = int(request.args.get('max_points', 300))
+        except ValueError:
+            max_points = 0
+        if max_points < 1:
+            return jsonify({"error": "max_points must be a positive integer"}), 400
+    
+    result = history.query(container_id, window, metrics, max_points)
+    if result is None:
+        return jsonify({"error": f"No history for container: {container_id}", "success": False}), 404
+    return jsonify({"success": True, "history": result})
 
 @containers_bp.route('/<container_id>/start', methods=['POST'])
 def start_container(container_id):
     """Start a container"""
-    command = f"docker start {container_id}"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.container_action(container_id, 'start')
     return jsonify(response), status
 
 @containers_bp.route('/<container_id>/stop', methods=['POST'])
 def stop_container(container_id):
     """Stop a container"""
-    command = f"docker stop {container_id}"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.container_action(container_id, 'stop')
     return jsonify(response), status
 
 @containers_bp.route('/<container_id>/restart', methods=['POST'])
 def restart_container(container_id):
     """Restart a container"""
-    command = f"docker restart {container_id}"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.container_action(container_id, 'restart')
     return jsonify(response), status
 
 @containers_bp.route('/<container_id>/remove', methods=['DELETE'])
 def remove_container(container_id):
     """Remove a container"""
     force = request.args.get('force', 'false').lower() == 'true'
-    command = f"docker rm {'--force' if force else ''} {container_id}"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.remove_container(container_id, force)
     return jsonify(response), status
 
 @containers_bp.route('/<container_id>/logs', methods=['GET'])
 def get_container_logs(container_id):
-    """Get container logs"""
+    """Get container logs, or stream them as NDJSON or Server-Sent Events"""
     follow = request.args.get('follow', 'false').lower() == 'true'
+    timestamps = request.args.get('timestamps', 'false').lower() == 'true'
     tail = request.args.get('tail', '100')
+    if tail != 'all' and not tail.isdigit():
+        return jsonify({"error": "tail must be a non-negative integer or 'all'"}), 400
+    try:
+        since = parse_time_param(request.args['since']) if request.args.get('since') else None
+        until = parse_time_param(request.args['until']) if request.args.get('until') else None
+    except ValueError as e:
+        return jsonify({"error": f"Invalid since/until: {e}"}), 400
     
-    if follow:
-        return jsonify({"error": "Follow mode not supported in REST API"}), 400
+    if not (follow or wants_stream()):
+        response, status = docker_backend.container_logs(container_id, tail, since, until, timestamps)
+        return jsonify(response), status
     
-    command = f"docker logs --tail {tail} {container_id}"
-    response, status = run_docker_command(command)
-    return jsonify(response), status
+    fmt = stream_format()
+    if fmt is None:
+        return jsonify({"error": "format must be 'ndjson' or 'sse'"}), 400
+    
+    slots = get_stream_slots('logs')
+    if not slots.acquire():
+        return jsonify({"error": "Too many concurrent log streams, try again later", "success": False}), 429
+    try:
+        # Fails fast on unknown containers and tells the Engine API reader whether frames are multiplexed
+        response, status = docker_backend.inspect_container(container_id)
+        if status != 200:
+            slots.release()
+            return jsonify(response), status
+        tty = bool(response["container_info"][0].get("Config", {}).get("Tty"))
+        
+        config = current_app.config
+        response, status = docker_backend.open_log_stream(container_id, follow, tail, since, until, timestamps, tty,
+                                                          config.get('LOG_MAX_LINE', 16384))
+        if status != 200:
+            slots.release()
+            return jsonify(response), status
+        pump = StreamPump(response["sources"], config.get('STREAM_BUFFER', 256), on_close=response["close"])
+    except Exception:
+        slots.release()
+        raise
+    return stream_response(pump, fmt, config.get('STREAM_HEARTBEAT', 15), on_close=slots.release)
 
 @containers_bp.route('/<container_id>/inspect', methods=['GET'])
 def inspect_container(container_id):
     """Inspect a container"""
-    command = f"docker inspect {container_id}"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.inspect_container(container_id)
     
     if status == 200:
-        try:
-            # Parse JSON output from docker inspect
-            inspect_data = json.loads(response["output"])
-            return jsonify({"container_info": inspect_data})
-        except json.JSONDecodeError:
-            return jsonify({"error": "Failed to parse container info"}), 500
+        return conditional_jsonify(response.get("version"), lambda: {
+            "container_info": project(response["container_info"], requested_fields())
+        })
     else:
         return jsonify(response), status
 
@@ -103,42 +307,12 @@ def run_container():
     if not data or 'image' not in data:
         return jsonify({"error": "Image name is required"}), 400
     
-    image = data['image']
-    name = data.get('name', '')
-    detached = data.get('detached', True)
-    ports = data.get('ports', [])
-    volumes = data.get('volumes', [])
-    environment = data.get('environment', [])
-    command_args = data.get('command', '')
-    
-    # Build docker run command
-    docker_cmd = "docker run"
-    
-    if detached:
-        docker_cmd += " -d"
-    
-    if name:
-        docker_cmd += f" --name {name}"
+    if wants_async():
+        return accepted_job_response('run', data)
     
-    # Add port mappings
-    for port in ports:
-        if ':' in port:
-            docker_cmd += f" -p {port}"
-        else:
-            docker_cmd += f" -p {port}:{port}"
-    
-    # Add volume mounts
-    for volume in volumes:
-        docker_cmd += f" -v {volume}"
-    
-    # Add environment variables
-    for env in environment:
-        docker_cmd += f" -e {env}"
-    
-    docker_cmd += f" {image}"
-    
-    if command_args:
-        docker_cmd += f" {command_args}"
-    
-    response, status = run_docker_command(docker_cmd)
+    try:
+        command = docker_backend.run_command(data)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid command: {e}"}), 400
+    response, status = run_docker_command(command)
     return jsonify(response), status
@@ -2,7 +2,9 @@
 # -*- coding: utf-8 -*-
 
 from flask import Blueprint, jsonify
-from utils.docker_utils import run_docker_command
+from utils.circuit_breaker import get_circuit_breaker
+from utils.daemon_health import get_daemon_health
+from utils.inventory import get_inventory
 
 # Create blueprint for health and system checks
 health_bp = Blueprint('health', __name__)
@@ -20,18 +22,32 @@ def health_check():
     except (FileNotFoundError, IOError):
         software_version = "missing version.txt warning"
     
-    response, status = run_docker_command("docker --version")
-    if status == 200:
+    # Report the cached daemon state; only probe if nothing has been checked yet
+    health = get_daemon_health()
+    daemon = health.snapshot()
+    if daemon["state"] == "unknown":
+        health.probe()
+        daemon = health.snapshot()
+    
+    # Optional components report alongside the daemon state
+    components = {"daemon": daemon, "circuit_breaker": get_circuit_breaker().snapshot()}
+    inventory = get_inventory()
+    if inventory is not None:
+        components["inventory"] = inventory.snapshot()
+    
+    if daemon["healthy"]:
         return jsonify({
             "status": "healthy", 
-            "docker_version": response["output"],
+            "docker_version": daemon["docker_version"],
+            **components,
             "software_name": "Dokémon NG",
             "software_version": software_version
         })
     else:
         return jsonify({
             "status": "unhealthy", 
-            "error": response.get("error"),
+            "error": daemon["error"],
+            **components,
             "software_name": "Dokémon NG",
             "software_version": software_version
         }), 500
@@ -52,22 +68,32 @@ def api_documentation():
     
     endpoints = {
         "health": "GET /health - Check Docker status",
+        "field_projection": "Add ?fields=a,b.c to any list or inspect endpoint to return only those (dotted) fields",
         "containers": {
-            "list": "GET /api/v1/containers?all=true - List containers",
+            "list": "GET /api/v1/containers?all=true&name=&image=&status=&label=&sort=-created_at&limit=50&cursor= - List containers (filtered, sorted, paginated)",
             "start": "POST /api/v1/containers/{id}/start - Start container",
             "stop": "POST /api/v1/containers/{id}/stop - Stop container", 
             "restart": "POST /api/v1/containers/{id}/restart - Restart container",
             "remove": "DELETE /api/v1/containers/{id}/remove?force=true - Remove container",
-            "logs": "GET /api/v1/containers/{id}/logs?tail=100 - Get container logs",
-            "inspect": "GET /api/v1/containers/{id}/inspect - Inspect container",
+            "inspect_many": "GET /api/v1/containers/inspect?ids=a,b,c&fields= (or POST {\"ids\": [...]}) - Inspect many containers, errors per ID",
+            "stats": "GET /api/v1/containers/stats?name=&label=&fields= - Numeric CPU, memory, network, block I/O and PID usage of running containers",
+            "container_stats": "GET /api/v1/containers/{id}/stats - Numeric resource usage of one container",
+            "history": "GET /api/v1/containers/{id}/history?window=1h&metrics=cpu_fraction,memory_bytes&points=true - Recorded metrics: min/max/avg/percentiles",
+            "bulk": "POST /api/v1/containers/bulk?stream=true - Apply an action to many containers by ids or label selector, in parallel",
+            "logs": "GET /api/v1/containers/{id}/logs?tail=100&since=10m&timestamps=true - Get container logs",
+            "logs_follow": "GET /api/v1/containers/{id}/logs?follow=true&format=ndjson|sse - Stream container logs",
+            "inspect": "GET /api/v1/containers/{id}/inspect?fields=State.Status,NetworkSettings.IPAddress - Inspect container",
             "exec": "POST /api/v1/containers/{id}/exec - Execute command in container",
-            "run": "POST /api/v1/containers/run - Run new container"
+            "run": "POST /api/v1/containers/run?async=true - Run new container (async returns a job)"
         },
         "images": {
             "list": "GET /api/v1/images - List images",
-            "pull": "POST /api/v1/images/pull - Pull image",
+            "pull": "POST /api/v1/images/pull?async=true - Pull image (async returns a job)",
+            "pull_stream": "POST /api/v1/images/pull?stream=true&format=ndjson|sse - Stream per-layer pull progress",
+            "pull_batch": "POST /api/v1/images/pull/batch {images: [...], policy: newer|missing|always, concurrency} - Pull many images in parallel",
             "remove": "DELETE /api/v1/images/{id}/remove?force=true - Remove image",
-            "build": "POST /api/v1/images/build - Build image"
+            "build": "POST /api/v1/images/build?async=true - Build image (async returns a job)",
+            "build_context": "POST /api/v1/images/build?tag=&dockerfile=&target=&build_arg=K=V&cache_from= (tar/gzip body) - Build from an uploaded context, streaming the log"
         },
         "networks": {
             "list": "GET /api/v1/networks - List networks",
@@ -82,8 +108,16 @@ def api_documentation():
         "system": {
             "info": "GET /api/v1/system/info - System information (detailed)",
             "summary": "GET /api/v1/system/summary - System summary (key stats)",
+            "metrics": "GET /api/v1/system/metrics - Backend, daemon health, circuit breaker, admission queues, inventory, result cache and read coalescing metrics (per worker)",
             "stats": "GET /api/v1/system/stats - Resource statistics",
-            "prune": "POST /api/v1/system/prune?force=true - Clean up unused objects"
+            "top": "GET /api/v1/system/top?by=cpu|memory|net|block&n=10 - Top resource consumers from the latest metrics sample",
+            "prune": "POST /api/v1/system/prune?force=true&async=true - Clean up unused objects"
+        },
+        "jobs": {
+            "create": "POST /api/v1/jobs {kind: pull|build|run|prune, params} - Queue a background job",
+            "list": "GET /api/v1/jobs?status=&kind=&limit=100 - List recent jobs",
+            "get": "GET /api/v1/jobs/{id} - Job status, progress and result",
+            "cancel": "POST /api/v1/jobs/{id}/cancel - Cancel a queued or running job"
         },
         "users": {
             "create": "POST /api/v1/users - Create new user",
@@ -120,6 +154,7 @@ def docker_debug():
     
     debug_info = {
         "platform": os.name,
+        "daemon_health": get_daemon_health().snapshot(),
         "tests": {}
     }
     
@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
 
-from flask import Blueprint, jsonify, request
+import time
+from flask import Blueprint, current_app, jsonify, request
 from utils.docker_utils import run_docker_command
-from utils.parsers import parse_image_list
+from utils import docker_backend
+from utils.projection import project, requested_fields
+from utils.etag import conditional_jsonify
+from utils.jobs import accepted_job_response, wants_async
+from utils.pulls import get_pull_registry, dedupe_images, pull_images, PULL_POLICIES
+from utils.streaming import StreamPump, get_stream_slots, stream_format, stream_response, wants_stream
 
 # Create blueprint for image management
 images_bp = Blueprint('images', __name__, url_prefix='/api/v1/images')
@@ -10,12 +16,12 @@ images_bp = Blueprint('images', __name__, url_prefix='/api/v1/images')
 @images_bp.route('', methods=['GET'])
 def list_images():
     """List all images"""
-    command = "docker images"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.list_images()
     
     if status == 200:
-        images = parse_image_list(response["output"])
-        return jsonify({"images": images})
+        return conditional_jsonify(response.get("version"), lambda: {
+            "images": project(response["images"], requested_fields())
+        })
     else:
         return jsonify(response), status
 
@@ -26,22 +32,99 @@ def pull_image():
     if not data or 'image' not in data:
         return jsonify({"error": "Image name is required"}), 400
     
-    image = data['image']
-    command = f"docker pull {image}"
-    response, status = run_docker_command(command)
+    if wants_async():
+        return accepted_job_response('pull', {"image": data['image']})
+    if wants_stream():
+        return stream_pull(data['image'])
+    
+    response, status = run_docker_command(docker_backend.pull_command(data['image']))
     return jsonify(response), status
 
+@images_bp.route('/pull/batch', methods=['POST'])
+def pull_images_batch():
+    """Pull several images in parallel, skipping duplicates and images already present"""
+    data = request.get_json()
+    images = data.get('images') if data else None
+    if not isinstance(images, list) or not images or not all(isinstance(image, str) and image.strip() for image in images):
+        return jsonify({"error": "images must be a non-empty list of image references"}), 400
+    policy = data.get('policy', 'newer')
+    if policy not in PULL_POLICIES:
+        return jsonify({"error": f"Invalid policy. Valid values: {', '.join(PULL_POLICIES)}"}), 400
+    
+    max_concurrency = current_app.config.get('PULL_BATCH_CONCURRENCY', 4)
+    try:
+        concurrency = min(int(data.get('concurrency', max_concurrency)), max_concurrency)
+    except (TypeError, ValueError):
+        return jsonify({"error": "concurrency must be a positive integer"}), 400
+    if concurrency < 1:
+        return jsonify({"error": "concurrency must be a positive integer"}), 400
+    
+    unique = dedupe_images(images)
+    if wants_stream():
+        fmt = stream_format()
+        if fmt is None:
+            return jsonify({"error": "format must be 'ndjson' or 'sse'"}), 400
+        slots = get_stream_slots('pulls')
+        if not slots.acquire():
+            return jsonify({"error": "Too many concurrent pull streams, try again later", "success": False}), 429
+        try:
+            pump = StreamPump([pull_images(unique, policy, concurrency)], current_app.config.get('STREAM_BUFFER', 256))
+        except Exception:
+            slots.release()
+            raise
+        return stream_response(pump, fmt, current_app.config.get('STREAM_HEARTBEAT', 15), on_close=slots.release)
+    
+    started = time.monotonic()
+    by_image = {result["image"]: result for result in pull_images(unique, policy, concurrency)}
+    results = [by_image[image] for image in unique]
+    summary = {"requested": len(images), "unique": len(unique)}
+    for status in ('pulled', 'up_to_date', 'skipped', 'failed'):
+        summary[status] = sum(1 for result in results if result["status"] == status)
+    summary["seconds"] = round(time.monotonic() - started, 3)
+    
+    return jsonify({"success": summary["failed"] == 0, "results": results, "summary": summary})
+
+def stream_pull(image):
+    """Stream per-layer pull progress, attaching to an in-flight pull of the same image"""
+    fmt = stream_format()
+    if fmt is None:
+        return jsonify({"error": "format must be 'ndjson' or 'sse'"}), 400
+    
+    slots = get_stream_slots('pulls')
+    if not slots.acquire():
+        return jsonify({"error": "Too many concurrent pull streams, try again later", "success": False}), 429
+    try:
+        subscription, error = get_pull_registry().attach(image)
+        if error:
+            slots.release()
+            response, status = error
+            return jsonify(response), status
+        config = current_app.config
+        pump = StreamPump([subscription], config.get('STREAM_BUFFER', 256), on_close=subscription.close)
+    except Exception:
+        slots.release()
+        raise
+    return stream_response(pump, fmt, config.get('STREAM_HEARTBEAT', 15), on_close=slots.release)
+
 @images_bp.route('/<image_id>/remove', methods=['DELETE'])
 def remove_image(image_id):
     """Remove an image"""
     force = request.args.get('force', 'false').lower() == 'true'
-    command = f"docker rmi {'--force' if force else ''} {image_id}"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.remove_image(image_id, force)
     return jsonify(response), status
 
+# Request content types treated as an uploaded build context (docker detects the compression)
+BUILD_CONTEXT_TYPES = {
+    'application/x-tar', 'application/tar', 'application/gzip', 'application/x-gzip',
+    'application/x-compressed-tar', 'application/octet-stream'
+}
+
 @images_bp.route('/build', methods=['POST'])
 def build_image():
-    """Build an image from Dockerfile"""
+    """Build an image from a Dockerfile on the server, or from an uploaded context"""
+    if request.mimetype in BUILD_CONTEXT_TYPES:
+        return build_from_context()
+    
     data = request.get_json()
     if not data or 'tag' not in data:
         return jsonify({"error": "Tag is required"}), 400
@@ -50,6 +133,49 @@ def build_image():
     path = data.get('path', '.')
     dockerfile = data.get('dockerfile', 'Dockerfile')
     
-    command = f"docker build -t {tag} -f {dockerfile} {path}"
-    response, status = run_docker_command(command)
+    if wants_async():
+        return accepted_job_response('build', {"tag": tag, "path": path, "dockerfile": dockerfile})
+    
+    response, status = run_docker_command(docker_backend.build_command(tag, path, dockerfile))
     return jsonify(response), status
+
+def build_from_context():
+    """Pipe a tar build context from the request body to the daemon and stream the build log"""
+    args = request.args
+    tags = args.getlist('tag') + args.getlist('t')
+    if not tags:
+        return jsonify({"error": "Tag is required"}), 400
+    build_args = {}
+    for item in args.getlist('build_arg'):
+        key, sep, value = item.partition('=')
+        if not key or not sep:
+            return jsonify({"error": f"build_arg must be KEY=VALUE: {item}"}), 400
+        build_args[key] = value
+    options = {
+        "tags": tags,
+        "dockerfile": args.get('dockerfile', 'Dockerfile'),
+        "target": args.get('target'),
+        "platform": args.get('platform'),
+        "build_args": build_args,
+        "cache_from": args.getlist('cache_from'),
+        "no_cache": args.get('no_cache', 'false').lower() == 'true',
+        "pull": args.get('pull', 'false').lower() == 'true'
+    }
+    
+    fmt = stream_format()
+    if fmt is None:
+        return jsonify({"error": "format must be 'ndjson' or 'sse'"}), 400
+    
+    slots = get_stream_slots('builds')
+    if not slots.acquire():
+        return jsonify({"error": "Too many concurrent builds, try again later", "success": False}), 429
+    try:
+        response, status = docker_backend.open_build_stream(request.stream, options)
+        if status != 200:
+            slots.release()
+            return jsonify(response), status
+        pump = StreamPump(response["sources"], current_app.config.get('STREAM_BUFFER', 256), on_close=response["close"])
+    except Exception:
+        slots.release()
+        raise
+    return stream_response(pump, fmt, current_app.config.get('STREAM_HEARTBEAT', 15), on_close=slots.release)
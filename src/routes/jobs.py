@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+from flask import Blueprint, jsonify, request
+from utils.jobs import get_job_manager, accepted_job_response, JOB_STATES
+
+# Create blueprint for background jobs
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/v1/jobs')
+
+@jobs_bp.route('', methods=['POST'])
+def create_job():
+    """Queue a background job (pull, build, run or prune)"""
+    data = request.get_json()
+    if not data or 'kind' not in data:
+        return jsonify({"error": "Job kind is required"}), 400
+    
+    return accepted_job_response(data['kind'], data.get('params', {}))
+
+@jobs_bp.route('', methods=['GET'])
+def list_jobs():
+    """List recent jobs, optionally filtered by status and kind"""
+    status = request.args.get('status')
+    if status and status not in JOB_STATES:
+        return jsonify({"error": f"Invalid status. Valid values: {', '.join(JOB_STATES)}"}), 400
+    try:
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    
+    jobs = get_job_manager().list(status, request.args.get('kind'), max(limit, 1))
+    return jsonify({"success": True, "jobs": jobs})
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get a job's status, progress and result"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job not found: {job_id}", "success": False}), 404
+    return jsonify({"success": True, "job": job})
+
+@jobs_bp.route('/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Job not found: {job_id}", "success": False}), 404
+    if job["status"] not in ('queued', 'running', 'cancelled'):
+        return jsonify({"error": f"Job already {job['status']}", "success": False, "job": job}), 409
+    return jsonify({"success": True, "job": job}), 202
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 
 from flask import Blueprint, jsonify, request
-from utils.docker_utils import run_docker_command
-from utils.parsers import parse_network_list
+from utils import docker_backend
+from utils.projection import project, requested_fields
+from utils.etag import conditional_jsonify
 
 # Create blueprint for network management
 networks_bp = Blueprint('networks', __name__, url_prefix='/api/v1/networks')
@@ -10,12 +11,12 @@ networks_bp = Blueprint('networks', __name__, url_prefix='/api/v1/networks')
 @networks_bp.route('', methods=['GET'])
 def list_networks():
     """List all networks"""
-    command = "docker network ls"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.list_networks()
     
     if status == 200:
-        networks = parse_network_list(response["output"])
-        return jsonify({"networks": networks})
+        return conditional_jsonify(response.get("version"), lambda: {
+            "networks": project(response["networks"], requested_fields())
+        })
     else:
         return jsonify(response), status
 
@@ -29,13 +30,11 @@ def create_network():
     name = data['name']
     driver = data.get('driver', 'bridge')
     
-    command = f"docker network create --driver {driver} {name}"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.create_network(name, driver)
     return jsonify(response), status
 
 @networks_bp.route('/<network_name>/remove', methods=['DELETE'])
 def remove_network(network_name):
     """Remove a network"""
-    command = f"docker network rm {network_name}"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.remove_network(network_name)
     return jsonify(response), status
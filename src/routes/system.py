@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
+import os
 from flask import Blueprint, jsonify, request
 from utils.docker_utils import run_docker_command
-from utils.parsers import parse_docker_info
+from utils import docker_backend
+from utils.etag import conditional_jsonify, content_digest
+from utils.jobs import accepted_job_response, wants_async
 
 # Create blueprint for system operations
 system_bp = Blueprint('system', __name__, url_prefix='/api/v1/system')
@@ -10,23 +13,13 @@ system_bp = Blueprint('system', __name__, url_prefix='/api/v1/system')
 @system_bp.route('/info', methods=['GET'])
 def system_info():
     """Get Docker system information"""
-    command = "docker info"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.system_info()
     
     if status == 200:
-        try:
-            # Parse the docker info output into structured data
-            parsed_info = parse_docker_info(response["output"])
-            return jsonify({
-                "success": True,
-                "system_info": parsed_info
-            })
-        except Exception as e:
-            # Fallback to raw output if parsing fails
-            return jsonify({
-                "success": False,
-                "error": f"Failed to parse system info: {str(e)}"
-            }), 500
+        return conditional_jsonify(response.get("version"), lambda: {
+            "success": True,
+            "system_info": response["system_info"]
+        })
     else:
         return jsonify(response), status
 
@@ -38,27 +31,112 @@ def system_stats():
     response, status = run_docker_command(command)
     return jsonify(response), status
 
+@system_bp.route('/top', methods=['GET'])
+def system_top():
+    """Containers using the most CPU, memory, network or block I/O, from the metrics sampler"""
+    from utils.metrics_history import TOP_FIELDS, get_history
+    
+    by = request.args.get('by', 'cpu')
+    if by not in TOP_FIELDS:
+        return jsonify({"error": f"Invalid by. Valid values: {', '.join(TOP_FIELDS)}"}), 400
+    try:
+        n = int(request.args.get('n', 10))
+    except ValueError:
+        n = 0
+    if not 1 <= n <= 1000:
+        return jsonify({"error": "n must be between 1 and 1000"}), 400
+    
+    history = get_history()
+    if history is None:
+        return jsonify({"error": "Top needs the metrics sampler (set DOKEMON_HISTORY=true)", "success": False}), 400
+    return jsonify({"success": True, "top": history.top(by, n)})
+
 @system_bp.route('/prune', methods=['POST'])
 def system_prune():
     """Clean up unused Docker objects"""
     force = request.args.get('force', 'false').lower() == 'true'
-    command = f"docker system prune {'--force' if force else ''}"
     
     if not force:
         return jsonify({"error": "Force parameter required for safety"}), 400
     
-    response, status = run_docker_command(command)
+    if wants_async():
+        return accepted_job_response('prune', {})
+    
+    response, status = run_docker_command(docker_backend.prune_command())
     return jsonify(response), status
 
+@system_bp.route('/metrics', methods=['GET'])
+def system_metrics():
+    """Get internal metrics for the Docker backend of this worker"""
+    from flask import current_app
+    from utils.daemon_health import get_daemon_health
+    from utils.docker_api import get_docker_api
+    from utils.cgroup_metrics import get_cgroup_reader
+    from utils.inspect_cache import get_inspect_cache
+    from utils.inventory import get_inventory
+    from utils.jobs import get_job_manager
+    from utils.metrics_history import get_history
+    from utils.pulls import get_pull_registry
+    from utils.streaming import stream_slots_snapshot
+    from utils.singleflight import get_single_flight
+    from utils.circuit_breaker import get_circuit_breaker
+    from utils.admission import get_admission_control
+    from utils.result_cache import get_result_cache
+    
+    metrics = {
+        "pid": os.getpid(),
+        "backend": current_app.config.get('DOCKER_BACKEND', 'cli'),
+        "daemon_health": get_daemon_health().snapshot(),
+        "circuit_breaker": get_circuit_breaker().snapshot(),
+        "streams": stream_slots_snapshot(),
+        "jobs": get_job_manager().snapshot(),
+        "pulls": get_pull_registry().snapshot(),
+        "inspect_cache": get_inspect_cache().snapshot()
+    }
+    
+    if docker_backend.use_engine_api():
+        try:
+            metrics["engine_api"] = dict(get_docker_api().stats)
+        except Exception as e:
+            metrics["engine_api"] = {"error": str(e)}
+    
+    inventory = get_inventory()
+    if inventory is not None:
+        metrics["inventory"] = inventory.snapshot()
+    
+    history = get_history()
+    if history is not None:
+        metrics["history"] = history.snapshot()
+    
+    admission = get_admission_control()
+    if admission is not None:
+        metrics["admission"] = admission.snapshot()
+    
+    result_cache = get_result_cache()
+    if result_cache is not None:
+        metrics["result_cache"] = result_cache.snapshot()
+    
+    flights = get_single_flight()
+    if flights is not None:
+        metrics["coalescing"] = flights.snapshot()
+    
+    cgroup_reader = get_cgroup_reader()
+    if cgroup_reader is not None:
+        metrics["cgroup_stats"] = cgroup_reader.snapshot()
+    
+    return jsonify({
+        "success": True,
+        "metrics": metrics
+    })
+
 @system_bp.route('/summary', methods=['GET'])
 def system_summary():
     """Get Docker system summary with key statistics"""
-    command = "docker info"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.system_info()
     
     if status == 200:
         try:
-            parsed_info = parse_docker_info(response["output"])
+            parsed_info = response["system_info"]
             
             # Extract key information for summary
             summary = {
@@ -78,7 +156,7 @@ def system_summary():
                 "kernel_version": parsed_info.get("Server", {}).get("Kernel Version", "Unknown")
             }
             
-            return jsonify({
+            return conditional_jsonify(content_digest(summary), lambda: {
                 "success": True,
                 "summary": summary
             })
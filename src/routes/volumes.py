@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 
 from flask import Blueprint, jsonify, request
-from utils.docker_utils import run_docker_command
-from utils.parsers import parse_volume_list
+from utils import docker_backend
+from utils.projection import project, requested_fields
+from utils.etag import conditional_jsonify
 
 # Create blueprint for volume management
 volumes_bp = Blueprint('volumes', __name__, url_prefix='/api/v1/volumes')
@@ -10,12 +11,12 @@ volumes_bp = Blueprint('volumes', __name__, url_prefix='/api/v1/volumes')
 @volumes_bp.route('', methods=['GET'])
 def list_volumes():
     """List all volumes"""
-    command = "docker volume ls"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.list_volumes()
     
     if status == 200:
-        volumes = parse_volume_list(response["output"])
-        return jsonify({"volumes": volumes})
+        return conditional_jsonify(response.get("version"), lambda: {
+            "volumes": project(response["volumes"], requested_fields())
+        })
     else:
         return jsonify(response), status
 
@@ -27,13 +28,11 @@ def create_volume():
         return jsonify({"error": "Volume name is required"}), 400
     
     name = data['name']
-    command = f"docker volume create {name}"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.create_volume(name)
     return jsonify(response), status
 
 @volumes_bp.route('/<volume_name>/remove', methods=['DELETE'])
 def remove_volume(volume_name):
     """Remove a volume"""
-    command = f"docker volume rm {volume_name}"
-    response, status = run_docker_command(command)
+    response, status = docker_backend.remove_volume(volume_name)
     return jsonify(response), status
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+import errno
+import fcntl
+import os
+import random
+import shlex
+import tempfile
+import threading
+import time
+from flask import current_app, g, has_request_context
+from utils.singleflight import read_command_key
+
+ADMISSION_CLASSES = ('read', 'mutate', 'long')
+# Subcommands that keep the daemon busy for a long time
+LONG_COMMANDS = {'pull', 'push', 'build', 'run', 'save', 'load', 'commit', 'export', 'import'}
+# Long-running watchers that mostly sit idle; the per-worker stream slots cap those
+UNMETERED_PROCESSES = {'logs', 'events'}
+
+class AdmissionTimeout(Exception):
+    def __init__(self, klass, timeout):
+        super().__init__(f"Docker is busy: no free {klass} slot within {timeout:g}s")
+        self.klass = klass
+        self.timeout = timeout
+
+def parse_admission_limits(value):
+    """Turn "read=16,mutate=8" into {"read": 16, "mutate": 8}"""
+    limits = {}
+    for item in (value or '').split(','):
+        klass, _, limit = item.partition('=')
+        if klass.strip() and limit.strip():
+            limits[klass.strip()] = int(limit)
+    return limits
+
+def command_class(command, process=False):
+    """Admission class of a docker command: 'read', 'mutate' or 'long' (None for unmetered processes)"""
+    try:
+        argv = list(command) if isinstance(command, list) else shlex.split(command)
+    except ValueError:
+        return 'mutate'
+    if process and len(argv) > 1 and argv[1] in UNMETERED_PROCESSES:
+        return None
+    if read_command_key(argv) is not None:
+        return 'read'
+    if len(argv) > 1 and (argv[1] in LONG_COMMANDS or 'prune' in argv[1:3] or argv[1:3] in (['image', 'build'], ['image', 'pull'])):
+        return 'long'
+    return 'mutate'
+
+# Engine API endpoints that keep the daemon as busy as their long CLI counterparts
+LONG_ENDPOINTS = ('/images/create', '/images/load', '/images/get', '/build', '/commit')
+# Streams that mostly sit idle, like the unmetered CLI processes
+UNMETERED_STREAMS = ('/logs', '/events', '/stats')
+
+def request_class(method, path, stream=False):
+    """Admission class of an Engine API request, like command_class for the CLI"""
+    path = path.split('?', 1)[0]
+    if stream and path.endswith(UNMETERED_STREAMS):
+        return None
+    if path.startswith(LONG_ENDPOINTS) or path.endswith('/prune'):
+        return 'long'
+    if method in ('GET', 'HEAD'):
+        return 'read'
+    return 'mutate'
+
+class AdmissionControl:
+    """Caps concurrent docker processes and Engine API requests per class across every worker of the host
+
+    Each class has `limit` slot files under directory; holding an flock on
+    one of them is holding a slot, so a worker that dies gives its slots
+    back. Callers that find every slot taken poll (with backoff) until
+    queue_timeout, then give up with AdmissionTimeout.
+    """
+
+    def __init__(self, directory, limits, queue_timeout=10):
+        self.directory = directory
+        self.limits = limits
+        self.queue_timeout = queue_timeout
+        self.stats = {klass: {"admitted": 0, "queued": 0, "timeouts": 0, "active": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+                      for klass in limits}
+        self._lock = threading.Lock()
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _slot_path(self, klass, index):
+        return os.path.join(self.directory, f"{klass}.{index}.lock")
+
+    def _try_slot(self, klass, index):
+        fd = os.open(self._slot_path(klass, index), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except OSError as e:
+            os.close(fd)
+            if e.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+            return None
+
+    def acquire(self, klass, timeout=None):
+        """Take a slot of klass (None when the class is unlimited); raises AdmissionTimeout"""
+        limit = self.limits.get(klass, 0)
+        if limit <= 0:
+            return None
+        timeout = self.queue_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        # Start at a random slot so workers do not all contend for slot 0
+        first = random.randrange(limit)
+        delay = 0.005
+        queued = False
+        while True:
+            for i in range(limit):
+                slot = self._try_slot(klass, (first + i) % limit)
+                if slot is not None:
+                    self._admitted(klass, (time.monotonic() - started) * 1000)
+                    return slot
+            if not queued:
+                queued = True
+                with self._lock:
+                    self.stats[klass]["queued"] += 1
+            now = time.monotonic()
+            if now >= deadline:
+                with self._lock:
+                    self.stats[klass]["timeouts"] += 1
+                note_queue_wait((now - started) * 1000)
+                raise AdmissionTimeout(klass, timeout)
+            time.sleep(min(delay, deadline - now))
+            delay = min(delay * 2, 0.1)
+
+    def _admitted(self, klass, wait_ms):
+        with self._lock:
+            stats = self.stats[klass]
+            stats["admitted"] += 1
+            stats["active"] += 1
+            stats["wait_ms_total"] += wait_ms
+            stats["wait_ms_max"] = max(stats["wait_ms_max"], wait_ms)
+        note_queue_wait(wait_ms)
+
+    def release(self, klass, slot):
+        if slot is None:
+            return
+        try:
+            fcntl.flock(slot, fcntl.LOCK_UN)
+        finally:
+            os.close(slot)
+        with self._lock:
+            self.stats[klass]["active"] -= 1
+
+    def busy(self, klass):
+        """Slots of klass currently held by any worker"""
+        busy = 0
+        for index in range(self.limits.get(klass, 0)):
+            slot = self._try_slot(klass, index)
+            if slot is None:
+                busy += 1
+            else:
+                fcntl.flock(slot, fcntl.LOCK_UN)
+                os.close(slot)
+        return busy
+
+    def snapshot(self):
+        classes = {}
+        for klass, limit in self.limits.items():
+            with self._lock:
+                stats = dict(self.stats[klass])
+            admitted = stats["admitted"]
+            classes[klass] = {
+                "limit": limit,
+                "busy_all_workers": self.busy(klass),
+                "wait_ms_avg": round(stats["wait_ms_total"] / admitted, 2) if admitted else None,
+                **{key: round(value, 2) if isinstance(value, float) else value for key, value in stats.items()}
+            }
+        return {"directory": self.directory, "queue_timeout": self.queue_timeout, "classes": classes}
+
+_admission = None
+_admission_pid = None
+_admission_lock = threading.Lock()
+
+def get_admission_control():
+    """Per-process AdmissionControl, or None when DOKEMON_ADMISSION is off"""
+    global _admission, _admission_pid
+    config = current_app.config
+    if not config.get('ADMISSION_ENABLED', True):
+        return None
+    pid = os.getpid()
+    if _admission is None or _admission_pid != pid:
+        with _admission_lock:
+            if _admission is None or _admission_pid != pid:
+                _admission = AdmissionControl(
+                    config.get('ADMISSION_DIR') or os.path.join(tempfile.gettempdir(), 'dokemon-admission'),
+                    parse_admission_limits(config.get('ADMISSION_LIMITS', '')),
+                    queue_timeout=config.get('ADMISSION_QUEUE_TIMEOUT', 10)
+                )
+                _admission_pid = pid
+    return _admission
+
+def admission_timeout_response(error):
+    """The (response, status) a command that could not get a slot returns"""
+    return {"error": str(error), "success": False, "queue": error.klass}, 429
+
+def note_queue_wait(wait_ms):
+    """Add to the time the current request spent waiting for Docker slots"""
+    if has_request_context():
+        g.docker_queue_wait_ms = g.get('docker_queue_wait_ms', 0) + wait_ms
+
+def init_admission(app):
+    """Register the hook reporting queue wait time on responses"""
+    @app.after_request
+    def report_queue_wait(response):
+        wait_ms = g.get('docker_queue_wait_ms')
+        if wait_ms is not None:
+            response.headers['X-Docker-Queue-Wait-Ms'] = str(round(wait_ms))
+        return response
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from utils import docker_backend
+
+# Lifecycle actions POST /api/v1/containers/bulk can apply
+BULK_ACTIONS = ('start', 'stop', 'restart', 'kill', 'pause', 'unpause', 'remove')
+# What a container ID or name can look like (anything else is refused before it reaches docker)
+CONTAINER_REF_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]*$')
+
+def parse_label_selector(selector):
+    """Docker label filters from "app=web,tier" or {"app": "web", "tier": None}"""
+    if isinstance(selector, dict):
+        items = [key if value is None else f"{key}={value}" for key, value in selector.items()]
+    elif isinstance(selector, str):
+        items = [item.strip() for item in selector.split(',')]
+    else:
+        raise ValueError("selector must be a string or an object")
+    labels = [item for item in items if item]
+    if not labels or any(not item.split('=', 1)[0] for item in labels):
+        raise ValueError("selector must name at least one label")
+    return labels
+
+def resolve_targets(ids=None, selector=None):
+    """Container IDs to act on, in order and without duplicates
+
+    Returns (ids, None), or (None, (response, status)) when the selector
+    could not be resolved.
+    """
+    targets = list(ids or [])
+    if selector:
+        response, status = docker_backend.list_containers(show_all=True, filters={"label": parse_label_selector(selector)})
+        if status != 200:
+            return None, (response, status)
+        targets += [container["container_id"] for container in response["containers"]]
+    unique = []
+    seen = set()
+    for container_id in targets:
+        if container_id not in seen:
+            seen.add(container_id)
+            unique.append(container_id)
+    return unique, None
+
+def apply_action(container_id, action, force=False):
+    """Run one lifecycle action; returns (response, status) like the single-container routes"""
+    if action == 'remove':
+        return docker_backend.remove_container(container_id, force)
+    return docker_backend.container_action(container_id, action)
+
+def run_bulk(targets, action, parallelism=4, force=False, max_failures=None):
+    """Apply action to every target with at most parallelism in flight; yields one result per target as it finishes
+
+    Once max_failures actions have failed the targets that have not started
+    yet are skipped, which turns a bulk restart into a rolling one that
+    stops when something goes wrong.
+    """
+    app = current_app._get_current_object()
+
+    def work(container_id):
+        with app.app_context():
+            started = time.monotonic()
+            result = {"container_id": container_id, "action": action}
+            try:
+                response, status = apply_action(container_id, action, force)
+                if status == 200:
+                    result["status"] = "succeeded"
+                else:
+                    result.update(status="failed", error=response.get("error"))
+            except Exception as e:
+                result.update(status="failed", error=str(e))
+            result["success"] = result["status"] == "succeeded"
+            result["seconds"] = round(time.monotonic() - started, 3)
+            return result
+
+    executor = ThreadPoolExecutor(max_workers=max(parallelism, 1), thread_name_prefix='dokemon-bulk')
+    try:
+        futures = {executor.submit(work, container_id): container_id for container_id in targets}
+        failures = 0
+        for future in as_completed(futures):
+            if future.cancelled():
+                yield {"container_id": futures[future], "action": action, "status": "skipped",
+                       "success": False, "error": "Stopped after too many failures"}
+                continue
+            result = future.result()
+            if not result["success"]:
+                failures += 1
+                if max_failures is not None and failures >= max_failures:
+                    for pending in futures:
+                        pending.cancel()
+            yield result
+    finally:
+        # Actions already running finish; queued ones are dropped when the client goes away
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+import glob
+import os
+import re
+import threading
+import time
+from flask import current_app
+from utils import docker_backend
+
+# Where Docker puts a container's cgroup under the v2 hierarchy: the systemd
+# cgroup driver (the default on systemd hosts), then the cgroupfs driver
+CGROUP_LAYOUTS = ('system.slice/docker-{id}.scope', 'docker/{id}')
+CONTAINER_ID_PATTERN = re.compile(r'^[0-9a-f]{12,64}$')
+
+def _read_int(path):
+    with open(path) as f:
+        value = f.read().strip()
+    return None if value == 'max' else int(value)
+
+def _read_keyed(path):
+    # "usage_usec 123\nuser_usec 45" -> {"usage_usec": 123, ...}
+    values = {}
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition(' ')
+            if value.strip().isdigit():
+                values[key] = int(value)
+    return values
+
+def _read_io(path):
+    # One line per device: "8:0 rbytes=1 wbytes=2 rios=3 wios=4 dbytes=0 dios=0"
+    totals = {"rbytes": 0, "wbytes": 0}
+    with open(path) as f:
+        for line in f:
+            for field in line.split()[1:]:
+                key, _, value = field.partition('=')
+                if key in totals and value.isdigit():
+                    totals[key] += int(value)
+    return totals
+
+def _host_memory():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+class CgroupReader:
+    """Per-container CPU, memory, block I/O and PID figures read straight from cgroup v2 files
+
+    A read costs a handful of small file reads instead of a daemon round
+    trip. Rates (CPU, I/O throughput) need two readings; they are computed
+    against a baseline sample that is replaced once it is rate_interval
+    seconds old, so a read returns current counters together with the rate
+    over the last completed interval (null until one has completed).
+    Network counters live in the container's network namespace, not its
+    cgroup, and are reported as null.
+    """
+
+    def __init__(self, root='/sys/fs/cgroup', rate_interval=1.0):
+        self.root = root
+        self.rate_interval = rate_interval
+        self.host_memory = _host_memory()
+        self.stats = {"reads": 0, "not_found": 0, "errors": 0}
+        self._paths = {}
+        self._baselines = {}
+        self._rates = {}
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def available(self):
+        """True when root is a cgroup v2 (unified) hierarchy"""
+        return os.path.isfile(os.path.join(self.root, 'cgroup.controllers'))
+
+    def cgroup_path(self, container_id):
+        """The cgroup directory of a container given its full or abbreviated ID, or None"""
+        path = self._paths.get(container_id)
+        if path and os.path.isdir(path):
+            return path
+        for layout in CGROUP_LAYOUTS:
+            if len(container_id) == 64:
+                candidates = [os.path.join(self.root, layout.format(id=container_id))]
+            else:
+                candidates = glob.glob(os.path.join(self.root, layout.format(id=container_id + '*')))
+            candidates = [candidate for candidate in candidates if os.path.isdir(candidate)]
+            if len(candidates) == 1:
+                with self._lock:
+                    self._paths[container_id] = candidates[0]
+                return candidates[0]
+        with self._lock:
+            self._paths.pop(container_id, None)
+        return None
+
+    def read(self, container_id):
+        """parse_stats_row-style figures for a container ID, or None when it has no cgroup here"""
+        path = self.cgroup_path(container_id)
+        if path is None:
+            self.stats["not_found"] += 1
+            return None
+        try:
+            cpu = _read_keyed(os.path.join(path, 'cpu.stat'))
+            memory = _read_int(os.path.join(path, 'memory.current'))
+            memory_limit = _read_int(os.path.join(path, 'memory.max'))
+            inactive = _read_keyed(os.path.join(path, 'memory.stat')).get('inactive_file', 0)
+            io = _read_io(os.path.join(path, 'io.stat')) if os.path.exists(os.path.join(path, 'io.stat')) else {"rbytes": 0, "wbytes": 0}
+            pids = _read_int(os.path.join(path, 'pids.current')) if os.path.exists(os.path.join(path, 'pids.current')) else None
+        except (OSError, ValueError):
+            # The container stopped between finding its cgroup and reading it
+            self.stats["errors"] += 1
+            return None
+        self.stats["reads"] += 1
+
+        now = time.monotonic()
+        counters = (now, cpu.get('usage_usec', 0), io["rbytes"], io["wbytes"])
+        rates = self._update_rates(path, counters)
+
+        # Like the docker CLI, leave reclaimable page cache out of memory usage
+        if memory is not None and inactive < memory:
+            memory -= inactive
+        limit = memory_limit or self.host_memory
+        return {
+            "container_id": os.path.basename(path).replace('docker-', '').replace('.scope', ''),
+            "name": None,
+            "cpu_fraction": rates.get("cpu_fraction"),
+            "cpu_usage_seconds": round(cpu.get('usage_usec', 0) / 1e6, 6),
+            "cpu_throttled_seconds": round(cpu.get('throttled_usec', 0) / 1e6, 6),
+            "memory_bytes": memory,
+            "memory_limit_bytes": limit,
+            "memory_fraction": round(memory / limit, 6) if memory is not None and limit else None,
+            "network_rx_bytes": None,
+            "network_tx_bytes": None,
+            "block_read_bytes": io["rbytes"],
+            "block_write_bytes": io["wbytes"],
+            "block_read_bytes_per_second": rates.get("block_read_bytes_per_second"),
+            "block_write_bytes_per_second": rates.get("block_write_bytes_per_second"),
+            "pids": pids,
+            "rate_window_seconds": rates.get("window")
+        }
+
+    def _update_rates(self, path, counters):
+        with self._lock:
+            baseline = self._baselines.get(path)
+            if baseline is None:
+                self._baselines[path] = counters
+            elif counters[0] - baseline[0] >= self.rate_interval:
+                elapsed = counters[0] - baseline[0]
+                self._rates[path] = {
+                    "cpu_fraction": round(max(counters[1] - baseline[1], 0) / 1e6 / elapsed, 6),
+                    "block_read_bytes_per_second": round(max(counters[2] - baseline[2], 0) / elapsed, 1),
+                    "block_write_bytes_per_second": round(max(counters[3] - baseline[3], 0) / elapsed, 1),
+                    "window": round(elapsed, 3)
+                }
+                self._baselines[path] = counters
+            if counters[0] - self._pruned_at > 60:
+                self._prune(counters[0])
+            return self._rates.get(path, {})
+
+    def _prune(self, now):
+        # Forget containers whose cgroup is gone
+        self._pruned_at = now
+        for path in [path for path in self._baselines if not os.path.isdir(path)]:
+            self._baselines.pop(path, None)
+            self._rates.pop(path, None)
+        for key in [key for key, path in self._paths.items() if not os.path.isdir(path)]:
+            self._paths.pop(key, None)
+
+    def snapshot(self):
+        return {"root": self.root, "available": self.available(), "tracked": len(self._baselines), **self.stats}
+
+_reader = None
+_reader_pid = None
+_reader_lock = threading.Lock()
+
+def get_cgroup_reader():
+    """Per-process CgroupReader, or None unless DOKEMON_STATS_BACKEND=cgroup and the hierarchy is there"""
+    global _reader, _reader_pid
+    config = current_app.config
+    if config.get('STATS_BACKEND', 'docker') != 'cgroup':
+        return None
+    pid = os.getpid()
+    if _reader is None or _reader_pid != pid:
+        with _reader_lock:
+            if _reader is None or _reader_pid != pid:
+                _reader = CgroupReader(config.get('CGROUP_ROOT', '/sys/fs/cgroup'), config.get('CGROUP_RATE_INTERVAL', 1.0))
+                _reader_pid = pid
+    return _reader if _reader.available() else None
+
+def _container_id(name_or_id):
+    # Names have to be looked up; the inspect cache usually answers without the daemon
+    if CONTAINER_ID_PATTERN.match(name_or_id):
+        return name_or_id
+    response, status = docker_backend.inspect_container(name_or_id)
+    if status != 200 or not response["container_info"]:
+        return None
+    return response["container_info"][0].get("Id")
+
+def _requested_key(row, requested):
+    # The ID or name a stats row was asked for: its full ID, a prefix of it, or its name
+    container_id, name = row.get("container_id") or '', row.get("name") or ''
+    for key in requested:
+        if key == container_id or key == name or container_id.startswith(key):
+            return key
+    return None
+
+def collect_stats(container_ids=None, concurrency=16):
+    """Stats like docker_backend.container_stats, read from cgroups where possible
+
+    Containers the cgroup reader cannot find (another cgroup layout, names
+    that do not resolve) are sampled through Docker instead.
+    """
+    reader = get_cgroup_reader()
+    if reader is None:
+        return docker_backend.container_stats(container_ids, concurrency)
+
+    names = {}
+    if container_ids is None:
+        response, status = docker_backend.list_containers(False)
+        if status != 200:
+            return response, status
+        container_ids = [container["id"] for container in response["containers"]]
+        names = {container["id"]: container["names"] for container in response["containers"]}
+
+    stats, fallback = {}, []
+    for requested in container_ids:
+        container_id = _container_id(requested)
+        row = reader.read(container_id) if container_id else None
+        if row is None:
+            fallback.append(requested)
+        else:
+            row["name"] = names.get(requested) or (requested if requested != container_id else None)
+            stats[requested] = row
+    errors = {}
+    if fallback:
+        response, status = docker_backend.container_stats(fallback, concurrency)
+        if status != 200:
+            return response, status
+        errors = response["errors"]
+        pending = [i for i in fallback if i not in errors]
+        for row in response["stats"]:
+            requested = _requested_key(row, pending)
+            if requested is not None:
+                stats[requested] = row
+                pending.remove(requested)
+    return {"success": True, "stats": [stats[i] for i in container_ids if i in stats], "errors": errors}, 200
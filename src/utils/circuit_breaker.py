@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import current_app
+
+CIRCUIT_OPEN_ERROR = "Docker daemon unavailable; not retrying for now"
+
+class CircuitBreaker:
+    """Fails Docker calls fast once the daemon has failed repeatedly
+
+    closed: calls go through; failure_threshold consecutive daemon failures
+    (unreachable, timed out) open the circuit. open: calls are rejected
+    without touching the daemon until reset_timeout has passed. half_open:
+    a single caller is let through as a probe; its success closes the
+    circuit, its failure opens it again. Errors the daemon answers with
+    (no such container, ...) prove it is up and count as successes.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.stats = {"failures": 0, "successes": 0, "rejected": 0, "opened": 0}
+        self.transitions = deque(maxlen=20)
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probe_thread = None
+        self._probe_started = None
+        self._last_error = None
+        self._lock = threading.Lock()
+
+    def _transition(self, state, reason):
+        self.transitions.append({"from": self.state, "to": state, "at": datetime.now().isoformat(), "reason": reason})
+        self.state = state
+        if state == 'open':
+            self._opened_at = time.monotonic()
+            self.stats["opened"] += 1
+        current_app.logger.warning(f"Docker circuit breaker {self.transitions[-1]['from']} -> {state}: {reason}")
+
+    def allow(self):
+        """True when the calling thread may talk to the daemon"""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if self.state == 'open' and now - self._opened_at >= self.reset_timeout:
+                self._transition('half_open', f"{self.reset_timeout}s elapsed, probing")
+                self._probe_thread, self._probe_started = threading.get_ident(), now
+            elif self.state == 'half_open' and now - self._probe_started >= self.reset_timeout:
+                # The probe never reported back; let this caller probe instead
+                self._probe_thread, self._probe_started = threading.get_ident(), now
+            if self.state == 'half_open' and self._probe_thread == threading.get_ident():
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def retry_after(self):
+        """Seconds until the next probe is let through"""
+        with self._lock:
+            if self.state != 'open':
+                return 0
+            return max(int(self.reset_timeout - (time.monotonic() - self._opened_at)) + 1, 1)
+
+    def record_success(self):
+        with self._lock:
+            self.stats["successes"] += 1
+            self._consecutive_failures = 0
+            if self.state != 'closed':
+                self._transition('closed', "probe succeeded")
+                self._probe_thread = None
+
+    def record_failure(self, error):
+        with self._lock:
+            self.stats["failures"] += 1
+            self._consecutive_failures += 1
+            self._last_error = error
+            if self.failure_threshold <= 0:
+                return
+            if self.state == 'half_open':
+                self._transition('open', f"probe failed: {error}")
+                self._probe_thread = None
+            elif self.state == 'closed' and self._consecutive_failures >= self.failure_threshold:
+                self._transition('open', f"{self._consecutive_failures} consecutive failures: {error}")
+
+    def snapshot(self):
+        retry_after = self.retry_after()
+        with self._lock:
+            return {
+                "state": self.state,
+                "enabled": self.failure_threshold > 0,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "consecutive_failures": self._consecutive_failures,
+                "retry_after": retry_after if self.state == 'open' else None,
+                "last_error": self._last_error,
+                "transitions": list(self.transitions),
+                **self.stats
+            }
+
+_breaker = None
+_breaker_pid = None
+_breaker_lock = threading.Lock()
+
+def get_circuit_breaker():
+    """Per-process CircuitBreaker (DOKEMON_BREAKER_THRESHOLD=0 keeps it closed)"""
+    global _breaker, _breaker_pid
+    pid = os.getpid()
+    if _breaker is None or _breaker_pid != pid:
+        with _breaker_lock:
+            if _breaker is None or _breaker_pid != pid:
+                config = current_app.config
+                _breaker = CircuitBreaker(config.get('BREAKER_THRESHOLD', 5), config.get('BREAKER_RESET_TIMEOUT', 30))
+                _breaker_pid = pid
+    return _breaker
+
+def circuit_open_response(breaker):
+    """The (response, status) a call rejected by the breaker returns"""
+    return {"error": CIRCUIT_OPEN_ERROR, "success": False, "circuit": breaker.state, "retry_after": breaker.retry_after()}, 503
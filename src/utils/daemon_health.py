@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+
+# Error messages returned to API clients (kept identical to the old preflight checks)
+CLI_UNAVAILABLE_ERROR = "Docker is not accessible. Is Docker running?"
+DAEMON_UNREACHABLE_ERROR = "Failed to connect to Docker daemon. Check Docker socket permissions."
+
+# A single `docker version` call checks both the CLI and the daemon (/version is far
+# cheaper than /info) and yields the same string `docker --version` used to print
+PROBE_FORMAT = '{{.Client.Version}}|{{.Client.GitCommit}}|{{.Server.Version}}'
+
+# stderr fragments that mean the daemon went away between probes
+DAEMON_DOWN_MARKERS = (
+    'Cannot connect to the Docker daemon',
+    'error during connect',
+    'Is the docker daemon running',
+)
+
+class DaemonHealth:
+    """Cached Docker daemon connectivity state, refreshed in the background"""
+
+    def __init__(self, interval=15, ttl=30, timeout=5):
+        self.interval = interval
+        self.ttl = ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._state = {
+            "state": "unknown",
+            "healthy": False,
+            "docker_version": None,
+            "server_version": None,
+            "error": None,
+            "detail": None,
+            "last_probe": None,
+            "last_probe_latency_ms": None,
+            "probes": 0,
+            "failures": 0
+        }
+        self._checked_at = None  # monotonic timestamp of the last probe
+
+    def start(self):
+        """Start the background monitor (no-op when the interval is 0)"""
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='dokemon-daemon-health', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background monitor"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe()
+            self._stop.wait(self.interval)
+
+    def probe(self):
+        """Check CLI and daemon connectivity once and cache the outcome"""
+        with self._probe_lock:
+            # Another caller may have refreshed the state while we waited for the lock
+            if self.is_usable(max_age=1):
+                return self.snapshot()
+
+            start = time.monotonic()
+            try:
+                result = subprocess.run(['docker', 'version', '--format', PROBE_FORMAT],
+                                        capture_output=True, text=True, timeout=self.timeout)
+            except FileNotFoundError as e:
+                return self._record(start, False, CLI_UNAVAILABLE_ERROR, str(e))
+            except subprocess.TimeoutExpired as e:
+                return self._record(start, False, DAEMON_UNREACHABLE_ERROR, str(e))
+
+            if result.returncode != 0:
+                return self._record(start, False, DAEMON_UNREACHABLE_ERROR, result.stderr.strip())
+
+            client_version, git_commit, server_version = (result.stdout.strip().split('|') + ['', '', ''])[:3]
+            docker_version = f"Docker version {client_version}, build {git_commit}"
+            return self._record(start, True, None, None, docker_version, server_version)
+
+    def _record(self, start, healthy, error, detail, docker_version=None, server_version=None):
+        latency_ms = round((time.monotonic() - start) * 1000, 2)
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._state.update({
+                "state": "healthy" if healthy else "unhealthy",
+                "healthy": healthy,
+                "error": error,
+                "detail": detail,
+                "last_probe": datetime.now().isoformat(),
+                "last_probe_latency_ms": latency_ms,
+                "probes": self._state["probes"] + 1,
+                "failures": self._state["failures"] + (0 if healthy else 1)
+            })
+            if healthy:
+                self._state["docker_version"] = docker_version
+                self._state["server_version"] = server_version
+            return dict(self._state)
+
+    def mark_unhealthy(self, detail):
+        """Invalidate the cached state after a command saw the daemon disappear"""
+        with self._lock:
+            self._state.update({
+                "state": "unhealthy",
+                "healthy": False,
+                "error": DAEMON_UNREACHABLE_ERROR,
+                "detail": detail
+            })
+
+    def is_usable(self, max_age=None):
+        """True when the cached state is healthy and younger than the TTL"""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            if not self._state["healthy"] or self._checked_at is None:
+                return False
+            return time.monotonic() - self._checked_at < max_age
+
+    def snapshot(self):
+        """Return a copy of the cached state without probing"""
+        with self._lock:
+            state = dict(self._state)
+            state["age_seconds"] = round(time.monotonic() - self._checked_at, 2) if self._checked_at else None
+            state["stale"] = state["age_seconds"] is None or state["age_seconds"] >= self.ttl
+            state["monitor_interval"] = self.interval
+            state["ttl"] = self.ttl
+            return state
+
+_health = None
+_health_pid = None
+_health_lock = threading.Lock()
+
+def get_daemon_health():
+    """Return this process's DaemonHealth, starting its monitor on first use
+
+    The monitor is created lazily per PID so that gunicorn workers forked from a
+    preloaded app each get a running thread of their own.
+    """
+    global _health, _health_pid
+    pid = os.getpid()
+    if _health is None or _health_pid != pid:
+        with _health_lock:
+            if _health is None or _health_pid != pid:
+                config = current_app.config
+                _health = DaemonHealth(
+                    interval=config.get('DOCKER_HEALTH_INTERVAL', 15),
+                    ttl=config.get('DOCKER_HEALTH_TTL', 30),
+                    timeout=config.get('DOCKER_VERSION_TIMEOUT', 10)
+                )
+                _health.start()
+                _health_pid = pid
+    return _health
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+
+import base64
+import http.client
+import json
+import os
+import queue
+import socket
+import ssl
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlencode, urlparse, quote
+from flask import current_app
+from utils.admission import get_admission_control, request_class
+from utils.etag import content_digest
+
+DEFAULT_DOCKER_HOST = 'unix:///var/run/docker.sock'
+# Requests that can be sent again when a reused connection turns out dead after sending them
+RETRYABLE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+class DockerAPIUnavailable(Exception):
+    """The Engine API endpoint could not be reached (callers fall back to the CLI)"""
+
+class DockerAPITimeout(Exception):
+    """The daemon did not answer within the request timeout"""
+
+class DockerAPIError(Exception):
+    """The daemon answered with an error status (or, with connection_lost, stopped answering mid-request)"""
+
+    def __init__(self, status, message, connection_lost=False):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.connection_lost = connection_lost
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that talks to a Unix domain socket"""
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+class DockerAPIClient:
+    """Minimal Docker Engine API client with a pool of keep-alive connections
+
+    With an AdmissionControl, every request holds a slot of its class
+    (request_class) while it runs, streams until they are closed, and
+    AdmissionTimeout is raised when none frees up in time.
+    """
+
+    def __init__(self, docker_host=None, pool_size=4, timeout=30, admission=None):
+        self.docker_host = docker_host or DEFAULT_DOCKER_HOST
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.admission = admission
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._factory = self._connection_factory(self.docker_host)
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "connections_opened": 0, "connections_reused": 0, "errors": 0}
+
+    def _connection_factory(self, docker_host):
+        url = urlparse(docker_host)
+        if url.scheme == 'unix':
+            return lambda timeout: UnixHTTPConnection(url.path, timeout=timeout)
+        if url.scheme in ('tcp', 'http', 'https'):
+            host, port = url.hostname, url.port or 2375
+            if url.scheme == 'https' or os.environ.get('DOCKER_TLS_VERIFY'):
+                context = ssl.create_default_context()
+                cert_path = os.environ.get('DOCKER_CERT_PATH', os.path.expanduser('~/.docker'))
+                if os.path.exists(os.path.join(cert_path, 'ca.pem')):
+                    context.load_verify_locations(os.path.join(cert_path, 'ca.pem'))
+                if os.path.exists(os.path.join(cert_path, 'cert.pem')):
+                    context.load_cert_chain(os.path.join(cert_path, 'cert.pem'), os.path.join(cert_path, 'key.pem'))
+                return lambda timeout: http.client.HTTPSConnection(host, url.port or 2376, timeout=timeout, context=context)
+            return lambda timeout: http.client.HTTPConnection(host, port, timeout=timeout)
+        raise DockerAPIUnavailable(f"Unsupported DOCKER_HOST for the Engine API backend: {docker_host}")
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _acquire(self):
+        try:
+            conn = self._pool.get_nowait()
+            self._count("connections_reused")
+            return conn, True
+        except queue.Empty:
+            self._count("connections_opened")
+            return self._factory(self.timeout), False
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def admitted(self, klass):
+        """Hold a slot of klass; requests made with metered=False inside share it"""
+        slot = self.admission.acquire(klass) if self.admission and klass else None
+        try:
+            yield
+        finally:
+            if slot is not None:
+                self.admission.release(klass, slot)
+
+    def _set_timeout(self, conn, timeout):
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+
+    def _build_path(self, path, params):
+        # dicts and lists are sent JSON-encoded (filters, buildargs); tuples as repeated parameters (t=a&t=b)
+        if not params:
+            return path
+        encoded = []
+        for key, value in params.items():
+            if value is None:
+                continue
+            if isinstance(value, tuple):
+                encoded += [(key, item) for item in value]
+            else:
+                encoded.append((key, json.dumps(value) if isinstance(value, (dict, list)) else value))
+        return f"{path}?{urlencode(encoded)}"
+
+    def request(self, method, path, params=None, body=None, timeout=None, digest=False, headers=None, metered=True):
+        """Perform a request and return (status, decoded JSON body or None)
+
+        With digest=True a content hash of the raw body is appended to the
+        tuple, so callers can build ETags without re-serializing the data.
+        metered=False skips admission, for requests made under admitted().
+
+        Raises DockerAPIUnavailable when the endpoint cannot be reached,
+        DockerAPITimeout when it stops answering, and DockerAPIError when the daemon answers with a 4xx/5xx status
+        (or, with a 502, when the connection drops after a non-GET request was sent, as its outcome is unknown).
+        AdmissionTimeout comes from the admission control, before anything is sent.
+        """
+        path = self._build_path(path, params)
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+
+        with self.admitted(request_class(method, path) if metered else None):
+            response, raw = self._send(method, path, payload, headers, timeout)
+
+        data = None
+        if raw:
+            content_type = response.getheader('Content-Type', '')
+            data = json.loads(raw) if 'json' in content_type else raw.decode('utf-8', errors='replace')
+
+        if response.status >= 400:
+            message = data.get('message') if isinstance(data, dict) else data
+            raise DockerAPIError(response.status, f"Error response from daemon: {message}")
+        if digest:
+            return response.status, data, content_digest(raw)
+        return response.status, data
+
+    def _send(self, method, path, payload, headers, timeout):
+        self._count("requests")
+        # A pooled connection may have been closed by the daemon; retry once on a fresh one,
+        # unless the request got sent and is not safe to repeat (the daemon may have acted on it)
+        for attempt in range(2):
+            conn, reused = self._acquire()
+            sent = False
+            try:
+                self._set_timeout(conn, timeout or self.timeout)
+                conn.request(method, path, body=payload, headers=headers)
+                sent = True
+                response = conn.getresponse()
+                raw = response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                conn.close()
+                if reused and attempt == 0 and (not sent or method in RETRYABLE_METHODS):
+                    continue
+                self._count("errors")
+                if sent and method not in RETRYABLE_METHODS:
+                    # Not DockerAPIUnavailable: falling back to the CLI would send it again
+                    raise DockerAPIError(502, f"Connection to the daemon lost during {method} {path.split('?')[0]}; "
+                                              f"it may or may not have been applied: {e}", connection_lost=True)
+                raise DockerAPIUnavailable(str(e))
+            except socket.timeout as e:
+                conn.close()
+                self._count("errors")
+                raise DockerAPITimeout(str(e))
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self._count("errors")
+                raise DockerAPIUnavailable(str(e))
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._set_timeout(conn, self.timeout)
+                self._release(conn)
+            return response, raw
+
+    @contextmanager
+    def stream(self, method, path, params=None, body=None, headers=None, timeout=None):
+        """Open a dedicated connection for a streaming endpoint and yield the response
+
+        Streaming connections are never returned to the pool. body may be bytes
+        or an iterable of bytes chunks (sent with chunked transfer encoding).
+        The response gets an abort() method that shuts the socket down.
+        Pulls and builds hold their admission slot until the stream is closed.
+        """
+        path = self._build_path(path, params)
+        headers = dict(headers or {})
+        chunked = body is not None and not isinstance(body, (bytes, str))
+        with self.admitted(request_class(method, path, stream=True)):
+            with self._open_stream(method, path, body, headers, timeout, chunked) as response:
+                yield response
+
+    @contextmanager
+    def _open_stream(self, method, path, body, headers, timeout, chunked):
+        self._count("requests")
+        self._count("connections_opened")
+        conn = self._factory(timeout)
+        try:
+            try:
+                conn.request(method, path, body=body, headers=headers, encode_chunked=chunked)
+                sock = conn.sock
+                response = conn.getresponse()
+            except socket.timeout as e:
+                raise DockerAPITimeout(str(e))
+            except (OSError, http.client.HTTPException) as e:
+                raise DockerAPIUnavailable(str(e))
+
+            if response.status >= 400:
+                raw = response.read()
+                try:
+                    message = json.loads(raw).get('message')
+                except ValueError:
+                    message = raw.decode('utf-8', errors='replace').strip()
+                raise DockerAPIError(response.status, f"Error response from daemon: {message}")
+            # Lets another thread unblock a reader that is waiting on this stream
+            response.abort = lambda: _shutdown_socket(sock)
+            yield response
+        except (DockerAPIUnavailable, DockerAPITimeout, DockerAPIError):
+            self._count("errors")
+            raise
+        finally:
+            conn.close()
+
+    def get(self, path, params=None, timeout=None, digest=False, metered=True):
+        return self.request('GET', path, params=params, timeout=timeout, digest=digest, metered=metered)
+
+    def post(self, path, params=None, body=None, timeout=None):
+        return self.request('POST', path, params=params, body=body, timeout=timeout)
+
+    def delete(self, path, params=None, timeout=None):
+        return self.request('DELETE', path, params=params, timeout=timeout)
+
+    def close(self):
+        """Close all idle pooled connections"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+def _shutdown_socket(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except (AttributeError, OSError):
+        pass
+
+DOCKER_HUB_AUTH_KEY = 'https://index.docker.io/v1/'
+
+def registry_auth_header(image):
+    """X-Registry-Auth header for an image's registry from the docker config, or None
+
+    Only inline "auth" entries are used; credential helpers (credsStore,
+    credHelpers) need the CLI.
+    """
+    first = image.split('/', 1)[0]
+    registry = first if '/' in image and ('.' in first or ':' in first or first == 'localhost') else DOCKER_HUB_AUTH_KEY
+    config_dir = os.environ.get('DOCKER_CONFIG', os.path.expanduser('~/.docker'))
+    try:
+        with open(os.path.join(config_dir, 'config.json')) as f:
+            auths = json.load(f).get('auths') or {}
+    except (OSError, ValueError):
+        return None
+    entry = auths.get(registry) or auths.get(f"https://{registry}") or {}
+    if not entry.get('auth'):
+        return None
+    try:
+        username, _, password = base64.b64decode(entry['auth']).decode('utf-8').partition(':')
+    except ValueError:
+        return None
+    payload = json.dumps({"username": username, "password": password, "serveraddress": registry})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def quote_id(value):
+    """Quote a container/image/network reference for use in a URL path"""
+    return quote(str(value), safe='')
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def get_docker_api():
+    """Return this worker's DockerAPIClient (pools are never shared across forks)"""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                config = current_app.config
+                _client = DockerAPIClient(
+                    docker_host=config.get('DOCKER_HOST') or os.environ.get('DOCKER_HOST'),
+                    pool_size=config.get('DOCKER_API_POOL_SIZE', 4),
+                    timeout=config.get('DOCKER_TIMEOUT', 30),
+                    admission=get_admission_control()
+                )
+                _client_pid = pid
+    return _client
@@ -0,0 +1,849 @@
+#!/usr/bin/env python3
+
+import json
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from flask import current_app
+from utils.admission import admission_timeout_response, AdmissionTimeout
+from utils.circuit_breaker import get_circuit_breaker, circuit_open_response
+from utils.docker_utils import run_docker_command, start_docker_process, stop_docker_process
+from utils.docker_api import (
+    get_docker_api, quote_id, registry_auth_header, DockerAPIUnavailable, DockerAPIError, DockerAPITimeout
+)
+from utils.etag import content_digest
+from utils.inspect_cache import get_inspect_cache
+from utils.listing import filter_containers
+from utils.result_cache import get_result_cache, cache_bypassed, note_cache_status
+from utils.singleflight import get_single_flight
+from utils.parsers import (
+    parse_container_list, parse_image_list, parse_network_list, parse_volume_list, parse_docker_info,
+    parse_engine_containers, parse_engine_images, parse_engine_networks, parse_engine_volumes, parse_engine_info,
+    iter_json_lines, parse_pull_progress, parse_pull_line, parse_build_line, parse_build_message, parse_missing_objects,
+    parse_stats_row, parse_engine_stats
+)
+
+# Docker operations used by the route blueprints. Each function returns a
+# (response, status) tuple like run_docker_command and is served by the Engine
+# API over the Docker socket when DOCKER_BACKEND is 'api', or by the docker CLI
+# otherwise (and whenever the socket cannot be reached).
+
+# List commands ask the CLI for line-delimited JSON instead of fixed-width tables
+JSON_FORMAT = '{{json .}}'
+# Daemon error statuses returned as-is (no such object, conflict); other 4xx become 400 like CLI failures
+PASSED_THROUGH_STATUSES = {404, 409}
+
+def use_engine_api():
+    """True when the Engine API backend is enabled"""
+    return current_app.config.get('DOCKER_BACKEND', 'cli') == 'api'
+
+def call_backend(api, cli):
+    """Run api(client) on the Engine API backend, falling back to cli() when unreachable"""
+    if use_engine_api():
+        breaker = get_circuit_breaker()
+        if not breaker.allow():
+            return circuit_open_response(breaker)
+        try:
+            response = api(get_docker_api())
+            breaker.record_success()
+            return response
+        except DockerAPIUnavailable as e:
+            # The CLI fallback reports the outcome to the breaker
+            current_app.logger.warning(f"Docker Engine API unavailable, falling back to CLI: {e}")
+        except DockerAPITimeout:
+            current_app.logger.error("Docker Engine API request timed out")
+            breaker.record_failure("Engine API request timed out")
+            return {"error": "Command timed out", "success": False}, 408
+        except AdmissionTimeout as e:
+            current_app.logger.warning(str(e))
+            return admission_timeout_response(e)
+        except DockerAPIError as e:
+            current_app.logger.error(f"Docker Engine API request failed: {e.message}")
+            # Like the CLI path, only losing the daemon counts against the breaker;
+            # an error it answered with (even a 500 such as a port already allocated) does not
+            if e.connection_lost:
+                breaker.record_failure(e.message)
+            else:
+                breaker.record_success()
+            if e.status >= 500:
+                return {"success": False, "error": e.message}, e.status
+            return {"success": False, "error": e.message}, e.status if e.status in PASSED_THROUGH_STATUSES else 400
+    return cli()
+
+def shared_read(key, fetch):
+    """Serve a read from the result cache, or run fetch() once for all concurrent callers with the same key
+
+    key starts with the cached resource name. A recently expired entry is
+    served while a background refresh runs, and an older one (up to the
+    cache's max_stale) when the daemon fails. Cache-Control: no-cache on the
+    request skips cached copies, stale or not (the fresh result is still stored).
+    """
+    flights = get_single_flight()
+    run = (lambda: flights.do(key, fetch)) if flights else fetch
+    cache = get_result_cache()
+    if cache is None or cache.ttl(key) <= 0:
+        response, status = run()
+        return dict(response), status
+
+    ttl = cache.ttl(key)
+    cached = None
+    if cache_bypassed():
+        cache.count("bypassed")
+        note_cache_status('bypass')
+    else:
+        cached = cache.get(key)
+        if cached is not None and cached[2] <= ttl:
+            cache.count("hits")
+            note_cache_status('hit', cached[2])
+            return dict(cached[0]), cached[1]
+        if cached is not None and cached[2] <= ttl + cache.stale_while_revalidate:
+            cache.count("stale_hits")
+            cache.refresh(key, run)
+            note_cache_status('stale', cached[2])
+            return dict(cached[0]), cached[1]
+        cache.count("misses")
+        note_cache_status('miss')
+
+    generation = cache.generation(key)
+    response, status = run()
+    if status == 200:
+        cache.put(key, response, status, generation)
+    elif cached is not None and cached[2] <= ttl + cache.max_stale:
+        # Better the last good answer than an error page while the daemon struggles
+        current_app.logger.warning(f"Serving {key[0]} from cache ({int(cached[2])}s old): {response.get('error')}")
+        cache.count("stale_on_error")
+        note_cache_status('stale-if-error', cached[2])
+        return dict(cached[0]), cached[1]
+    return dict(response), status
+
+def _cli_list(command, key, parser):
+    response, status = run_docker_command(command)
+    if status != 200:
+        return response, status
+    return {"success": True, key: parser(response["output"]), "version": content_digest(response["output"])}, 200
+
+def fetch_containers(show_all=False, filters=None, limit=None):
+    """List containers straight from the daemon as parse_container_list rows
+
+    filters maps docker filter names (id, name, label, before, ...) to lists
+    of values. limit returns only the most recently created containers.
+    """
+    filters = dict(filters or {})
+    if limit and not show_all and 'status' not in filters:
+        # --last implies --all; keep the default "running" view explicit
+        filters['status'] = ['running', 'paused', 'restarting']
+
+    def api(client):
+        params = {"all": int(show_all), "limit": limit}
+        if filters:
+            params["filters"] = filters
+        _, data, version = client.get('/containers/json', params=params, digest=True)
+        return {"success": True, "containers": parse_engine_containers(data), "version": version}, 200
+
+    command = ['docker', 'ps', '--no-trunc', '--format', JSON_FORMAT] + (['-a'] if show_all else [])
+    if limit:
+        command += ['--last', str(limit)]
+    for name, values in filters.items():
+        for value in values:
+            command += ['--filter', f"{name}={value}"]
+    return call_backend(api, lambda: _cli_list(command, "containers", parse_container_list))
+
+def fetch_images():
+    """List images straight from the daemon as parse_image_list rows"""
+    def api(client):
+        _, data, version = client.get('/images/json', digest=True)
+        return {"success": True, "images": parse_engine_images(data), "version": version}, 200
+
+    return call_backend(api, lambda: _cli_list(['docker', 'images', '--no-trunc', '--format', JSON_FORMAT], "images", parse_image_list))
+
+def fetch_networks():
+    """List networks straight from the daemon as parse_network_list rows"""
+    def api(client):
+        _, data, version = client.get('/networks', digest=True)
+        return {"success": True, "networks": parse_engine_networks(data), "version": version}, 200
+
+    return call_backend(api, lambda: _cli_list(['docker', 'network', 'ls', '--no-trunc', '--format', JSON_FORMAT], "networks", parse_network_list))
+
+def fetch_volumes():
+    """List volumes straight from the daemon as parse_volume_list rows"""
+    def api(client):
+        _, data, version = client.get('/volumes', digest=True)
+        return {"success": True, "volumes": parse_engine_volumes(data), "version": version}, 200
+
+    return call_backend(api, lambda: _cli_list(['docker', 'volume', 'ls', '--format', JSON_FORMAT], "volumes", parse_volume_list))
+
+def _from_inventory(resource, **kwargs):
+    from utils.inventory import get_inventory
+    inventory = get_inventory()
+    if inventory is None:
+        return None
+    rows = inventory.rows(resource, **kwargs)
+    if rows is None:
+        return None
+    return {"success": True, "source": "inventory", resource: rows, "version": inventory.version(resource)}, 200
+
+def list_containers(show_all=False, filters=None, limit=None):
+    """List containers, served from the live inventory when enabled
+
+    Filters (docker filter names) are pushed down to the daemon, or applied in
+    memory to inventory rows. limit is only honoured by the daemon path; the
+    response's "source" tells callers which one answered.
+    """
+    # Like `docker ps`, a status filter also looks at stopped containers
+    show_all = show_all or bool(filters and 'status' in filters)
+    response = _from_inventory("containers", show_all=show_all)
+    if response:
+        if filters:
+            response[0]["containers"] = filter_containers(response[0]["containers"], filters)
+        return response
+    key = ('containers', show_all, json.dumps(filters, sort_keys=True), limit)
+    response, status = shared_read(key, lambda: fetch_containers(show_all, filters, limit))
+    if status == 200:
+        response["source"] = "daemon"
+    return response, status
+
+def list_images():
+    """List images, served from the live inventory when enabled"""
+    return _from_inventory("images") or shared_read(('images',), fetch_images)
+
+def list_networks():
+    """List networks, served from the live inventory when enabled"""
+    return _from_inventory("networks") or shared_read(('networks',), fetch_networks)
+
+def list_volumes():
+    """List volumes, served from the live inventory when enabled"""
+    return _from_inventory("volumes") or shared_read(('volumes',), fetch_volumes)
+
+def inspect_container(container_id):
+    """Inspect a container; container_info is a list like `docker inspect` prints
+
+    Served from the inspect cache while the inventory keeps it current.
+    """
+    cache = get_inspect_cache()
+    cached = cache.get(container_id)
+    if cached:
+        info, version = cached
+        return {"success": True, "container_info": [info], "version": version, "source": "cache"}, 200
+    epoch = cache.epoch()
+
+    def api(client):
+        _, data, version = client.get(f'/containers/{quote_id(container_id)}/json', digest=True)
+        return {"success": True, "container_info": [data], "version": version}, 200
+
+    def cli():
+        response, status = run_docker_command(['docker', 'inspect', container_id])
+        if status != 200:
+            return response, status
+        try:
+            return {"success": True, "container_info": json.loads(response["output"]),
+                    "version": content_digest(response["output"])}, 200
+        except json.JSONDecodeError:
+            return {"error": "Failed to parse container info"}, 500
+
+    response, status = call_backend(api, cli)
+    if status == 200 and len(response["container_info"]) == 1:
+        cache.put(container_id, response["container_info"][0], response["version"], epoch)
+    return response, status
+
+def _inspect_key(info, ids):
+    # The requested ID or name an inspect result belongs to
+    name = (info.get("Name") or "").lstrip('/')
+    for container_id in ids:
+        if info.get("Id", "").startswith(container_id) or name == container_id:
+            return container_id
+    return None
+
+def inspect_containers(ids, chunk_size=100):
+    """Inspect many containers at once; returns containers {id: info} and errors {id: message}
+
+    The CLI inspects each chunk of chunk_size IDs with a single `docker
+    inspect`. The Engine API has no multi-inspect, so its per-container calls
+    run concurrently over the connection pool. Cached documents are used
+    where available and only the rest is fetched.
+    """
+    cache = get_inspect_cache()
+    cached = {}
+    for container_id in ids:
+        entry = cache.get(container_id)
+        if entry:
+            cached[container_id] = entry[0]
+    missing = [container_id for container_id in ids if container_id not in cached]
+    epoch = cache.epoch()
+
+    def api(client):
+        containers, errors = {}, {}
+
+        def fetch(container_id):
+            try:
+                _, data = client.get(f'/containers/{quote_id(container_id)}/json')
+                containers[container_id] = data
+            except DockerAPITimeout:
+                errors[container_id] = "Command timed out"
+            except DockerAPIError as e:
+                errors[container_id] = e.message
+
+        with ThreadPoolExecutor(max_workers=max(min(len(missing), client.pool_size), 1)) as executor:
+            # list() re-raises DockerAPIUnavailable so call_backend can fall back to the CLI
+            list(executor.map(fetch, missing))
+        return {"success": True, "containers": containers, "errors": errors}, 200
+
+    def cli():
+        containers, errors = {}, {}
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            response, status = run_docker_command(['docker', 'inspect', '--type', 'container'] + chunk, keep_output=True)
+            not_found = parse_missing_objects(response.get("error", "")) if status == 400 else {}
+            if status != 200 and not not_found:
+                return response, status
+            try:
+                items = json.loads(response.get("output") or '[]')
+            except json.JSONDecodeError:
+                return {"error": "Failed to parse container info"}, 500
+            for info in items:
+                key = _inspect_key(info, chunk)
+                if key:
+                    containers[key] = info
+            for container_id in chunk:
+                if container_id not in containers:
+                    errors[container_id] = not_found.get(container_id, f"No such container: {container_id}")
+        return {"success": True, "containers": containers, "errors": errors}, 200
+
+    if not missing:
+        return {"success": True, "containers": cached, "errors": {}}, 200
+    response, status = call_backend(api, cli)
+    if status == 200:
+        for container_id, info in response["containers"].items():
+            cache.put(container_id, info, content_digest(info), epoch)
+        response["containers"].update(cached)
+    return response, status
+
+def container_stats(container_ids=None, concurrency=16):
+    """Typed resource usage (parse_stats_row fields) of containers; all running ones when container_ids is None
+
+    The Engine API samples every container concurrently (each sample takes
+    about a second while the daemon measures CPU), so the whole set costs
+    roughly one sample. The CLI takes one `docker stats --no-stream` call.
+    Returns stats (a list in the order asked for) and errors {id: message}.
+    """
+    def api(client):
+        ids = container_ids
+        if ids is None:
+            _, data = client.get('/containers/json')
+            ids = [container["Id"] for container in data]
+        samples, errors = {}, {}
+
+        def sample(container_id):
+            try:
+                _, data = client.get(f'/containers/{quote_id(container_id)}/stats', params={"stream": 0}, metered=False)
+                samples[container_id] = parse_engine_stats(data)
+            except DockerAPITimeout:
+                errors[container_id] = "Command timed out"
+            except DockerAPIError as e:
+                errors[container_id] = e.message
+
+        if ids:
+            # One read slot for the whole fan-out, like the single `docker stats` process of the CLI
+            with client.admitted('read'), ThreadPoolExecutor(max_workers=max(min(len(ids), concurrency), 1)) as executor:
+                list(executor.map(sample, ids))
+        return {"success": True, "stats": [samples[i] for i in ids if i in samples], "errors": errors}, 200
+
+    def cli():
+        command = ['docker', 'stats', '--no-stream', '--no-trunc', '--format', JSON_FORMAT] + list(container_ids or [])
+        response, status = run_docker_command(command, keep_output=True)
+        errors = parse_missing_objects(response.get("error", "")) if status == 400 else {}
+        if status != 200 and not errors:
+            return response, status
+        rows = [parse_stats_row(item) for item in iter_json_lines(response.get("output") or '')]
+        return {"success": True, "stats": rows, "errors": errors}, 200
+
+    if container_ids is not None and not container_ids:
+        return {"success": True, "stats": [], "errors": {}}, 200
+    return call_backend(api, cli)
+
+def inspect_image(image):
+    """Inspect a local image; image_info is the single inspect object (RepoDigests, Id, ...)"""
+    def api(client):
+        _, data = client.get(f'/images/{quote_id(image)}/json')
+        return {"success": True, "image_info": data}, 200
+
+    def cli():
+        response, status = run_docker_command(['docker', 'image', 'inspect', image])
+        if status != 200:
+            return response, status
+        try:
+            return {"success": True, "image_info": json.loads(response["output"])[0]}, 200
+        except (json.JSONDecodeError, IndexError):
+            return {"error": "Failed to parse image info"}, 500
+
+    return call_backend(api, cli)
+
+def registry_digest(image):
+    """Digest the registry currently serves for image, or None when it cannot be resolved
+
+    The Engine API has GET /distribution/<name>/json for this; the CLI asks
+    `docker buildx imagetools inspect`, which needs the buildx plugin.
+    """
+    if not use_engine_api():
+        response, status = run_docker_command(['docker', 'buildx', 'imagetools', 'inspect', '--format', '{{json .Manifest}}', image])
+        if status != 200:
+            current_app.logger.warning(f"Could not resolve the registry digest of {image}: {response.get('error')}")
+            return None
+        try:
+            return json.loads(response["output"]).get("digest")
+        except (ValueError, AttributeError):
+            return None
+    try:
+        auth = registry_auth_header(image)
+        _, data = get_docker_api().request('GET', f'/distribution/{quote_id(image)}/json',
+                                           headers={"X-Registry-Auth": auth} if auth else None)
+        return (data.get("Descriptor") or {}).get("digest")
+    except (DockerAPIUnavailable, DockerAPITimeout, DockerAPIError, AdmissionTimeout) as e:
+        current_app.logger.warning(f"Could not resolve the registry digest of {image}: {e}")
+        return None
+
+def container_action(container_id, action):
+    """Start, stop or restart a container"""
+    def api(client):
+        client.post(f'/containers/{quote_id(container_id)}/{action}')
+        return {"success": True, "output": container_id}, 200
+
+    response = call_backend(api, lambda: run_docker_command(['docker', action, container_id]))
+    # Don't wait for the event to drop the cached inspect document
+    get_inspect_cache().invalidate(container_id)
+    return response
+
+def remove_container(container_id, force=False):
+    """Remove a container"""
+    def api(client):
+        client.delete(f'/containers/{quote_id(container_id)}', params={"force": int(force)})
+        return {"success": True, "output": container_id}, 200
+
+    response = call_backend(api, lambda: run_docker_command(['docker', 'rm'] + (['--force'] if force else []) + [container_id]))
+    get_inspect_cache().invalidate(container_id)
+    return response
+
+def remove_image(image_id, force=False):
+    """Remove an image"""
+    def api(client):
+        _, data = client.delete(f'/images/{quote_id(image_id)}', params={"force": int(force)})
+        lines = []
+        for item in data or []:
+            for key, value in item.items():
+                lines.append(f"{key}: {value}")
+        return {"success": True, "output": '\n'.join(lines)}, 200
+
+    return call_backend(api, lambda: run_docker_command(['docker', 'rmi'] + (['--force'] if force else []) + [image_id]))
+
+def create_network(name, driver='bridge'):
+    """Create a network"""
+    def api(client):
+        _, data = client.post('/networks/create', body={"Name": name, "Driver": driver})
+        return {"success": True, "output": data.get("Id", "")}, 200
+
+    return call_backend(api, lambda: run_docker_command(['docker', 'network', 'create', '--driver', driver, name]))
+
+def remove_network(network_name):
+    """Remove a network"""
+    def api(client):
+        client.delete(f'/networks/{quote_id(network_name)}')
+        return {"success": True, "output": network_name}, 200
+
+    return call_backend(api, lambda: run_docker_command(['docker', 'network', 'rm', network_name]))
+
+def create_volume(name):
+    """Create a volume"""
+    def api(client):
+        _, data = client.post('/volumes/create', body={"Name": name})
+        return {"success": True, "output": data.get("Name", name)}, 200
+
+    return call_backend(api, lambda: run_docker_command(['docker', 'volume', 'create', name]))
+
+def remove_volume(volume_name):
+    """Remove a volume"""
+    def api(client):
+        client.delete(f'/volumes/{quote_id(volume_name)}')
+        return {"success": True, "output": volume_name}, 200
+
+    return call_backend(api, lambda: run_docker_command(['docker', 'volume', 'rm', volume_name]))
+
+def system_info():
+    """Docker system information in the parse_docker_info layout"""
+    def api(client):
+        _, data = client.get('/info')
+        info = parse_engine_info(data)
+        return {"success": True, "system_info": info, "version": content_digest(info)}, 200
+
+    def cli():
+        response, status = run_docker_command("docker info")
+        if status != 200:
+            return response, status
+        try:
+            info = parse_docker_info(response["output"])
+            return {"success": True, "system_info": info, "version": content_digest(info)}, 200
+        except Exception as e:
+            return {"success": False, "error": f"Failed to parse system info: {str(e)}"}, 500
+
+    # system_info and system_summary requests arriving together share one `docker info`
+    return shared_read(('info',), lambda: call_backend(api, cli))
+
+def _event_nanos(event):
+    """An event's timestamp in nanoseconds, or None when it has none"""
+    if event.get("timeNano"):
+        return int(event["timeNano"])
+    if event.get("time"):
+        return int(event["time"]) * 1_000_000_000
+    return None
+
+def stream_events(since, until, types=None):
+    """Yield Docker events (decoded JSON dicts) between two unix timestamps
+
+    The stream follows live events until `until` is reached. Connection
+    problems raise an exception so that callers can resynchronise.
+    """
+    filters = {"type": list(types)} if types else None
+    last_seen = None
+    if use_engine_api():
+        try:
+            with get_docker_api().stream('GET', '/events', params={
+                "since": f"{since:.3f}", "until": f"{until:.3f}", "filters": filters
+            }, timeout=max(until - time.time(), 0) + 30) as response:
+                for event in iter_json_lines(response):
+                    last_seen = _event_nanos(event) or last_seen
+                    yield event
+            return
+        except DockerAPIUnavailable as e:
+            current_app.logger.warning(f"Docker Engine API unavailable, falling back to CLI: {e}")
+
+    if last_seen is not None:
+        # Resume where the API stream stopped (rounded down to the CLI's millisecond --since)
+        since = max(since, last_seen // 1_000_000 / 1000)
+    args = ['docker', 'events', '--format', '{{json .}}', '--since', f"{since:.3f}", '--until', f"{until:.3f}"]
+    for event_type in types or []:
+        args += ['--filter', f"type={event_type}"]
+    process = start_docker_process(args, merge_stderr=False)
+    try:
+        for event in iter_json_lines(process.stdout):
+            # Skip what the API stream already yielded
+            if last_seen is not None and (_event_nanos(event) or 0) <= last_seen:
+                continue
+            yield event
+        if process.wait() != 0:
+            raise RuntimeError(f"docker events exited with {process.returncode}: {process.stderr.read().strip()}")
+    finally:
+        stop_docker_process(process)
+
+def _log_args(container_id, follow, tail, since, until, timestamps):
+    args = ['docker', 'logs', '--tail', str(tail)]
+    if follow:
+        args.append('--follow')
+    if timestamps:
+        args.append('--timestamps')
+    if since is not None:
+        args += ['--since', f"{since:.3f}"]
+    if until is not None:
+        args += ['--until', f"{until:.3f}"]
+    return args + [container_id]
+
+def _log_record(stream, line, timestamps):
+    record = {"stream": stream}
+    if timestamps:
+        stamp, _, line = line.partition(' ')
+        record["timestamp"] = stamp
+    record["line"] = line
+    return record
+
+def _pipe_log_lines(pipe, stream, timestamps, max_line):
+    # readline(max_line) splits overlong lines so a single line cannot exhaust memory;
+    # only the first piece of a split line carries the timestamp prefix
+    continued = False
+    for line in iter(lambda: pipe.readline(max_line), ''):
+        complete = line.endswith('\n')
+        yield _log_record(stream, line.rstrip('\r\n'), timestamps and not continued)
+        continued = not complete
+
+class _DecodedLines:
+    """readline() over a binary HTTP response, decoded as UTF-8"""
+
+    def __init__(self, response):
+        self.response = response
+
+    def readline(self, limit):
+        return self.response.readline(limit).decode('utf-8', errors='replace')
+
+def _engine_log_lines(response, tty, timestamps, max_line):
+    """Split an Engine API log stream into records, demultiplexing stdout/stderr frames"""
+    if tty:
+        # TTY containers send one raw stream
+        yield from _pipe_log_lines(_DecodedLines(response), 'stdout', timestamps, max_line)
+        return
+
+    pending = {'stdout': b'', 'stderr': b''}
+    continued = {'stdout': False, 'stderr': False}
+    while True:
+        # Frame header: stream type (1 stdout, 2 stderr), 3 bytes padding, big-endian payload size
+        header = response.read(8)
+        if len(header) < 8:
+            break
+        stream = 'stderr' if header[0] == 2 else 'stdout'
+        buffer = pending[stream] + response.read(int.from_bytes(header[4:], 'big'))
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield _log_record(stream, line.decode('utf-8', errors='replace').rstrip('\r'), timestamps and not continued[stream])
+            continued[stream] = False
+        if len(buffer) > max_line:
+            # Flush overlong partial lines so a single line cannot exhaust memory
+            yield _log_record(stream, buffer.decode('utf-8', errors='replace'), timestamps and not continued[stream])
+            continued[stream] = True
+            buffer = b''
+        pending[stream] = buffer
+    for stream, buffer in pending.items():
+        if buffer:
+            yield _log_record(stream, buffer.decode('utf-8', errors='replace'), timestamps and not continued[stream])
+
+def container_logs(container_id, tail='100', since=None, until=None, timestamps=False):
+    """Fetch the last lines of a container's logs in one response"""
+    return run_docker_command(_log_args(container_id, False, tail, since, until, timestamps))
+
+def open_log_stream(container_id, follow=True, tail='all', since=None, until=None, timestamps=False, tty=False, max_line=16384):
+    """Start streaming a container's logs as {"stream", "line"[, "timestamp"]} records
+
+    On success the response carries `sources`, iterables that block on the
+    upstream pipe or socket (drain them on separate threads, see
+    utils.streaming.StreamPump), and `close`, which stops the upstream
+    process or connection. tty must match the container's Config.Tty.
+    """
+    def api(client):
+        params = {"stdout": 1, "stderr": 1, "follow": int(follow), "timestamps": int(timestamps), "tail": tail}
+        if since is not None:
+            params["since"] = f"{since:.3f}"
+        if until is not None:
+            params["until"] = f"{until:.3f}"
+        stack = ExitStack()
+        response = stack.enter_context(client.stream('GET', f'/containers/{quote_id(container_id)}/logs', params=params))
+
+        def close():
+            response.abort()
+            stack.close()
+
+        return {"success": True, "sources": [_engine_log_lines(response, tty, timestamps, max_line)], "close": close}, 200
+
+    def cli():
+        process = start_docker_process(_log_args(container_id, follow, tail, since, until, timestamps), merge_stderr=False)
+        return {"success": True, "close": lambda: stop_docker_process(process), "sources": [
+            _pipe_log_lines(process.stdout, 'stdout', timestamps, max_line),
+            _pipe_log_lines(process.stderr, 'stderr', timestamps, max_line)
+        ]}, 200
+
+    return call_backend(api, cli)
+
+def normalize_image_ref(image):
+    """Add the implicit :latest tag, so "nginx" and "nginx:latest" name the same pull"""
+    image = image.strip()
+    if '@' in image or ':' in image.rsplit('/', 1)[-1]:
+        return image
+    return f"{image}:latest"
+
+def open_pull_stream(image):
+    """Start pulling an image and return its progress as parse_pull_progress events
+
+    Like open_log_stream, the response carries `events` (an iterable that
+    blocks on the upstream) and `close`. The Engine API reports byte
+    progress per layer; the CLI only reports layer status changes.
+    """
+    image = normalize_image_ref(image)
+
+    def api(client):
+        auth = registry_auth_header(image)
+        stack = ExitStack()
+        response = stack.enter_context(client.stream('POST', '/images/create', params={"fromImage": image},
+                                                     headers={"X-Registry-Auth": auth} if auth else None))
+
+        def close():
+            response.abort()
+            stack.close()
+
+        return {"success": True, "close": close,
+                "events": (parse_pull_progress(item) for item in iter_json_lines(response))}, 200
+
+    def cli():
+        try:
+            process = start_docker_process(pull_command(image), stdin=subprocess.DEVNULL)
+        except AdmissionTimeout as e:
+            return admission_timeout_response(e)
+
+        def events():
+            for line in process.stdout:
+                event = parse_pull_line(line)
+                if event:
+                    yield event
+            if process.wait() != 0:
+                yield {"error": f"docker pull exited with code {process.returncode}"}
+
+        return {"success": True, "close": lambda: stop_docker_process(process), "events": events()}, 200
+
+    return call_backend(api, cli)
+
+# Request body chunk size when piping an uploaded build context
+BUILD_CONTEXT_CHUNK = 64 * 1024
+
+def _context_chunks(context):
+    return iter(lambda: context.read(BUILD_CONTEXT_CHUNK), b'')
+
+def _build_summary(events, tags):
+    """Relay build events and finish with a summary of the outcome"""
+    started = time.monotonic()
+    image_id = error = None
+    for event in events:
+        image_id = event.get("image_id", image_id)
+        error = error or event.get("error")
+        yield event
+    yield {
+        "status": "failed" if error or not image_id else "complete",
+        "image_id": image_id,
+        "tags": list(tags),
+        "error": error or (None if image_id else "Build finished without producing an image"),
+        "seconds": round(time.monotonic() - started, 3)
+    }
+
+def build_context_command(options):
+    """argv for `docker build -` reading a tar context from stdin"""
+    args = ['docker', 'build', '--progress=plain']
+    for tag in options.get('tags', []):
+        args += ['-t', tag]
+    args += ['-f', options.get('dockerfile') or 'Dockerfile']
+    if options.get('target'):
+        args += ['--target', options['target']]
+    if options.get('platform'):
+        args += ['--platform', options['platform']]
+    for key, value in (options.get('build_args') or {}).items():
+        args += ['--build-arg', f"{key}={value}"]
+    for source in options.get('cache_from', []):
+        args += ['--cache-from', source]
+    if options.get('no_cache'):
+        args.append('--no-cache')
+    if options.get('pull'):
+        args.append('--pull')
+    return args + ['-']
+
+def open_build_stream(context, options):
+    """Build an image from an uploaded tar (optionally compressed) context
+
+    context is a readable binary stream (the request body); it is piped to
+    the daemon in BUILD_CONTEXT_CHUNK pieces and never staged. options holds
+    tags, dockerfile, target, platform, build_args, cache_from, no_cache and
+    pull. Returns sources/close like open_log_stream; the events are
+    {"line"}, {"image_id"} and {"error"}, followed by a summary.
+
+    The Engine API path uses the classic builder, whose cache_from takes
+    image references. BuildKit cache specs ("type=registry,ref=...") need
+    the CLI, which builds with BuildKit where available.
+    """
+    tags = options.get('tags', [])
+    buildkit_cache = any('=' in source for source in options.get('cache_from', []))
+
+    def api(client):
+        params = {
+            "t": tuple(tags),
+            "dockerfile": options.get('dockerfile') or 'Dockerfile',
+            "target": options.get('target'),
+            "platform": options.get('platform'),
+            "buildargs": options.get('build_args') or None,
+            "cachefrom": options.get('cache_from') or None,
+            "nocache": int(bool(options.get('no_cache'))),
+            "pull": int(bool(options.get('pull'))),
+            "rm": 1
+        }
+        sent = {"bytes": 0}
+
+        def body():
+            for chunk in _context_chunks(context):
+                sent["bytes"] += len(chunk)
+                yield chunk
+
+        stack = ExitStack()
+        try:
+            # The upload happens here; the daemon only answers once it has the whole context
+            response = stack.enter_context(client.stream('POST', '/build', params=params, body=body(),
+                                                         headers={"Content-Type": "application/x-tar"}))
+        except DockerAPIUnavailable as e:
+            if sent["bytes"]:
+                # Part of the body is gone, so the CLI fallback cannot replay it
+                raise DockerAPIError(502, f"Build context upload failed: {e}")
+            raise
+
+        def close():
+            response.abort()
+            stack.close()
+
+        def events():
+            for item in iter_json_lines(response):
+                yield from parse_build_message(item)
+
+        return {"success": True, "close": close, "sources": [_build_summary(events(), tags)]}, 200
+
+    def cli():
+        try:
+            process = start_docker_process(build_context_command(options), stdin=subprocess.PIPE)
+        except AdmissionTimeout as e:
+            return admission_timeout_response(e)
+
+        def feed():
+            # Runs beside the log reader, so output streams while the context uploads
+            try:
+                for chunk in _context_chunks(context):
+                    process.stdin.buffer.write(chunk)
+            except (OSError, ValueError):
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except (OSError, ValueError):
+                    pass
+
+        def events():
+            for line in process.stdout:
+                yield parse_build_line(line)
+            if process.wait() != 0:
+                yield {"error": f"docker build exited with code {process.returncode}"}
+
+        threading.Thread(target=feed, name='dokemon-build-context', daemon=True).start()
+        return {"success": True, "close": lambda: stop_docker_process(process),
+                "sources": [_build_summary(events(), tags)]}, 200
+
+    if buildkit_cache:
+        return cli()
+    return call_backend(api, cli)
+
+def pull_command(image):
+    """argv for `docker pull`"""
+    return ['docker', 'pull', image]
+
+def build_command(tag, path='.', dockerfile='Dockerfile'):
+    """argv for `docker build` of a context directory on the daemon host"""
+    return ['docker', 'build', '-t', tag, '-f', dockerfile, path]
+
+def run_command(data):
+    """argv for `docker run` from a run request body (image, name, ports, volumes, ...)"""
+    args = ['docker', 'run']
+    if data.get('detached', True):
+        args.append('-d')
+    if data.get('name'):
+        args += ['--name', data['name']]
+    for port in data.get('ports', []):
+        args += ['-p', port if ':' in str(port) else f"{port}:{port}"]
+    for volume in data.get('volumes', []):
+        args += ['-v', volume]
+    for env in data.get('environment', []):
+        args += ['-e', env]
+    args.append(data['image'])
+    command = data.get('command', '')
+    if command:
+        args += shlex.split(command) if isinstance(command, str) else list(command)
+    return args
+
+def prune_command():
+    """argv for a non-interactive `docker system prune`"""
+    return ['docker', 'system', 'prune', '--force']
@@ -4,27 +4,56 @@ import subprocess
 import json
 import os
 from flask import current_app
+from utils.admission import get_admission_control, command_class, admission_timeout_response, AdmissionTimeout
+from utils.circuit_breaker import get_circuit_breaker, circuit_open_response
+from utils.daemon_health import get_daemon_health, DAEMON_DOWN_MARKERS
+from utils.singleflight import get_single_flight, read_command_key
 
-def run_docker_command(command):
-    """Execute a docker command and return the result"""
+def run_docker_command(command, keep_output=False):
+    """Execute a docker command and return the result
+
+    With keep_output a failed command's stdout is returned as well, for
+    commands like `docker inspect a b` that print what they found before
+    failing on the rest. Read-only commands issued while an identical one
+    is already running wait for it and share its result instead.
+    """
+    flights = get_single_flight()
+    key = read_command_key(command) if flights else None
+    if key is None:
+        return _execute_docker_command(command, keep_output)
+    response, status = flights.do((key, keep_output), lambda: _execute_docker_command(command, keep_output), shared=True)
+    # Every caller gets its own response dict to annotate
+    return dict(response), status
+
+def _execute_docker_command(command, keep_output=False):
+    # After repeated daemon failures, fail fast instead of paying for probes and timeouts
+    breaker = get_circuit_breaker()
+    if not breaker.allow():
+        return circuit_open_response(breaker)
+    # Wait for a free slot of the command's class, shared by every worker
+    admission = get_admission_control()
+    klass = command_class(command)
     try:
-        # First, test Docker connectivity
-        try:
-            version_timeout = current_app.config.get('DOCKER_VERSION_TIMEOUT', 10)
-            version_result = subprocess.run(['docker', '--version'], capture_output=True, check=True, timeout=version_timeout, text=True)
-            current_app.logger.info(f"Docker version check passed: {version_result.stdout.strip()}")
-        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
-            current_app.logger.error(f"Docker version check failed: {e}")
-            return {"error": "Docker is not accessible. Is Docker running?", "success": False}, 500
-        
-        # Test Docker daemon connectivity
-        try:
-            daemon_timeout = current_app.config.get('DOCKER_VERSION_TIMEOUT', 10)
-            daemon_result = subprocess.run(['docker', 'info'], capture_output=True, check=True, timeout=daemon_timeout, text=True)
-            current_app.logger.info("Docker daemon connectivity verified")
-        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
-            current_app.logger.error(f"Docker daemon connectivity failed: {e}")
-            return {"error": "Failed to connect to Docker daemon. Check Docker socket permissions.", "success": False}, 500
+        slot = admission.acquire(klass) if admission else None
+    except AdmissionTimeout as e:
+        current_app.logger.warning(str(e))
+        return admission_timeout_response(e)
+    try:
+        return _run_checked_command(command, keep_output, breaker)
+    finally:
+        if admission:
+            admission.release(klass, slot)
+
+def _run_checked_command(command, keep_output, breaker):
+    try:
+        # Check the cached daemon state; only probe when it is stale or unhealthy
+        health = get_daemon_health()
+        if not health.is_usable():
+            state = health.probe()
+            if not state["healthy"]:
+                current_app.logger.error(f"Docker connectivity check failed: {state['detail']}")
+                breaker.record_failure(state["detail"])
+                return {"error": state["error"], "success": False}, 500
         
         # Execute the actual command
         timeout = current_app.config.get('DOCKER_TIMEOUT', 30)
@@ -39,13 +68,72 @@ def run_docker_command(command):
         current_app.logger.info(f"Docker command completed with return code: {result.returncode}")
         
         if result.returncode == 0:
+            breaker.record_success()
             return {"success": True, "output": result.stdout.strip()}, 200
         else:
             current_app.logger.error(f"Docker command failed: {result.stderr.strip()}")
+            if any(marker in result.stderr for marker in DAEMON_DOWN_MARKERS):
+                health.mark_unhealthy(result.stderr.strip())
+                breaker.record_failure(result.stderr.strip())
+            else:
+                # The daemon answered, even if with an error
+                breaker.record_success()
+            if keep_output:
+                return {"success": False, "error": result.stderr.strip(), "output": result.stdout.strip()}, 400
             return {"success": False, "error": result.stderr.strip()}, 400
     except subprocess.TimeoutExpired:
         current_app.logger.error("Docker command timed out")
+        breaker.record_failure("Command timed out")
         return {"error": "Command timed out", "success": False}, 408
     except Exception as e:
         current_app.logger.error(f"Unexpected error executing Docker command: {e}")
+        breaker.record_failure(str(e))
         return {"error": str(e), "success": False}, 500
+
+def start_docker_process(args, stdin=None, merge_stderr=True, queue_timeout=None):
+    """Start a long-running docker CLI process with its output piped for streaming
+
+    Unlike run_docker_command this returns immediately with the Popen object;
+    callers read stdout line by line and must terminate the process when done.
+    Pulls, builds and the like hold an admission slot until then, and raise
+    AdmissionTimeout when none frees up within queue_timeout.
+    """
+    admission = get_admission_control()
+    klass = command_class(args, process=True)
+    slot = admission.acquire(klass, queue_timeout) if admission and klass else None
+    current_app.logger.info(f"Starting Docker process: {' '.join(args)}")
+    try:
+        process = subprocess.Popen(
+            args,
+            stdin=stdin,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1
+        )
+    except Exception:
+        if slot is not None:
+            admission.release(klass, slot)
+        raise
+    process.admission_slot = (admission, klass, slot) if slot is not None else None
+    return process
+
+def stop_docker_process(process, timeout=5):
+    """Terminate a process started by start_docker_process and reap it"""
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    for stream in (process.stdout, process.stderr, process.stdin):
+        if stream:
+            stream.close()
+    admission_slot = getattr(process, 'admission_slot', None)
+    if admission_slot:
+        process.admission_slot = None
+        admission, klass, slot = admission_slot
+        admission.release(klass, slot)
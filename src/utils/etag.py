@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+from flask import current_app, jsonify, request
+
+def content_digest(data):
+    """Short, fast content hash of raw daemon output (str or bytes) or a JSON-able value"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    elif not isinstance(data, (bytes, bytearray)):
+        data = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+def conditional_jsonify(version, build):
+    """jsonify(build()) with an ETag, or a bare 304 when If-None-Match matches
+
+    version identifies the underlying data (a digest of the daemon output or
+    an inventory generation). The ETag also covers the request path and query
+    string, so filters, projections and pages each get their own tag. build is
+    only called when the body is actually needed.
+    """
+    if not version:
+        return jsonify(build())
+
+    etag = content_digest(f"{version}|{request.full_path}")
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    # Let clients and proxies keep the body but always revalidate it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+from collections import OrderedDict
+from flask import current_app
+
+class InspectCache:
+    """Bounded LRU of parsed `docker inspect` documents, keyed by the ID or name asked for
+
+    An entry is only as good as the events that would invalidate it, so the
+    cache is consulted only while this worker's inventory is following the
+    daemon's event stream. Any container event drops that container's
+    entries, and a resync (when events may have been missed) drops them all.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "evictions": 0, "invalidations": 0}
+        self._entries = OrderedDict()
+        self._keys_by_id = {}
+        # Bumped by every invalidation; a fetch that started before one is not stored
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def usable(self):
+        from utils.inventory import get_inventory
+        if self.max_entries <= 0:
+            return False
+        inventory = get_inventory()
+        return inventory is not None and inventory.is_live()
+
+    def epoch(self):
+        return self._epoch
+
+    def get(self, key):
+        """Cached (info, version) for key, or None"""
+        if not self.usable():
+            with self._lock:
+                self.stats["bypassed"] += 1
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1], entry[2]
+
+    def put(self, key, info, version, epoch):
+        """Store an inspect document fetched after epoch() returned epoch"""
+        if not self.usable():
+            return
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._drop(key)
+            full_id = info.get("Id", "")
+            self._entries[key] = (full_id, info, version)
+            self._keys_by_id.setdefault(full_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_id.get(entry[0])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_id[entry[0]]
+
+    def invalidate(self, container_id):
+        """Drop every entry for a container, given its full ID, a prefix of it or a cached name"""
+        with self._lock:
+            self._epoch += 1
+            self.stats["invalidations"] += 1
+            ids = {entry[0] for key, entry in self._entries.items()
+                   if key == container_id or entry[1].get("Name", "").lstrip('/') == container_id}
+            ids.update(full_id for full_id in self._keys_by_id if full_id.startswith(container_id))
+            for full_id in ids:
+                for key in list(self._keys_by_id.get(full_id, ())):
+                    self._drop(key)
+            self._drop(container_id)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._keys_by_id.clear()
+
+    def snapshot(self):
+        with self._lock:
+            size = len(self._entries)
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "hit_ratio": round(stats["hits"] / lookups, 3) if lookups else None,
+            **stats
+        }
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+def get_inspect_cache():
+    """Per-process InspectCache"""
+    global _cache, _cache_pid
+    pid = os.getpid()
+    if _cache is None or _cache_pid != pid:
+        with _cache_lock:
+            if _cache is None or _cache_pid != pid:
+                _cache = InspectCache(current_app.config.get('INSPECT_CACHE_SIZE', 512))
+                _cache_pid = pid
+    return _cache
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from utils import docker_backend
+from utils.etag import content_digest
+from utils.inspect_cache import get_inspect_cache
+
+RESOURCES = ('containers', 'images', 'networks', 'volumes')
+EVENT_TYPES = ('container', 'image', 'network', 'volume')
+
+# Event actions that can change what the list endpoints return
+CONTAINER_ACTIONS = {
+    'create', 'start', 'restart', 'stop', 'die', 'kill', 'pause', 'unpause',
+    'rename', 'update', 'health_status', 'oom', 'destroy'
+}
+IMAGE_ACTIONS = {'pull', 'tag', 'untag', 'delete', 'import', 'load', 'save', 'prune'}
+NETWORK_ACTIONS = {'create', 'destroy', 'remove', 'prune'}
+VOLUME_ACTIONS = {'create', 'destroy', 'prune'}
+
+def _is_running(container):
+    # `docker ps` without -a shows running, paused and restarting containers
+    return container.get("status", "").startswith(("Up", "Restarting"))
+
+def _container_key(container_id):
+    return container_id[:12]
+
+class Inventory:
+    """In-memory copy of the daemon's objects, kept current by the events stream
+
+    A full snapshot is loaded first, then Docker events are applied
+    incrementally. The stream is followed in segments of resync_interval
+    seconds; every segment ends with a fresh snapshot (which also refreshes
+    relative fields like "2 hours ago" and measures drift), and a stream that
+    breaks early is treated as a gap and resynchronised immediately.
+    """
+
+    def __init__(self, app, resync_interval=300, max_lag=30):
+        self.app = app
+        self.resync_interval = resync_interval
+        self.max_lag = max_lag
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._containers = {}
+        self._lists = {"images": [], "networks": [], "volumes": []}
+        self._generation = {resource: 0 for resource in RESOURCES}
+        self._versions = {}
+        self._ready = False
+        self._connected = False
+        self._synced_at = None
+        self._last_event_at = None
+        self.stats = {
+            "events_applied": 0,
+            "events_ignored": 0,
+            "resyncs": 0,
+            "gaps": 0,
+            "last_event_lag_ms": None,
+            "last_drift": {resource: 0 for resource in RESOURCES},
+            "last_error": None
+        }
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='dokemon-inventory', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_live(self):
+        """True when the snapshot is loaded and the events stream is attached"""
+        return self._ready and self._connected
+
+    def rows(self, resource, show_all=True):
+        """Rows for a list endpoint, or None when the inventory cannot be trusted"""
+        if not self.is_live():
+            return None
+        with self._lock:
+            if resource == 'containers':
+                return [c for c in self._containers.values() if show_all or _is_running(c)]
+            return list(self._lists[resource])
+
+    def generation(self, resource):
+        """Change counter for a resource; bumps every time its rows change"""
+        return self._generation[resource]
+
+    def version(self, resource):
+        """Content digest of a resource's rows, recomputed only when its generation changes
+
+        Unlike the generation number it is identical across workers holding the
+        same data, so it can back ETags behind a load-balanced set of workers.
+        """
+        with self._lock:
+            generation = self._generation[resource]
+            cached = self._versions.get(resource)
+            if cached and cached[0] == generation:
+                return cached[1]
+            rows = list(self._containers.values()) if resource == 'containers' else self._lists[resource]
+            digest = content_digest(rows)
+            self._versions[resource] = (generation, digest)
+            return digest
+
+    def _run(self):
+        with self.app.app_context():
+            backoff = 1
+            while not self._stop.is_set():
+                since = time.time() - 1
+                until = since + self.resync_interval
+                try:
+                    self.resync()
+                    self._follow(since, until)
+                    backoff = 1
+                    if time.time() < until and not self._stop.is_set():
+                        # The stream ended before its deadline: we may have missed events
+                        self.stats["gaps"] += 1
+                        self._connected = False
+                except Exception as e:
+                    self.stats["gaps"] += 1
+                    self.stats["last_error"] = str(e)
+                    current_app.logger.error(f"Inventory event stream failed: {e}")
+                    self._connected = False
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, 30)
+            self._connected = False
+
+    def resync(self):
+        """Load a full snapshot of every resource and replace the current state"""
+        # Events may have been missed since the last snapshot
+        get_inspect_cache().clear()
+        snapshot = {}
+        for resource, fetch, kwargs in (
+            ('containers', docker_backend.fetch_containers, {"show_all": True}),
+            ('images', docker_backend.fetch_images, {}),
+            ('networks', docker_backend.fetch_networks, {}),
+            ('volumes', docker_backend.fetch_volumes, {})
+        ):
+            response, status = fetch(**kwargs)
+            if status != 200:
+                raise RuntimeError(f"Failed to load {resource}: {response.get('error')}")
+            snapshot[resource] = response[resource]
+
+        with self._lock:
+            containers = {_container_key(c["container_id"]): c for c in snapshot['containers']}
+            drift = {'containers': self._drift(self._containers, containers)}
+            self._set_containers(containers)
+            for resource in ('images', 'networks', 'volumes'):
+                drift[resource] = self._drift(self._keyed(resource, self._lists[resource]), self._keyed(resource, snapshot[resource]))
+                self._lists[resource] = snapshot[resource]
+                if drift[resource] or not self._ready:
+                    self._generation[resource] += 1
+            if self._ready:
+                self.stats["last_drift"] = drift
+            self.stats["resyncs"] += 1
+            self._synced_at = time.time()
+            self._ready = True
+
+    def _keyed(self, resource, rows):
+        key = {"images": "image_id", "networks": "network_id", "volumes": "volume_name"}[resource]
+        return {(row.get(key), row.get("tag")): row for row in rows}
+
+    def _drift(self, old, new):
+        # Objects added, removed or moved between running and stopped since the last snapshot
+        changed = set(old) ^ set(new)
+        for key in set(old) & set(new):
+            if _is_running(old[key]) != _is_running(new[key]):
+                changed.add(key)
+        return len(changed)
+
+    def _set_containers(self, containers):
+        self._containers = containers
+        self._generation['containers'] += 1
+
+    def _follow(self, since, until):
+        self._connected = True
+        for event in docker_backend.stream_events(since, until, types=EVENT_TYPES):
+            if self._stop.is_set():
+                break
+            self.apply_event(event)
+
+    def apply_event(self, event):
+        """Apply one Docker event to the in-memory state"""
+        event_type = event.get("Type")
+        action = (event.get("Action") or "").split(':')[0]
+        actor_id = (event.get("Actor") or {}).get("ID") or event.get("id", "")
+        self._invalidate_inspect(event_type, action, event)
+
+        if event_type == 'container' and action in CONTAINER_ACTIONS:
+            self._refresh_container(actor_id, removed=(action == 'destroy'))
+        elif event_type == 'image' and action in IMAGE_ACTIONS:
+            self._refresh_list('images', docker_backend.fetch_images)
+        elif event_type == 'network' and action in NETWORK_ACTIONS:
+            self._refresh_list('networks', docker_backend.fetch_networks)
+        elif event_type == 'volume' and action in VOLUME_ACTIONS:
+            self._refresh_list('volumes', docker_backend.fetch_volumes)
+        else:
+            self.stats["events_ignored"] += 1
+            return
+
+        self.stats["events_applied"] += 1
+        self._last_event_at = time.time()
+        if event.get("timeNano"):
+            self.stats["last_event_lag_ms"] = round((self._last_event_at - event["timeNano"] / 1e9) * 1000, 2)
+
+    def _invalidate_inspect(self, event_type, action, event):
+        # Any container event (exec, attach, ...) may change its inspect document,
+        # and network (dis)connects change the container's NetworkSettings
+        if event_type == 'container':
+            container_id = (event.get("Actor") or {}).get("ID") or event.get("id", "")
+        elif event_type == 'network' and action in ('connect', 'disconnect'):
+            container_id = ((event.get("Actor") or {}).get("Attributes") or {}).get("container")
+        else:
+            return
+        if container_id:
+            get_inspect_cache().invalidate(container_id)
+
+    def _refresh_container(self, container_id, removed=False):
+        key = _container_key(container_id)
+        row = None
+        if not removed:
+            response, status = docker_backend.fetch_containers(show_all=True, filters={"id": [container_id]})
+            if status != 200:
+                raise RuntimeError(f"Failed to refresh container {key}: {response.get('error')}")
+            row = response["containers"][0] if response["containers"] else None
+
+        with self._lock:
+            containers = dict(self._containers)
+            if row is None:
+                containers.pop(key, None)
+            elif key in containers:
+                containers[key] = row
+            else:
+                # `docker ps` lists newest first
+                containers = {key: row, **containers}
+            self._set_containers(containers)
+
+    def _refresh_list(self, resource, fetch):
+        response, status = fetch()
+        if status != 200:
+            raise RuntimeError(f"Failed to refresh {resource}: {response.get('error')}")
+        with self._lock:
+            self._lists[resource] = response[resource]
+            self._generation[resource] += 1
+
+    def snapshot(self):
+        """Status and lag figures for /health and the metrics endpoint"""
+        now = time.time()
+        with self._lock:
+            counts = {"containers": len(self._containers)}
+            counts.update({resource: len(rows) for resource, rows in self._lists.items()})
+        seconds_since_sync = round(now - self._synced_at, 2) if self._synced_at else None
+        return {
+            "ready": self._ready,
+            "stream_connected": self._connected,
+            "live": self.is_live(),
+            "last_sync": datetime.fromtimestamp(self._synced_at).isoformat() if self._synced_at else None,
+            "seconds_since_sync": seconds_since_sync,
+            "seconds_since_event": round(now - self._last_event_at, 2) if self._last_event_at else None,
+            "lagging": (not self.is_live()
+                        or (self.stats["last_event_lag_ms"] or 0) > self.max_lag * 1000
+                        or (seconds_since_sync or 0) > self.resync_interval + self.max_lag),
+            "resync_interval": self.resync_interval,
+            "counts": counts,
+            "generation": dict(self._generation),
+            **self.stats
+        }
+
+_inventory = None
+_inventory_pid = None
+_inventory_lock = threading.Lock()
+
+def get_inventory():
+    """Return this worker's Inventory (starting it on first use), or None when disabled"""
+    global _inventory, _inventory_pid
+    if not current_app.config.get('INVENTORY_ENABLED', False):
+        return None
+    pid = os.getpid()
+    if _inventory is None or _inventory_pid != pid:
+        with _inventory_lock:
+            if _inventory is None or _inventory_pid != pid:
+                config = current_app.config
+                _inventory = Inventory(
+                    current_app._get_current_object(),
+                    resync_interval=config.get('INVENTORY_RESYNC_INTERVAL', 300),
+                    max_lag=config.get('INVENTORY_MAX_LAG', 30)
+                )
+                _inventory.start()
+                _inventory_pid = pid
+    return _inventory
+
+def start_inventory(app):
+    """Start the inventory for a freshly forked worker (called from gunicorn's post_worker_init)"""
+    with app.app_context():
+        get_inventory()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from flask import current_app, jsonify, request
+from utils import docker_backend
+from utils.auth_db import DATABASE_FILE, DATABASE_DIR
+from utils.docker_utils import start_docker_process, stop_docker_process
+from utils.result_cache import get_result_cache, JOB_RESOURCES
+
+JOB_STATES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATES = ('succeeded', 'failed', 'cancelled')
+
+def _require(params, *names):
+    missing = [name for name in names if not params.get(name)]
+    if missing:
+        raise ValueError(f"Missing job parameter(s): {', '.join(missing)}")
+
+def _pull(params):
+    _require(params, 'image')
+    return docker_backend.pull_command(params['image'])
+
+def _build(params):
+    _require(params, 'tag')
+    return docker_backend.build_command(params['tag'], params.get('path', '.'), params.get('dockerfile', 'Dockerfile'))
+
+def _run(params):
+    _require(params, 'image')
+    return docker_backend.run_command(params)
+
+def _prune(params):
+    return docker_backend.prune_command()
+
+# Job kind -> function turning the job's params into a docker argv (raises ValueError)
+JOB_KINDS = {
+    'pull': _pull,
+    'build': _build,
+    'run': _run,
+    'prune': _prune
+}
+# Kinds that can start over on another worker when theirs shuts down (a second `docker run` would not be the same)
+REQUEUE_KINDS = {'pull', 'build', 'prune'}
+
+def parse_limits(value):
+    """Turn "pull=2,build=1" into {"pull": 2, "build": 1}"""
+    limits = {}
+    for item in (value or '').split(','):
+        kind, _, limit = item.partition('=')
+        if kind.strip() and limit.strip():
+            limits[kind.strip()] = int(limit)
+    return limits
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat() if ts else None
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+@contextmanager
+def _connect():
+    conn = sqlite3.connect(DATABASE_FILE, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def init_jobs_table():
+    """Create the jobs table next to the user tables if it does not exist"""
+    if not os.path.exists(DATABASE_DIR):
+        os.makedirs(DATABASE_DIR, exist_ok=True)
+    with _connect() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                pid INTEGER,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                progress TEXT,
+                result TEXT,
+                error TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)')
+
+def job_to_dict(row):
+    """API representation of a jobs table row"""
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "params": json.loads(row["params"]),
+        "created_at": _iso(row["created_at"]),
+        "started_at": _iso(row["started_at"]),
+        "finished_at": _iso(row["finished_at"]),
+        "cancel_requested": bool(row["cancel_requested"]),
+        "progress": json.loads(row["progress"]) if row["progress"] else None,
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"]
+    }
+
+class JobManager:
+    """Runs long docker operations (pull, build, run, prune) in the background
+
+    Jobs are queued in the SQLite jobs table, so every gunicorn worker can
+    report on and cancel any job. Each worker runs a dispatcher thread that
+    claims queued jobs while its executor has free threads and the kind is
+    below its concurrency limit (counted across all workers, the claim runs
+    in an exclusive transaction). A job is a docker CLI process whose output
+    tail is kept as progress and result; finished jobs are deleted after the
+    retention period.
+    """
+
+    def __init__(self, app, workers=4, limits=None, retention=3600, timeout=3600,
+                 output_lines=200, poll_interval=1.0):
+        self.app = app
+        self.workers = workers
+        self.limits = limits or {}
+        self.retention = retention
+        self.timeout = timeout
+        self.output_lines = output_lines
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dokemon-job')
+        self._running = {}
+        self._handed_back = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        init_jobs_table()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._dispatch_loop, name='dokemon-jobs', daemon=True)
+            self._thread.start()
+
+    def stop(self, grace=0):
+        """Stop claiming jobs and give running ones up to grace seconds to finish
+
+        Jobs still running after that are interrupted; pulls, builds and
+        prunes go back to the queue for another worker to run, others fail.
+        """
+        self._stop.set()
+        self._wake.set()
+        deadline = time.monotonic() + grace
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._running:
+                    return
+            time.sleep(min(0.2, max(deadline - time.monotonic(), 0)))
+        with self._lock:
+            running = dict(self._running)
+        if not running:
+            return
+        marks = ','.join('?' * len(running))
+        with _connect() as conn:
+            jobs = {row["id"]: row for row in conn.execute(
+                f'SELECT id, kind, cancel_requested FROM jobs WHERE id IN ({marks})', list(running))}
+        for job_id, process in running.items():
+            job = jobs.get(job_id)
+            if job and job["kind"] in REQUEUE_KINDS and not job["cancel_requested"]:
+                with self._lock:
+                    self._handed_back.add(job_id)
+                with _connect() as conn:
+                    conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL, pid = NULL, progress = NULL "
+                                 "WHERE id = ? AND status = 'running' AND pid = ?", (job_id, os.getpid()))
+            else:
+                self._update(job_id, status='failed', finished_at=time.time(),
+                             error="Worker shut down before the job finished")
+            if process is not None and process.poll() is None:
+                process.terminate()
+
+    def submit(self, kind, params):
+        """Queue a job; raises ValueError for unknown kinds or bad params"""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}. Valid kinds: {', '.join(sorted(JOB_KINDS))}")
+        params = params or {}
+        if not isinstance(params, dict):
+            raise ValueError("Job params must be an object")
+        JOB_KINDS[kind](params)
+        job_id = uuid.uuid4().hex
+        with _connect() as conn:
+            conn.execute('INSERT INTO jobs (id, kind, status, params, created_at) VALUES (?, ?, ?, ?, ?)',
+                         (job_id, kind, 'queued', json.dumps(params), time.time()))
+        self._wake.set()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with _connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return job_to_dict(row) if row else None
+
+    def list(self, status=None, kind=None, limit=100):
+        query, args = 'SELECT * FROM jobs WHERE 1 = 1', []
+        if status:
+            query += ' AND status = ?'
+            args.append(status)
+        if kind:
+            query += ' AND kind = ?'
+            args.append(kind)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        args.append(limit)
+        with _connect() as conn:
+            return [job_to_dict(row) for row in conn.execute(query, args)]
+
+    def cancel(self, job_id):
+        """Cancel a queued job or ask the worker running it to stop; returns the job or None"""
+        with _connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ?, cancel_requested = 1 "
+                         "WHERE id = ? AND status = 'queued'", (time.time(), job_id))
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        self._wake.set()
+        return self.get(job_id)
+
+    def snapshot(self):
+        with _connect() as conn:
+            counts = {row["status"]: row["count"] for row in
+                      conn.execute('SELECT status, COUNT(*) AS count FROM jobs GROUP BY status')}
+        with self._lock:
+            local = len(self._running)
+        return {"workers": self.workers, "running_here": local, "limits": self.limits,
+                "counts": {state: counts.get(state, 0) for state in JOB_STATES}}
+
+    def _dispatch_loop(self):
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    self._check_cancels()
+                    self._reap()
+                    self._claim()
+                except Exception as e:
+                    current_app.logger.error(f"Job dispatcher error: {e}")
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _claim(self):
+        while not self._stop.is_set():
+            with self._lock:
+                if len(self._running) >= self.workers:
+                    return
+            job = self._claim_one()
+            if job is None:
+                return
+            with self._lock:
+                self._running[job["id"]] = None
+            self._executor.submit(self._execute, job)
+
+    def _claim_one(self):
+        with _connect() as conn:
+            # BEGIN IMMEDIATE serialises claims from all workers on the database lock
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                running = {row["kind"]: row["count"] for row in
+                           conn.execute("SELECT kind, COUNT(*) AS count FROM jobs WHERE status = 'running' GROUP BY kind")}
+                for row in conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at"):
+                    limit = self.limits.get(row["kind"])
+                    if limit is not None and running.get(row["kind"], 0) >= limit:
+                        continue
+                    conn.execute("UPDATE jobs SET status = 'running', started_at = ?, pid = ? WHERE id = ?",
+                                 (time.time(), os.getpid(), row["id"]))
+                    conn.execute('COMMIT')
+                    return job_to_dict(row)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return None
+
+    def _check_cancels(self):
+        with self._lock:
+            running = dict(self._running)
+        if not running:
+            return
+        marks = ','.join('?' * len(running))
+        with _connect() as conn:
+            cancelled = [row["id"] for row in conn.execute(
+                f'SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({marks})', list(running))]
+        for job_id in cancelled:
+            process = running[job_id]
+            if process is not None and process.poll() is None:
+                current_app.logger.info(f"Cancelling job {job_id}")
+                process.terminate()
+
+    def _reap(self):
+        """Fail jobs whose worker died, and delete finished jobs past their retention"""
+        now = time.time()
+        with _connect() as conn:
+            for row in conn.execute("SELECT id, pid FROM jobs WHERE status = 'running'").fetchall():
+                if row["pid"] != os.getpid() and not _pid_alive(row["pid"]):
+                    conn.execute("UPDATE jobs SET status = 'failed', finished_at = ?, "
+                                 "error = COALESCE(error, 'Worker exited before the job finished') "
+                                 "WHERE id = ? AND status = 'running'", (now, row["id"]))
+            conn.execute(f"DELETE FROM jobs WHERE status IN ({','.join('?' * len(FINISHED_STATES))}) "
+                         "AND finished_at < ?", (*FINISHED_STATES, now - self.retention))
+
+    def _update(self, job_id, **fields):
+        for key in ('progress', 'result'):
+            if key in fields:
+                fields[key] = json.dumps(fields[key])
+        assignments = ', '.join(f"{key} = ?" for key in fields)
+        with _connect() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def _update_own(self, job_id, **fields):
+        # A job handed back to the queue by stop() is no longer this worker's to update
+        with self._lock:
+            if job_id in self._handed_back:
+                return
+        self._update(job_id, **fields)
+
+    def _execute(self, job):
+        with self.app.app_context():
+            job_id = job["id"]
+            process = None
+            timer = None
+            tail = deque(maxlen=self.output_lines)
+            lines = 0
+            timed_out = threading.Event()
+            try:
+                args = JOB_KINDS[job["kind"]](job["params"])
+                # Jobs are already queued; they may wait as long as they may run for a daemon slot
+                process = start_docker_process(args, stdin=subprocess.DEVNULL, queue_timeout=self.timeout)
+                with self._lock:
+                    self._running[job_id] = process
+
+                def expire():
+                    timed_out.set()
+                    process.terminate()
+
+                timer = threading.Timer(self.timeout, expire)
+                timer.daemon = True
+                timer.start()
+
+                reported = 0
+                for line in process.stdout:
+                    line = line.rstrip('\n')
+                    tail.append(line)
+                    lines += 1
+                    # Throttle progress writes to one per second
+                    if time.monotonic() - reported >= 1:
+                        reported = time.monotonic()
+                        self._update_own(job_id, progress={"lines": lines, "last_line": line})
+                code = process.wait()
+
+                current = self.get(job_id)
+                output = '\n'.join(tail)
+                if current and current["cancel_requested"]:
+                    status, error = 'cancelled', "Cancelled"
+                elif timed_out.is_set():
+                    status, error = 'failed', f"Timed out after {self.timeout} seconds"
+                elif code == 0:
+                    status, error = 'succeeded', None
+                else:
+                    status, error = 'failed', (current or {}).get("error") or (tail[-1] if tail else f"Exit code {code}")
+                self._update_own(job_id, status=status, finished_at=time.time(), error=error,
+                             progress={"lines": lines, "last_line": tail[-1] if tail else None},
+                             result={"success": status == 'succeeded', "exit_code": code, "output": output})
+            except Exception as e:
+                current_app.logger.error(f"Job {job_id} failed: {e}")
+                self._update_own(job_id, status='failed', finished_at=time.time(), error=str(e))
+            finally:
+                if timer:
+                    timer.cancel()
+                if process:
+                    stop_docker_process(process)
+                with self._lock:
+                    self._running.pop(job_id, None)
+                result_cache = get_result_cache()
+                if result_cache is not None:
+                    result_cache.invalidate(*JOB_RESOURCES.get(job["kind"], ()))
+                self._wake.set()
+
+_manager = None
+_manager_pid = None
+_manager_lock = threading.Lock()
+
+def get_job_manager():
+    """Return this worker's JobManager, starting its dispatcher on first use"""
+    global _manager, _manager_pid
+    pid = os.getpid()
+    if _manager is None or _manager_pid != pid:
+        with _manager_lock:
+            if _manager is None or _manager_pid != pid:
+                config = current_app.config
+                _manager = JobManager(
+                    current_app._get_current_object(),
+                    workers=config.get('JOB_WORKERS', 4),
+                    limits=parse_limits(config.get('JOB_LIMITS', '')),
+                    retention=config.get('JOB_RETENTION', 3600),
+                    timeout=config.get('JOB_TIMEOUT', 3600),
+                    output_lines=config.get('JOB_OUTPUT_LINES', 200)
+                )
+                _manager.start()
+                _manager_pid = pid
+    return _manager
+
+def wants_async():
+    """True when the request asked for ?async=true"""
+    return request.args.get('async', 'false').lower() == 'true'
+
+def accepted_job_response(kind, params):
+    """Queue a job and return a 202 response pointing at it"""
+    try:
+        job = get_job_manager().submit(kind, params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    response = jsonify({"success": True, "job": job})
+    response.status_code = 202
+    response.headers['Location'] = f"/api/v1/jobs/{job['id']}"
+    return response
+
+def start_jobs(app):
+    """Start the job dispatcher for a freshly forked worker (called from gunicorn's post_worker_init)"""
+    with app.app_context():
+        get_job_manager()
+
+def stop_jobs(grace=0):
+    """Let this worker's jobs finish or hand them back before it exits (called from gunicorn's worker_exit)"""
+    if _manager is not None and _manager_pid == os.getpid():
+        _manager.stop(grace)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+import base64
+import json
+import re
+
+# Query parameter -> docker filter name for GET /api/v1/containers
+CONTAINER_FILTERS = {
+    'id': 'id',
+    'name': 'name',
+    'image': 'ancestor',
+    'status': 'status',
+    'label': 'label'
+}
+CONTAINER_STATES = {'created', 'restarting', 'running', 'removing', 'paused', 'exited', 'dead'}
+
+# Default order of `docker ps`: newest first
+DEFAULT_SORT = '-created_at'
+
+class ListQuery:
+    """Filter, sort and pagination options parsed from a list request"""
+
+    def __init__(self, filters, sort, limit, cursor):
+        self.filters = filters
+        self.sort = sort or DEFAULT_SORT
+        self.sort_field = self.sort.lstrip('-+')
+        self.descending = self.sort.startswith('-')
+        self.limit = limit
+        self.cursor = cursor
+
+    @property
+    def paginated(self):
+        return self.limit is not None or self.cursor is not None
+
+    @property
+    def default_order(self):
+        """True when the daemon's own ordering can be used (and limits pushed down)"""
+        return self.sort == DEFAULT_SORT
+
+def parse_container_query(args):
+    """Read filter/sort/limit/cursor parameters; raises ValueError on bad input"""
+    filters = {}
+    for param, docker_name in CONTAINER_FILTERS.items():
+        values = args.getlist(param)
+        if param != 'label':
+            # name=web,db is shorthand for name=web&name=db (labels may contain commas)
+            values = [v for value in values for v in value.split(',')]
+        values = [v.strip() for v in values if v.strip()]
+        if values:
+            filters[docker_name] = values
+
+    invalid = set(filters.get('status', [])) - CONTAINER_STATES
+    if invalid:
+        raise ValueError(f"Invalid status filter: {', '.join(sorted(invalid))}. Valid values: {', '.join(sorted(CONTAINER_STATES))}")
+
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("limit must be a positive integer")
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+
+    query = ListQuery(filters, args.get('sort'), limit, None)
+    if args.get('cursor'):
+        query.cursor = decode_cursor(args['cursor'], query.sort)
+    return query
+
+def encode_cursor(sort, row):
+    """Opaque cursor pointing just after `row` in the given sort order"""
+    field = sort.lstrip('-+')
+    payload = json.dumps({"s": sort, "v": row.get(field), "id": row.get("id") or row.get("container_id")}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, sort):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        position = (payload["v"], payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if payload.get("s") != sort:
+        raise ValueError("Cursor was issued for a different sort order")
+    return position
+
+def _sort_key(value):
+    # None sorts before everything; mixed or nested values compare as strings
+    if value is None:
+        return (0, '')
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (2, json.dumps(value, sort_keys=True))
+
+def _matches_image(image, wanted):
+    if image == wanted:
+        return True
+    # `image=nginx` matches every tag of nginx, like `docker ps --filter ancestor=nginx`
+    return ':' not in wanted.rsplit('/', 1)[-1] and image.rsplit(':', 1)[0] == wanted
+
+def _matches_name(names, pattern):
+    try:
+        return re.search(pattern, names) is not None
+    except re.error:
+        return pattern in names
+
+def filter_containers(rows, filters):
+    """Apply docker-style container filters in memory (used for inventory rows)"""
+    if not filters:
+        return rows
+    result = []
+    for row in rows:
+        if 'id' in filters and not any(row.get("id", row.get("container_id", "")).startswith(v) for v in filters['id']):
+            continue
+        if 'name' in filters and not any(_matches_name(row.get("names", ""), v) for v in filters['name']):
+            continue
+        if 'ancestor' in filters and not any(_matches_image(row.get("image", ""), v) for v in filters['ancestor']):
+            continue
+        if 'status' in filters and row.get("state") not in filters['status']:
+            continue
+        if 'label' in filters:
+            labels = row.get("labels") or {}
+            matched = True
+            for selector in filters['label']:
+                key, has_value, value = selector.partition('=')
+                if key not in labels or (has_value and labels[key] != value):
+                    matched = False
+                    break
+            if not matched:
+                continue
+        result.append(row)
+    return result
+
+def paginate(rows, query, presorted=False):
+    """Sort rows and cut one page; returns (page, next_cursor or None)
+
+    presorted means the daemon already applied the default order, the
+    cursor and the limit, so rows are only trimmed to the page size.
+    """
+    if not presorted:
+        if query.sort_field not in ('created_at', 'id') and rows and query.sort_field not in rows[0]:
+            raise ValueError(f"Unknown sort field: {query.sort_field}")
+        field = query.sort_field
+
+        def key(row):
+            return (_sort_key(row.get(field)), row.get("id") or row.get("container_id", ""))
+
+        if query.paginated or query.sort != DEFAULT_SORT:
+            rows = sorted(rows, key=key, reverse=query.descending)
+        if query.cursor is not None:
+            position = (_sort_key(query.cursor[0]), query.cursor[1])
+            if query.descending:
+                rows = [row for row in rows if key(row) < position]
+            else:
+                rows = [row for row in rows if key(row) > position]
+
+    if query.limit is None or len(rows) <= query.limit:
+        return rows, None
+    page = rows[:query.limit]
+    return page, encode_cursor(query.sort, page[-1])
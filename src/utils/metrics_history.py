@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+
+import errno
+import fcntl
+import heapq
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from array import array
+from operator import itemgetter
+from flask import current_app
+from utils.parsers import parse_duration
+
+# Numeric columns kept for every container (parse_stats_row fields)
+HISTORY_METRICS = (
+    'cpu_fraction', 'memory_bytes', 'memory_fraction', 'network_rx_bytes', 'network_tx_bytes',
+    'block_read_bytes', 'block_write_bytes', 'pids'
+)
+# Cumulative counters; queries also report their rate over the window
+COUNTER_METRICS = {'network_rx_bytes', 'network_tx_bytes', 'block_read_bytes', 'block_write_bytes'}
+PERCENTILES = (50, 90, 99)
+
+# GET /api/v1/system/top?by= -> field of the latest sample to rank by
+TOP_FIELDS = {
+    'cpu': 'cpu_fraction',
+    'memory': 'memory_bytes',
+    'net': 'network_bytes_per_second',
+    'block': 'block_bytes_per_second'
+}
+
+def parse_resolutions(value):
+    """[(step, slots), ...] finest first from "1s:10m,1m:24h"; raises ValueError"""
+    resolutions = []
+    for item in value.split(','):
+        step, _, retention = item.strip().partition(':')
+        step, retention = parse_duration(step), parse_duration(retention)
+        if not step or not retention or retention < step:
+            raise ValueError(f"Invalid history resolution: {item} (expected step:retention like 1s:10m)")
+        resolutions.append((step, int(retention // step)))
+    return sorted(resolutions)
+
+class Ring:
+    """Fixed-size series at one resolution: one array('d') column per metric
+
+    Bucket k covers [k*step, (k+1)*step) and lives in slot k % slots; the
+    bucket column tells whether a slot still holds a current bucket. Samples
+    landing in the same bucket are averaged in place, which is how the
+    coarser rings downsample the sampler's feed without keeping raw samples.
+    """
+
+    def __init__(self, step, slots):
+        self.step = step
+        self.slots = slots
+        self.buckets = array('q', [-1]) * slots
+        # Samples averaged into each slot, per metric since rows can lack some of them
+        self.counts = {metric: array('L', [0]) * slots for metric in HISTORY_METRICS}
+        self.columns = {metric: array('d', [math.nan]) * slots for metric in HISTORY_METRICS}
+
+    @property
+    def retention(self):
+        return self.step * self.slots
+
+    def add(self, timestamp, values):
+        bucket = int(timestamp // self.step)
+        slot = bucket % self.slots
+        if self.buckets[slot] != bucket:
+            self.buckets[slot] = bucket
+            for metric, column in self.columns.items():
+                column[slot] = math.nan
+                self.counts[metric][slot] = 0
+        for metric, column in self.columns.items():
+            value = values.get(metric)
+            if value is None:
+                continue
+            counts = self.counts[metric]
+            count = counts[slot] = counts[slot] + 1
+            current = column[slot]
+            column[slot] = value if count == 1 else current + (value - current) / count
+
+    def window(self, start, end):
+        """Bucket start times and {metric: array('d')} for buckets between start and end, oldest first"""
+        last = int(end // self.step)
+        first = max(int(start // self.step), last - self.slots + 1)
+        times = []
+        slots = []
+        for bucket in range(first, last + 1):
+            slot = bucket % self.slots
+            if self.buckets[slot] == bucket:
+                times.append(bucket * self.step)
+                slots.append(slot)
+        return times, {metric: array('d', map(column.__getitem__, slots)) for metric, column in self.columns.items()}
+
+def summarize(values):
+    """count/min/max/avg/percentiles of one column, ignoring gaps (NaN)"""
+    present = sorted(filter(lambda value: not math.isnan(value), values))
+    count = len(present)
+    if not count:
+        return {"count": 0, "min": None, "max": None, "avg": None, **{f"p{p}": None for p in PERCENTILES}}
+    summary = {"count": count, "min": present[0], "max": present[-1], "avg": round(math.fsum(present) / count, 6)}
+    for p in PERCENTILES:
+        # Nearest-rank percentile
+        summary[f"p{p}"] = present[min(count - 1, max(math.ceil(p / 100 * count) - 1, 0))]
+    return summary
+
+def counter_rate(times, values):
+    """Average per-second increase of a cumulative counter between its first and last sample"""
+    points = [(t, v) for t, v in zip(times, values) if not math.isnan(v)]
+    if len(points) < 2 or points[-1][0] == points[0][0]:
+        return None
+    return max(points[-1][1] - points[0][1], 0) / (points[-1][0] - points[0][0])
+
+def downsample(times, columns, max_points):
+    """Average consecutive buckets so that at most max_points remain"""
+    size = max(math.ceil(len(times) / max_points), 1)
+    if size == 1:
+        return times, {metric: [None if math.isnan(v) else v for v in values] for metric, values in columns.items()}
+    points = {"times": [times[i] for i in range(0, len(times), size)]}
+    for metric, values in columns.items():
+        merged = []
+        for i in range(0, len(values), size):
+            chunk = [v for v in values[i:i + size] if not math.isnan(v)]
+            merged.append(math.fsum(chunk) / len(chunk) if chunk else None)
+        points[metric] = merged
+    return points.pop("times"), points
+
+def _total(row, fields):
+    values = [row.get(field) for field in fields]
+    return None if None in values else sum(values)
+
+def _rate(current, previous, elapsed):
+    if current is None or previous is None or elapsed <= 0:
+        return None
+    return round(max(current - previous, 0) / elapsed, 1)
+
+def latest_row(timestamp, row, previous=None):
+    """The row top() ranks: a sample with its I/O counters turned into rates against the previous one"""
+    network = _total(row, ('network_rx_bytes', 'network_tx_bytes'))
+    block = _total(row, ('block_read_bytes', 'block_write_bytes'))
+    elapsed = timestamp - previous["sampled_at"] if previous else 0
+    return {
+        "container_id": row.get("container_id"),
+        "name": row.get("name") or (previous and previous["name"]),
+        "sampled_at": timestamp,
+        "cpu_fraction": row.get("cpu_fraction"),
+        "memory_bytes": row.get("memory_bytes"),
+        "memory_fraction": row.get("memory_fraction"),
+        "network_bytes": network,
+        "block_bytes": block,
+        "network_bytes_per_second": _rate(network, previous and previous["network_bytes"], elapsed),
+        "block_bytes_per_second": _rate(block, previous and previous["block_bytes"], elapsed),
+        "pids": row.get("pids")
+    }
+
+class _Series:
+    def __init__(self, resolutions):
+        self.name = None
+        self.last_seen = 0
+        self.rings = [Ring(step, slots) for step, slots in resolutions]
+
+class MetricsHistory:
+    """Per-container metric history, fed by a background sampler
+
+    Memory is fixed per container (one Ring per resolution) and the number
+    of containers with history is capped, so it stays bounded however long
+    the worker runs; the latest row of every container is kept regardless,
+    for top(). Every worker keeps its own copy, but only one of them (the
+    holder of an flock on shared_dir/sampler.lock) samples the daemon: it
+    publishes each sample to shared_dir/sample.json, which the others
+    record as-is, so all workers hold the same data for one daemon load.
+    """
+
+    def __init__(self, app, resolutions, max_containers=100, concurrency=16, shared_dir=None):
+        self.app = app
+        self.resolutions = resolutions
+        self.max_containers = max_containers
+        self.concurrency = concurrency
+        self.shared_dir = shared_dir
+        self.interval = resolutions[0][0]
+        self.retention = max(step * slots for step, slots in resolutions)
+        self.stats = {"samples": 0, "failures": 0, "evictions": 0, "untracked": 0, "last_sample_seconds": None, "last_error": None}
+        self._series = {}
+        self._latest = {}
+        self._sampled_at = None
+        self._leader_fd = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if shared_dir:
+            os.makedirs(shared_dir, mode=0o700, exist_ok=True)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='dokemon-history', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        with self.app.app_context():
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    if self.is_leader():
+                        self._sample()
+                    else:
+                        self._follow()
+                except Exception as e:
+                    self.stats["failures"] += 1
+                    self.stats["last_error"] = str(e)
+                    current_app.logger.error(f"Metrics history sample failed: {e}")
+                elapsed = time.monotonic() - started
+                self.stats["last_sample_seconds"] = round(elapsed, 3)
+                # A sample slower than the finest step just makes that ring sparser
+                self._stop.wait(max(self.interval - elapsed, 0))
+        self._resign()
+
+    def is_leader(self):
+        """True when this worker samples the daemon (taking over if the previous sampler went away)"""
+        if not self.shared_dir or self._leader_fd is not None:
+            return True
+        fd = os.open(os.path.join(self.shared_dir, 'sampler.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            os.close(fd)
+            if e.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+            return False
+        self._leader_fd = fd
+        return True
+
+    def _resign(self):
+        if self._leader_fd is not None:
+            fcntl.flock(self._leader_fd, fcntl.LOCK_UN)
+            os.close(self._leader_fd)
+            self._leader_fd = None
+
+    def _sample(self):
+        from utils.cgroup_metrics import collect_stats
+        response, status = collect_stats(None, self.concurrency)
+        if status != 200:
+            raise RuntimeError(response.get("error"))
+        timestamp = time.time()
+        self.record(timestamp, response["stats"])
+        self.stats["samples"] += 1
+        if self.shared_dir:
+            fd, tmp_path = tempfile.mkstemp(dir=self.shared_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"timestamp": timestamp, "rows": response["stats"]}, f)
+            os.replace(tmp_path, os.path.join(self.shared_dir, 'sample.json'))
+
+    def _follow(self):
+        # Record the sampler's latest sample unless it is one already recorded
+        try:
+            with open(os.path.join(self.shared_dir, 'sample.json')) as f:
+                sample = json.load(f)
+        except (OSError, ValueError):
+            return
+        if self._sampled_at is None or sample["timestamp"] > self._sampled_at:
+            self.record(sample["timestamp"], sample["rows"])
+            self.stats["samples"] += 1
+
+    def record(self, timestamp, rows):
+        """Add one sample (parse_stats_row dicts) for every container in rows
+
+        Every container's latest row is kept for top(); history is only
+        kept for max_containers of them. Once that is full, a container
+        gets a series only when one missing from this sample can make room
+        for it (the longest gone first), so containers that keep showing up
+        keep their history instead of displacing each other.
+        """
+        rows = [row for row in rows if row.get("container_id")]
+        with self._lock:
+            previous = self._latest
+            self._latest = {row["container_id"]: latest_row(timestamp, row, previous.get(row["container_id"])) for row in rows}
+            new = [row["container_id"] for row in rows if row["container_id"] not in self._series]
+            room = self.max_containers - len(self._series)
+            if len(new) > room:
+                # Series of containers absent from this sample, longest gone first
+                absent = sorted((s.last_seen, k) for k, s in self._series.items() if k not in self._latest)
+                for _, key in absent[:len(new) - room]:
+                    del self._series[key]
+                    self.stats["evictions"] += 1
+                room = self.max_containers - len(self._series)
+            self.stats["untracked"] = max(len(new) - room, 0)
+            for key in new[:max(room, 0)]:
+                self._series[key] = _Series(self.resolutions)
+            for row in rows:
+                series = self._series.get(row["container_id"])
+                if series is None:
+                    continue
+                series.name = row.get("name") or series.name
+                series.last_seen = timestamp
+                for ring in series.rings:
+                    ring.add(timestamp, row)
+            self._sampled_at = timestamp
+            # Containers gone for longer than the longest retention have nothing left to show
+            for key in [k for k, s in self._series.items() if timestamp - s.last_seen > self.retention]:
+                del self._series[key]
+
+    def _find(self, container):
+        if container in self._series:
+            return container
+        for key, series in self._series.items():
+            if key.startswith(container) or series.name == container:
+                return key
+        return None
+
+    def query(self, container, window, metrics=HISTORY_METRICS, max_points=None, now=None):
+        """Summary (and optionally points) of a container's metrics over the last window seconds; None if untracked
+
+        Uses the finest resolution that covers the whole window.
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            key = self._find(container)
+            if key is None:
+                return None
+            series = self._series[key]
+            ring = next((r for r in series.rings if r.retention >= window), series.rings[-1])
+            times, columns = ring.window(now - window, now)
+            name = series.name
+        columns = {metric: columns[metric] for metric in metrics}
+
+        summary = {}
+        for metric, values in columns.items():
+            summary[metric] = summarize(values)
+            if metric in COUNTER_METRICS:
+                summary[metric]["rate_per_second"] = counter_rate(times, values)
+        result = {
+            "container_id": key,
+            "name": name,
+            "window_seconds": window,
+            "step_seconds": ring.step,
+            "buckets": len(times),
+            "metrics": summary
+        }
+        if max_points:
+            point_times, point_columns = downsample(times, columns, max_points)
+            result["points"] = {"timestamps": point_times, **point_columns}
+        return result
+
+    def top(self, by, n=10):
+        """The n containers of the latest sample with the highest TOP_FIELDS[by], highest first
+
+        A heap selection over the latest row of every container in the last
+        sample (not only those with history): no stats are collected and
+        only n rows are ever sorted.
+        """
+        field = TOP_FIELDS[by]
+        with self._lock:
+            sampled_at = self._sampled_at
+            rows = [row for row in self._latest.values() if row[field] is not None]
+        return {
+            "by": by,
+            "field": field,
+            "sampled_at": sampled_at,
+            "age_seconds": round(time.time() - sampled_at, 3) if sampled_at else None,
+            "ranked": len(rows),
+            "containers": heapq.nlargest(n, rows, key=itemgetter(field))
+        }
+
+    def snapshot(self):
+        with self._lock:
+            tracked = len(self._series)
+            latest = len(self._latest)
+        slots = sum(slots for _, slots in self.resolutions)
+        return {
+            "role": "sampler" if self._leader_fd is not None or not self.shared_dir else "follower",
+            "containers": latest,
+            "tracked_containers": tracked,
+            "max_containers": self.max_containers,
+            "resolutions": [{"step_seconds": step, "retention_seconds": step * slots} for step, slots in self.resolutions],
+            # buckets, then a count and a column per metric, 8 bytes each
+            "bytes_per_container": slots * (2 * len(HISTORY_METRICS) + 1) * 8,
+            **self.stats
+        }
+
+_history = None
+_history_pid = None
+_history_lock = threading.Lock()
+
+def get_history():
+    """Return this worker's MetricsHistory (starting its sampler on first use), or None when disabled"""
+    global _history, _history_pid
+    config = current_app.config
+    if not config.get('HISTORY_ENABLED', False):
+        return None
+    pid = os.getpid()
+    if _history is None or _history_pid != pid:
+        with _history_lock:
+            if _history is None or _history_pid != pid:
+                _history = MetricsHistory(
+                    current_app._get_current_object(),
+                    parse_resolutions(config.get('HISTORY_RESOLUTIONS', '1s:10m,1m:24h')),
+                    max_containers=config.get('HISTORY_MAX_CONTAINERS', 100),
+                    concurrency=config.get('STATS_CONCURRENCY', 16),
+                    shared_dir=config.get('HISTORY_DIR') or os.path.join(tempfile.gettempdir(), 'dokemon-history')
+                )
+                _history.start()
+                _history_pid = pid
+    return _history
+
+def start_history(app):
+    """Start the sampler for a freshly forked worker (called from gunicorn's post_worker_init)"""
+    with app.app_context():
+        get_history()
@@ -1,10 +1,231 @@
 #!/usr/bin/env python3
 
+import json
+import re
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+RFC3339_PATTERN = re.compile(r'(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(\.\d+)?(Z|[+-]\d\d:\d\d)?$')
+
+CLI_TIME_PATTERN = re.compile(r'(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)(\.\d+)? ([+-]\d{4})')
+
+# Relative times accepted by `docker logs --since`, e.g. "90s", "10m", "1h30m"
+DURATION_PATTERN = re.compile(r'(?:(\d+(?:\.\d+)?)(h|ms|m|s))')
+DURATION_UNITS = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+
+def iter_json_lines(lines):
+    """Decode line-delimited JSON (`--format '{{json .}}'` output) one object at a time
+
+    Accepts a whole output string or any iterable of lines, such as a
+    process's stdout or a streaming HTTP response, so large outputs never
+    need to be split into a list first.
+    """
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def _is_json_lines(output):
+    return output.lstrip()[:1] == '{'
+
+def parse_labels(value):
+    """Turn a CLI label string ("a=b,c=d") or Engine API label map into a dict"""
+    if isinstance(value, dict):
+        return value
+    labels = {}
+    for item in (value or '').split(','):
+        if item:
+            key, _, val = item.partition('=')
+            labels[key] = val
+    return labels
+
+def _split_list(value):
+    return [item for item in (value or '').split(',') if item]
+
+def _as_bool(value):
+    return value if isinstance(value, bool) else str(value).lower() == 'true'
+
+@lru_cache(maxsize=4096)
+def format_timestamp(value):
+    """Normalise CLI ("2024-01-01 10:00:00 +0000 UTC"), RFC 3339 and unix times to UTC ISO 8601
+
+    Everything is converted to UTC so that the strings sort chronologically.
+    """
+    if value in (None, ''):
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc).isoformat()
+        match = RFC3339_PATTERN.match(value)
+        if match:
+            # Engine API times carry nanoseconds; Python only keeps microseconds
+            fraction = (match.group(2) or '')[:7]
+            zone = (match.group(3) or 'Z').replace('Z', '+00:00')
+            return datetime.fromisoformat(match.group(1) + fraction + zone).astimezone(timezone.utc).isoformat()
+        match = CLI_TIME_PATTERN.match(value)
+        if match:
+            # Slicing into fromisoformat is an order of magnitude faster than strptime
+            date, fraction, zone = match.groups()
+            return datetime.fromisoformat(f"{date}{(fraction or '')[:7]}{zone[:3]}:{zone[3:]}").astimezone(timezone.utc).isoformat()
+        return value
+    except ValueError:
+        return value
+
+def parse_duration(value):
+    """Seconds in a duration like "90s", "10m" or "1h30m"; None when value is not one"""
+    value = (value or '').strip()
+    parts = DURATION_PATTERN.findall(value)
+    if parts and ''.join(number + unit for number, unit in parts) == value:
+        return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+    return None
+
+def parse_time_param(value, now=None):
+    """Turn a since/until query value into a unix timestamp; raises ValueError
+
+    Accepts unix seconds ("1714557600.5"), RFC 3339 / ISO 8601 dates and
+    relative durations counted back from now ("10m", "1h30m").
+    """
+    value = (value or '').strip()
+    if not value:
+        raise ValueError("empty time value")
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds = parse_duration(value)
+    if seconds is not None:
+        return (now if now is not None else time.time()) - seconds
+    match = RFC3339_PATTERN.match(value.replace(' ', 'T', 1))
+    if match:
+        fraction = (match.group(2) or '')[:7]
+        zone = (match.group(3) or 'Z').replace('Z', '+00:00')
+        return datetime.fromisoformat(match.group(1) + fraction + zone).timestamp()
+    raise ValueError(f"invalid time value: {value}")
+
+# Statuses that only report byte progress within a layer
+PULL_PROGRESS_STATUSES = {'Downloading', 'Extracting', 'Verifying Checksum', 'Waiting'}
+
+def parse_pull_progress(item):
+    """Normalise an Engine API /images/create progress message
+
+    Returns {"id", "status", "current", "total"} (byte counts only while a
+    layer downloads or extracts) or {"error": message}.
+    """
+    if item.get("error"):
+        return {"error": item["error"]}
+    event = {"id": item.get("id"), "status": item.get("status", "")}
+    detail = item.get("progressDetail") or {}
+    if detail.get("total"):
+        event["current"] = detail.get("current", 0)
+        event["total"] = detail["total"]
+    return event
+
+def parse_pull_line(line):
+    """Parse one line of non-TTY `docker pull` output into the same shape as parse_pull_progress
+
+    "3f4ca61aafcd: Pull complete" -> {"id": "3f4ca61aafcd", "status": "Pull complete"};
+    summary lines ("Digest: ...", "Status: ...") carry no id.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith(("Error", "error")):
+        return {"error": line}
+    prefix, sep, rest = line.partition(': ')
+    if sep and prefix not in ('Digest', 'Status') and ' ' not in prefix:
+        return {"id": prefix, "status": rest}
+    return {"id": None, "status": line}
+
+# Image ID announced at the end of a build: legacy builder, then BuildKit --progress=plain
+BUILD_RESULT_PATTERNS = (
+    re.compile(r'^Successfully built ([0-9a-f]+)'),
+    re.compile(r'writing image (sha256:[0-9a-f]+)')
+)
+
+def parse_build_line(line):
+    """Parse one line of `docker build` output into {"line"[, "image_id"]}"""
+    line = line.rstrip('\r\n')
+    event = {"line": line}
+    for pattern in BUILD_RESULT_PATTERNS:
+        match = pattern.search(line)
+        if match:
+            event["image_id"] = match.group(1)
+    return event
+
+def parse_build_message(item):
+    """Turn an Engine API /build message into build events ({"line"}, {"image_id"} or {"error"})"""
+    if item.get("error"):
+        return [{"error": item["error"]}]
+    events = [{"line": line} for line in (item.get("stream") or item.get("status") or '').splitlines() if line.strip()]
+    image_id = (item.get("aux") or {}).get("ID")
+    if image_id:
+        events.append({"image_id": image_id})
+    return events
+
+def _container_from_json(item):
+    return {
+        "container_id": item.get("ID", "")[:12],
+        "image": item.get("Image", ""),
+        "command": item.get("Command", ""),
+        "created": item.get("RunningFor", ""),
+        "status": item.get("Status", ""),
+        "ports": item.get("Ports", ""),
+        "names": item.get("Names", ""),
+        "id": item.get("ID", ""),
+        "state": item.get("State", ""),
+        "created_at": format_timestamp(item.get("CreatedAt")),
+        "labels": parse_labels(item.get("Labels")),
+        "mounts": _split_list(item.get("Mounts")),
+        "networks": _split_list(item.get("Networks"))
+    }
+
+def _image_from_json(item):
+    image_id = item.get("ID", "")
+    return {
+        "repository": item.get("Repository", ""),
+        "tag": item.get("Tag", ""),
+        "image_id": image_id.split(':')[-1][:12],
+        "created": item.get("CreatedSince", ""),
+        "size": item.get("Size", ""),
+        "id": image_id,
+        "digest": item.get("Digest", ""),
+        "created_at": format_timestamp(item.get("CreatedAt"))
+    }
+
+def _network_from_json(item):
+    return {
+        "network_id": item.get("ID", "")[:12],
+        "name": item.get("Name", ""),
+        "driver": item.get("Driver", ""),
+        "scope": item.get("Scope", ""),
+        "id": item.get("ID", ""),
+        "internal": _as_bool(item.get("Internal")),
+        "ipv6": _as_bool(item.get("IPv6")),
+        "labels": parse_labels(item.get("Labels")),
+        "created_at": format_timestamp(item.get("CreatedAt"))
+    }
+
+def _volume_from_json(item):
+    return {
+        "driver": item.get("Driver", ""),
+        "volume_name": item.get("Name", ""),
+        "scope": item.get("Scope", ""),
+        "mountpoint": item.get("Mountpoint", ""),
+        "labels": parse_labels(item.get("Labels"))
+    }
+
 def parse_container_list(output):
     """Parse docker ps output into structured data"""
     if not output:
         return []
     
+    # `--format '{{json .}}'` output; the fixed-width table below is the legacy format
+    if _is_json_lines(output):
+        return [_container_from_json(item) for item in iter_json_lines(output)]
+    
     lines = output.split('\n')
     if len(lines) < 2:
         return []
@@ -105,6 +326,10 @@ def parse_image_list(output):
     if not output:
         return []
     
+    # `--format '{{json .}}'` output; the fixed-width table below is the legacy format
+    if _is_json_lines(output):
+        return [_image_from_json(item) for item in iter_json_lines(output)]
+    
     lines = output.split('\n')
     if len(lines) < 2:
         return []
@@ -175,6 +400,10 @@ def parse_network_list(output):
     if not output:
         return []
     
+    # `--format '{{json .}}'` output; the fixed-width table below is the legacy format
+    if _is_json_lines(output):
+        return [_network_from_json(item) for item in iter_json_lines(output)]
+    
     lines = output.split('\n')
     if len(lines) < 2:
         return []
@@ -233,6 +462,10 @@ def parse_volume_list(output):
     if not output:
         return []
     
+    # `--format '{{json .}}'` output; the fixed-width table below is the legacy format
+    if _is_json_lines(output):
+        return [_volume_from_json(item) for item in iter_json_lines(output)]
+    
     lines = output.split('\n')
     if len(lines) < 2:
         return []
@@ -344,3 +577,269 @@ def parse_docker_info(output):
                 info[current_section][current_subsection]['items'].append(line.strip())
     
     return info
+
+def format_created(timestamp, now=None):
+    """Render a unix timestamp the way the docker CLI does ("2 hours ago")"""
+    seconds = int((now or time.time()) - timestamp)
+    minutes = seconds // 60
+    hours = minutes // 60
+    if seconds < 1:
+        duration = "Less than a second"
+    elif seconds == 1:
+        duration = "1 second"
+    elif seconds < 60:
+        duration = f"{seconds} seconds"
+    elif minutes == 1:
+        duration = "About a minute"
+    elif minutes < 60:
+        duration = f"{minutes} minutes"
+    elif hours == 1:
+        duration = "About an hour"
+    elif hours < 48:
+        duration = f"{hours} hours"
+    elif hours < 24 * 7 * 2:
+        duration = f"{hours // 24} days"
+    elif hours < 24 * 30 * 2:
+        duration = f"{hours // (24 * 7)} weeks"
+    elif hours < 24 * 365 * 2:
+        duration = f"{hours // (24 * 30)} months"
+    else:
+        duration = f"{hours // (24 * 365)} years"
+    return f"{duration} ago"
+
+def format_size(size):
+    """Render a byte count in decimal units like `docker images` ("187MB")"""
+    units = ['B', 'kB', 'MB', 'GB', 'TB', 'PB']
+    value = float(size or 0)
+    unit = 0
+    while value >= 1000 and unit < len(units) - 1:
+        value /= 1000
+        unit += 1
+    return f"{value:.3g}{units[unit]}"
+
+def format_bytes(size):
+    """Render a byte count in binary units like `docker info` ("7.654GiB")"""
+    units = ['B', 'KiB', 'MiB', 'GiB', 'TiB', 'PiB']
+    value = float(size or 0)
+    unit = 0
+    while value >= 1024 and unit < len(units) - 1:
+        value /= 1024
+        unit += 1
+    return f"{value:.4g}{units[unit]}"
+
+def format_ports(ports):
+    """Render Engine API port bindings like the PORTS column of `docker ps`"""
+    rendered = []
+    for port in ports or []:
+        private = f"{port.get('PrivatePort')}/{port.get('Type', 'tcp')}"
+        if port.get('PublicPort'):
+            ip = port.get('IP', '')
+            host = f"[{ip}]" if ':' in ip else ip
+            rendered.append(f"{host}:{port['PublicPort']}->{private}")
+        else:
+            rendered.append(private)
+    # The CLI lists each binding once even when the daemon reports duplicates
+    return ', '.join(dict.fromkeys(rendered))
+
+def parse_engine_containers(data):
+    """Convert Engine API /containers/json into the parse_container_list schema"""
+    containers = []
+    for item in data or []:
+        containers.append({
+            "container_id": item.get("Id", "")[:12],
+            "image": item.get("Image", ""),
+            "command": f"\"{item.get('Command', '')}\"",
+            "created": format_created(item.get("Created", 0)),
+            "status": item.get("Status", ""),
+            "ports": format_ports(item.get("Ports")),
+            "names": ','.join(name.lstrip('/') for name in item.get("Names") or []),
+            "id": item.get("Id", ""),
+            "state": item.get("State", ""),
+            "created_at": format_timestamp(item.get("Created")),
+            "labels": parse_labels(item.get("Labels")),
+            "mounts": [mount.get("Name") or mount.get("Source", "") for mount in item.get("Mounts") or []],
+            "networks": list(((item.get("NetworkSettings") or {}).get("Networks") or {}).keys())
+        })
+    return containers
+
+def parse_engine_images(data):
+    """Convert Engine API /images/json into the parse_image_list schema"""
+    images = []
+    for item in data or []:
+        image_id = item.get("Id", "").split(':')[-1][:12]
+        created = format_created(item.get("Created", 0))
+        size = format_size(item.get("Size", 0))
+        digests = [digest.split('@')[-1] for digest in item.get("RepoDigests") or []]
+        # `docker images` prints one row per tag, and <none> rows for untagged images
+        for repo_tag in item.get("RepoTags") or ["<none>:<none>"]:
+            repository, _, tag = repo_tag.rpartition(':')
+            images.append({
+                "repository": repository,
+                "tag": tag,
+                "image_id": image_id,
+                "created": created,
+                "size": size,
+                "id": item.get("Id", ""),
+                "digest": digests[0] if digests else "<none>",
+                "created_at": format_timestamp(item.get("Created"))
+            })
+    return images
+
+def parse_engine_networks(data):
+    """Convert Engine API /networks into the parse_network_list schema"""
+    return [{
+        "network_id": item.get("Id", "")[:12],
+        "name": item.get("Name", ""),
+        "driver": item.get("Driver", ""),
+        "scope": item.get("Scope", ""),
+        "id": item.get("Id", ""),
+        "internal": bool(item.get("Internal")),
+        "ipv6": bool(item.get("EnableIPv6")),
+        "labels": parse_labels(item.get("Labels")),
+        "created_at": format_timestamp(item.get("Created"))
+    } for item in data or []]
+
+def parse_engine_volumes(data):
+    """Convert Engine API /volumes into the parse_volume_list schema"""
+    return [{
+        "driver": item.get("Driver", ""),
+        "volume_name": item.get("Name", ""),
+        "scope": item.get("Scope", ""),
+        "mountpoint": item.get("Mountpoint", ""),
+        "labels": parse_labels(item.get("Labels"))
+    } for item in (data or {}).get("Volumes") or []]
+
+def parse_engine_info(data):
+    """Convert Engine API /info into the parse_docker_info layout"""
+    data = data or {}
+    server = {
+        "Containers": data.get("Containers", 0),
+        "Running": data.get("ContainersRunning", 0),
+        "Paused": data.get("ContainersPaused", 0),
+        "Stopped": data.get("ContainersStopped", 0),
+        "Images": data.get("Images", 0),
+        "Server Version": data.get("ServerVersion", "Unknown"),
+        "Storage Driver": data.get("Driver", "Unknown"),
+        "Logging Driver": data.get("LoggingDriver", ""),
+        "Cgroup Driver": data.get("CgroupDriver", ""),
+        "Cgroup Version": data.get("CgroupVersion", ""),
+        "Kernel Version": data.get("KernelVersion", "Unknown"),
+        "Operating System": data.get("OperatingSystem", "Unknown"),
+        "OSType": data.get("OSType", ""),
+        "Architecture": data.get("Architecture", "Unknown"),
+        "CPUs": data.get("NCPU", 0),
+        "Total Memory": format_bytes(data.get("MemTotal", 0)),
+        "Name": data.get("Name", ""),
+        "ID": data.get("ID", ""),
+        "Docker Root Dir": data.get("DockerRootDir", ""),
+        "Debug Mode": data.get("Debug", False)
+    }
+    return {"Server": server}
+
+# `docker inspect` reports every argument it could not resolve on stderr
+NO_SUCH_OBJECT_PATTERN = re.compile(r'No such (?:container|object): (\S+)')
+
+def parse_missing_objects(stderr):
+    """{name: message} for each "No such container" error in `docker inspect` stderr"""
+    missing = {}
+    for line in stderr.splitlines():
+        match = NO_SUCH_OBJECT_PATTERN.search(line)
+        if match:
+            missing[match.group(1)] = line.split(': ', 1)[-1] if line.startswith('Error: ') else line
+    return missing
+
+# Unit multipliers in `docker stats` columns: binary for memory, decimal for I/O
+SIZE_PATTERN = re.compile(r'^\s*([\d.]+)\s*([kKMGTP]i?B|B)?\s*$')
+SIZE_UNITS = {
+    'B': 1, 'kB': 1000, 'MB': 1000 ** 2, 'GB': 1000 ** 3, 'TB': 1000 ** 4, 'PB': 1000 ** 5,
+    'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3, 'TiB': 1024 ** 4, 'PiB': 1024 ** 5
+}
+
+def parse_size(value):
+    """Bytes from a human-readable size like "12.3MiB" or "1.5kB"; None when unparseable"""
+    match = SIZE_PATTERN.match(value or '')
+    if not match:
+        return None
+    unit = match.group(2) or 'B'
+    if unit[0] in 'kK':
+        # Both "kB" and "KB" turn up for kilobytes
+        unit = 'KiB' if 'i' in unit else 'kB'
+    return round(float(match.group(1)) * SIZE_UNITS[unit])
+
+def _parse_pair(value):
+    # "12.3MiB / 1.9GiB" -> (12897484, 2040109465)
+    first, _, second = (value or '').partition('/')
+    return parse_size(first), parse_size(second)
+
+def _parse_fraction(value):
+    # "12.34%" -> 0.1234; docker prints "--" for containers that are not running
+    try:
+        return round(float((value or '').strip().rstrip('%')) / 100, 6)
+    except ValueError:
+        return None
+
+def parse_stats_row(item):
+    """Typed numbers from one `docker stats --format '{{json .}}'` row
+
+    cpu_fraction is in CPUs (1.5 means one and a half cores busy), like the
+    CLI's CPU % divided by 100.
+    """
+    memory, memory_limit = _parse_pair(item.get("MemUsage"))
+    rx, tx = _parse_pair(item.get("NetIO"))
+    read, write = _parse_pair(item.get("BlockIO"))
+    try:
+        pids = int(item.get("PIDs"))
+    except (TypeError, ValueError):
+        pids = None
+    return {
+        "container_id": item.get("ID", ""),
+        "name": item.get("Name", ""),
+        "cpu_fraction": _parse_fraction(item.get("CPUPerc")),
+        "memory_bytes": memory,
+        "memory_limit_bytes": memory_limit,
+        "memory_fraction": _parse_fraction(item.get("MemPerc")),
+        "network_rx_bytes": rx,
+        "network_tx_bytes": tx,
+        "block_read_bytes": read,
+        "block_write_bytes": write,
+        "pids": pids
+    }
+
+def parse_engine_stats(data):
+    """The parse_stats_row fields from a GET /containers/{id}/stats?stream=false sample
+
+    Uses the same formulas as the docker CLI: CPU from the delta against the
+    daemon's previous sample, memory without the reclaimable page cache.
+    """
+    cpu = data.get("cpu_stats") or {}
+    precpu = data.get("precpu_stats") or {}
+    cpu_delta = (cpu.get("cpu_usage") or {}).get("total_usage", 0) - (precpu.get("cpu_usage") or {}).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+    online = cpu.get("online_cpus") or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+    cpu_fraction = round(cpu_delta / system_delta * online, 6) if cpu_delta > 0 and system_delta > 0 else 0.0
+
+    memory_stats = data.get("memory_stats") or {}
+    details = memory_stats.get("stats") or {}
+    memory = memory_stats.get("usage")
+    if memory is not None:
+        # cgroup v1 reports total_inactive_file, v2 inactive_file
+        cache = details.get("total_inactive_file", details.get("inactive_file", 0))
+        memory = max(memory - cache, 0) if cache < memory else memory
+    memory_limit = memory_stats.get("limit")
+
+    networks = (data.get("networks") or {}).values()
+    blkio = (data.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+
+    return {
+        "container_id": data.get("id", ""),
+        "name": (data.get("name") or "").lstrip('/'),
+        "cpu_fraction": cpu_fraction,
+        "memory_bytes": memory,
+        "memory_limit_bytes": memory_limit,
+        "memory_fraction": round(memory / memory_limit, 6) if memory is not None and memory_limit else None,
+        "network_rx_bytes": sum(n.get("rx_bytes", 0) for n in networks),
+        "network_tx_bytes": sum(n.get("tx_bytes", 0) for n in networks),
+        "block_read_bytes": sum(e.get("value", 0) for e in blkio if (e.get("op") or '').lower() == 'read'),
+        "block_write_bytes": sum(e.get("value", 0) for e in blkio if (e.get("op") or '').lower() == 'write'),
+        "pids": (data.get("pids_stats") or {}).get("current")
+    }
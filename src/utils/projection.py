@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+from flask import request
+
+def parse_fields(value):
+    """Compile "a,b.c,b.d" into a nested field tree {"a": {}, "b": {"c": {}, "d": {}}}
+
+    An empty subtree means "keep the whole value". Returns None when no
+    projection was requested.
+    """
+    if not value:
+        return None
+    tree = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        parts = path.split('.')
+        for i, part in enumerate(parts):
+            if part in node and not node[part]:
+                # "a" was already requested whole; "a.b" cannot narrow it
+                break
+            if i == len(parts) - 1:
+                node[part] = {}
+            else:
+                node = node.setdefault(part, {})
+    return tree or None
+
+def project(data, tree):
+    """Prune data (a dict, or a list of dicts) down to the fields in tree"""
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [project(item, tree) for item in data]
+    if not isinstance(data, dict):
+        return data
+    result = {}
+    for key, subtree in tree.items():
+        if key in data:
+            result[key] = project(data[key], subtree) if subtree else data[key]
+    return result
+
+def requested_fields():
+    """Field tree from the current request's ?fields= parameter"""
+    return parse_fields(request.args.get('fields'))
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from utils import docker_backend
+from utils.parsers import PULL_PROGRESS_STATUSES
+
+class PullSubscription:
+    """One client's view of a shared pull: a bounded, drop-oldest event buffer
+
+    A slow client never holds up the pull or the other clients; when its
+    buffer overflows the oldest progress events are discarded (the final
+    summary still reports the outcome and how many events were dropped).
+    """
+
+    def __init__(self, broadcast, maxsize):
+        self.broadcast = broadcast
+        self.dropped = 0
+        self._events = deque(maxlen=maxsize)
+        self._final = None
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def publish(self, event):
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._cond.notify()
+
+    def finish(self, final):
+        with self._cond:
+            self._final = final
+            self._cond.notify()
+
+    def __iter__(self):
+        while True:
+            with self._cond:
+                while not self._events and self._final is None and not self._closed:
+                    self._cond.wait()
+                if self._events:
+                    event = self._events.popleft()
+                elif self._final is not None and not self._closed:
+                    final, self._final = self._final, None
+                    self._closed = True
+                    yield dict(final, dropped_events=self.dropped)
+                    return
+                else:
+                    return
+            yield event
+
+    def close(self):
+        """Detach from the pull (stops it when this was the last subscriber)"""
+        with self._cond:
+            self._closed = True
+            self._final = None
+            self._cond.notify()
+        self.broadcast.detach(self)
+
+class PullBroadcast:
+    """A single in-flight image pull whose progress is fanned out to every subscriber"""
+
+    def __init__(self, registry, image, upstream, app, progress_interval=0.25):
+        self.registry = registry
+        self.app = app
+        self.image = image
+        self.progress_interval = progress_interval
+        self.started_at = time.time()
+        self.layers = {}
+        self.digest = None
+        self.error = None
+        self.up_to_date = False
+        self.done = False
+        self._events = upstream["events"]
+        self._close_upstream = upstream["close"]
+        self._subscribers = []
+        self._last_progress = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._run, name=f"dokemon-pull-{self.image}", daemon=True).start()
+
+    def subscribe(self, maxsize):
+        """Attach a new subscriber; it first receives the state of every layer seen so far"""
+        subscription = PullSubscription(self, maxsize)
+        with self._lock:
+            subscription.publish({"status": "attached", "image": self.image, "shared": bool(self._subscribers),
+                                  "layers": {layer: dict(state) for layer, state in self.layers.items()}})
+            if self.done:
+                # Attached just as the pull finished: it still gets the outcome
+                subscription.finish(self.summary())
+            else:
+                self._subscribers.append(subscription)
+        return subscription
+
+    def detach(self, subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+            abandoned = not self._subscribers and not self.done
+        if abandoned and self.registry.forget(self, abandoned=True):
+            # Nobody is listening any more: stop the pull like Ctrl-C on `docker pull`
+            self.app.logger.info(f"Pull of {self.image} abandoned by all clients, stopping it")
+            self._close_upstream()
+
+    def has_subscribers(self):
+        with self._lock:
+            return bool(self._subscribers)
+
+    def _throttled(self, event):
+        # Always pass on status changes; limit byte progress to one event per layer per interval
+        if event.get("status") not in PULL_PROGRESS_STATUSES or not event.get("id"):
+            return False
+        now = time.monotonic()
+        if now - self._last_progress.get(event["id"], 0) < self.progress_interval:
+            return True
+        self._last_progress[event["id"]] = now
+        return False
+
+    def _publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.publish(event)
+
+    def _apply(self, event):
+        if event.get("error"):
+            self.error = self.error or event["error"]
+            return
+        status = event.get("status", "")
+        if status.startswith("Digest: "):
+            self.digest = status[len("Digest: "):]
+        elif status.startswith("Status: Image is up to date"):
+            self.up_to_date = True
+        layer = event.get("id")
+        # "latest: Pulling from library/nginx" names the tag, not a layer
+        if layer and not status.startswith("Pulling from"):
+            state = self.layers.setdefault(layer, {})
+            state["status"] = status
+            if "total" in event:
+                key = "extracted" if status == "Extracting" else "downloaded"
+                state[key] = event["current"]
+                state["size"] = event["total"]
+
+    def _run(self):
+        with self.app.app_context():
+            try:
+                for event in self._events:
+                    with self._lock:
+                        self._apply(event)
+                    if event.get("error") or not self._throttled(event):
+                        self._publish(event)
+            except Exception as e:
+                self.error = self.error or str(e)
+            finally:
+                self.registry.forget(self)
+                try:
+                    self._close_upstream()
+                except Exception:
+                    pass
+                with self._lock:
+                    self.done = True
+                    subscribers = list(self._subscribers)
+                final = self.summary()
+                for subscription in subscribers:
+                    subscription.finish(final)
+
+    def summary(self):
+        completed = sum(1 for state in self.layers.values() if state.get("status") in ('Pull complete', 'Already exists'))
+        return {
+            "status": "failed" if self.error else "complete",
+            "image": self.image,
+            "digest": self.digest,
+            "up_to_date": self.up_to_date,
+            "error": self.error,
+            "layers": len(self.layers),
+            "layers_complete": completed,
+            "bytes_downloaded": sum(state.get("size", 0) for state in self.layers.values()
+                                    if state.get("status") in ('Download complete', 'Extracting', 'Pull complete')),
+            "seconds": round(time.time() - self.started_at, 3)
+        }
+
+class _PendingPull:
+    """A pull whose stream is still being opened; callers for the same image wait for it"""
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.broadcast = None
+        self.error = None
+
+class PullRegistry:
+    """In-flight pulls of this worker, keyed by normalised image reference
+
+    A second request for an image that is already being pulled attaches to
+    the running pull instead of starting another one. Opening the stream
+    (which can wait for an admission slot or a slow daemon) happens outside
+    the registry lock, so pulls of other images are never held up by it.
+    """
+
+    def __init__(self, progress_interval=0.25, buffer=256):
+        self.progress_interval = progress_interval
+        self.buffer = buffer
+        self.stats = {"pulls_started": 0, "pulls_joined": 0}
+        self._pulls = {}
+        self._starting = {}
+        self._lock = threading.Lock()
+
+    def attach(self, image):
+        """Subscribe to the pull of image, starting it if needed
+
+        Returns (subscription, None), or (None, (response, status)) when the
+        pull could not be started.
+        """
+        image = docker_backend.normalize_image_ref(image)
+        with self._lock:
+            broadcast = self._pulls.get(image)
+            if broadcast is not None:
+                self.stats["pulls_joined"] += 1
+                return broadcast.subscribe(self.buffer), None
+            pending = self._starting.get(image)
+            starting = pending is None
+            if starting:
+                pending = self._starting[image] = _PendingPull()
+
+        if not starting:
+            # Another request is opening this pull: share its outcome
+            pending.ready.wait()
+            if pending.broadcast is None:
+                return None, pending.error
+            with self._lock:
+                self.stats["pulls_joined"] += 1
+            return pending.broadcast.subscribe(self.buffer), None
+
+        subscription = None
+        try:
+            response, status = docker_backend.open_pull_stream(image)
+            if status != 200:
+                pending.error = (response, status)
+            else:
+                broadcast = PullBroadcast(self, image, response, current_app._get_current_object(), self.progress_interval)
+                subscription = broadcast.subscribe(self.buffer)
+        except Exception as e:
+            pending.error = ({"error": str(e), "success": False}, 500)
+            raise
+        finally:
+            with self._lock:
+                del self._starting[image]
+                if subscription is not None:
+                    self._pulls[image] = broadcast
+                    self.stats["pulls_started"] += 1
+                    pending.broadcast = broadcast
+            pending.ready.set()
+        if subscription is None:
+            return None, pending.error
+        broadcast.start()
+        return subscription, None
+
+    def forget(self, broadcast, abandoned=False):
+        """Drop a finished or abandoned pull; True if it was still registered"""
+        with self._lock:
+            if abandoned and broadcast.has_subscribers():
+                # Someone attached while the last client was leaving
+                return False
+            if self._pulls.get(broadcast.image) is broadcast:
+                del self._pulls[broadcast.image]
+                return True
+            return False
+
+    def snapshot(self):
+        with self._lock:
+            in_flight = {image: {"subscribers": len(pull._subscribers), "layers": len(pull.layers)}
+                         for image, pull in self._pulls.items()}
+            starting = sorted(self._starting)
+        return {"in_flight": in_flight, "starting": starting, **self.stats}
+
+_registry = None
+_registry_pid = None
+_registry_lock = threading.Lock()
+
+def get_pull_registry():
+    """Per-process PullRegistry"""
+    global _registry, _registry_pid
+    pid = os.getpid()
+    if _registry is None or _registry_pid != pid:
+        with _registry_lock:
+            if _registry is None or _registry_pid != pid:
+                config = current_app.config
+                _registry = PullRegistry(config.get('PULL_PROGRESS_INTERVAL', 0.25), config.get('STREAM_BUFFER', 256))
+                _registry_pid = pid
+    return _registry
+
+# When a batch pull skips an image that is already present locally
+PULL_POLICIES = ('newer', 'missing', 'always')
+
+def dedupe_images(images):
+    """Normalise references and drop duplicates, keeping the first occurrence's order"""
+    unique = []
+    seen = set()
+    for image in images:
+        image = docker_backend.normalize_image_ref(image)
+        if image not in seen:
+            seen.add(image)
+            unique.append(image)
+    return unique
+
+def plan_pull(image, policy='newer'):
+    """Decide whether image has to be pulled; returns (pull, reason)
+
+    Digest references are present when the exact content exists locally.
+    Under 'newer' a local tag is compared with the registry's current
+    digest; when that cannot be resolved the local tag is kept like under
+    'missing', with the reason "unknown". 'always' pulls.
+    """
+    if policy == 'always':
+        return True, "always"
+    response, status = docker_backend.inspect_image(image)
+    if status != 200:
+        return True, "missing"
+    if '@' in image:
+        return False, "present"
+    if policy == 'missing':
+        return False, "present"
+    remote = docker_backend.registry_digest(image)
+    if remote is None:
+        # Pulling just to find out would make every batch pull everything
+        return False, "unknown"
+    local = [digest.split('@')[-1] for digest in response["image_info"].get("RepoDigests") or []]
+    if remote in local:
+        return False, "up to date"
+    return True, "outdated"
+
+def pull_images(images, policy='newer', concurrency=4):
+    """Plan and pull unique image references in parallel; yields one result per image as it finishes
+
+    Pulls go through the PullRegistry, so an image that is already being
+    pulled (by a streaming client or another batch) is shared, not repeated.
+    """
+    app = current_app._get_current_object()
+    registry = get_pull_registry()
+
+    def work(image):
+        with app.app_context():
+            started = time.monotonic()
+            result = {"image": image}
+            try:
+                pull, reason = plan_pull(image, policy)
+                result["reason"] = reason
+                if not pull:
+                    result["status"] = "skipped"
+                else:
+                    subscription, error = registry.attach(image)
+                    if error:
+                        result.update(status="failed", error=error[0].get("error"))
+                    else:
+                        summary = {}
+                        for event in subscription:
+                            summary = event
+                        if summary.get("status") == "complete":
+                            result.update(status="up_to_date" if summary.get("up_to_date") else "pulled",
+                                          digest=summary.get("digest"), layers=summary.get("layers"))
+                        else:
+                            result.update(status="failed", error=summary.get("error") or "Pull did not complete")
+            except Exception as e:
+                result.update(status="failed", error=str(e))
+            result["success"] = result["status"] != "failed"
+            result["seconds"] = round(time.monotonic() - started, 3)
+            return result
+
+    executor = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix='dokemon-batch-pull')
+    try:
+        futures = [executor.submit(work, image) for image in images]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # Pulls already running finish (they may be shared); queued ones are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, has_request_context, request
+
+CACHED_RESOURCES = ('containers', 'images', 'networks', 'volumes', 'info')
+MAX_ENTRIES = 256
+
+# Mutating requests (by path prefix, most specific first) -> cached resources they can change
+MUTATION_RESOURCES = (
+    ('/api/v1/containers/', ('containers', 'info')),
+    ('/api/v1/images/', ('images', 'info')),
+    ('/api/v1/networks/', ('networks',)),
+    ('/api/v1/volumes/', ('volumes',)),
+    ('/api/v1/system/prune', CACHED_RESOURCES)
+)
+# POST routes that only read
+READ_ONLY_POSTS = {'/api/v1/containers/inspect'}
+# Background job kind -> cached resources it changes when it finishes
+JOB_RESOURCES = {
+    'pull': ('images', 'info'),
+    'build': ('images', 'info'),
+    'run': ('containers', 'info'),
+    'prune': CACHED_RESOURCES
+}
+
+def parse_ttls(value):
+    """Turn "containers=1,images=30" into {"containers": 1.0, "images": 30.0}"""
+    ttls = {}
+    for item in (value or '').split(','):
+        resource, _, ttl = item.partition('=')
+        if resource.strip() and ttl.strip():
+            ttls[resource.strip()] = float(ttl)
+    return ttls
+
+def cache_bypassed():
+    """True when the current request sent Cache-Control: no-cache (or no-store / max-age=0)"""
+    if not has_request_context():
+        return False
+    directives = {d.strip().lower() for d in request.headers.get('Cache-Control', '').split(',')}
+    return bool(directives & {'no-cache', 'no-store', 'max-age=0'})
+
+def mutation_resources(method, path):
+    """Cached resources a request can change, () for reads"""
+    if method in ('GET', 'HEAD', 'OPTIONS') or path in READ_ONLY_POSTS:
+        return ()
+    for prefix, resources in MUTATION_RESOURCES:
+        if path.startswith(prefix):
+            return resources
+    return ()
+
+class ResultCache:
+    """Short-lived cache of parsed read results, with a TTL per resource type
+
+    Keys are tuples starting with the resource name. Writes through this
+    process invalidate the resources they touch; a generation counter per
+    resource keeps a read that was in flight during the write from storing
+    its (possibly older) result afterwards. Changes made behind the API's
+    back show up once the TTL runs out.
+
+    Expired entries are kept a while longer: for stale_while_revalidate
+    seconds past the TTL they are served as-is while a background refresh
+    runs, and up to max_stale seconds past it they stand in for a daemon
+    that errors or times out.
+    """
+
+    def __init__(self, ttls, stale_while_revalidate=10, max_stale=300, max_entries=MAX_ENTRIES):
+        self.ttls = ttls
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.stats = {
+            "hits": 0, "stale_hits": 0, "stale_on_error": 0, "misses": 0, "bypassed": 0,
+            "refreshes": 0, "refresh_failures": 0, "invalidations": 0, "evictions": 0
+        }
+        self._entries = OrderedDict()
+        self._generations = dict.fromkeys(CACHED_RESOURCES, 0)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def ttl(self, key):
+        return self.ttls.get(key[0], 0)
+
+    def generation(self, key):
+        return self._generations.get(key[0], 0)
+
+    def count(self, name):
+        """Add one to stats[name]; request threads and refreshes update them concurrently"""
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, key):
+        """(response, status, age_seconds) of the entry for key, fresh or still usable when stale, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            age = time.monotonic() - entry[0]
+            if age > self.ttl(key) + max(self.stale_while_revalidate, self.max_stale):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2], age
+
+    def refresh(self, key, fetch):
+        """Run fetch() in the background and store its result, unless a refresh of key is already running"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self.stats["refreshes"] += 1
+        generation = self.generation(key)
+        app = current_app._get_current_object()
+
+        def run():
+            try:
+                with app.app_context():
+                    response, status = fetch()
+                if status == 200:
+                    self.put(key, response, status, generation)
+                else:
+                    self.count("refresh_failures")
+            except Exception as e:
+                self.count("refresh_failures")
+                app.logger.error(f"Background refresh of {key[0]} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name='dokemon-cache-refresh', daemon=True).start()
+
+    def put(self, key, response, status, generation):
+        """Store a result fetched when generation(key) was generation"""
+        if self.ttl(key) <= 0:
+            return
+        with self._lock:
+            if generation != self._generations.get(key[0], 0):
+                return
+            self._entries[key] = (time.monotonic(), response, status)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, *resources):
+        with self._lock:
+            for resource in resources:
+                self._generations[resource] = self._generations.get(resource, 0) + 1
+            for key in [key for key in self._entries if key[0] in resources]:
+                del self._entries[key]
+            self.stats["invalidations"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            size = len(self._entries)
+            stats = dict(self.stats)
+        served = stats["hits"] + stats["stale_hits"] + stats["stale_on_error"]
+        lookups = served + stats["misses"]
+        return {
+            "size": size,
+            "ttls": self.ttls,
+            "stale_while_revalidate": self.stale_while_revalidate,
+            "max_stale": self.max_stale,
+            "hit_ratio": round(served / lookups, 3) if lookups else None,
+            **stats
+        }
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+def get_result_cache():
+    """Per-process ResultCache, or None when DOKEMON_CACHE is off"""
+    global _cache, _cache_pid
+    config = current_app.config
+    if not config.get('CACHE_ENABLED', True):
+        return None
+    pid = os.getpid()
+    if _cache is None or _cache_pid != pid:
+        with _cache_lock:
+            if _cache is None or _cache_pid != pid:
+                _cache = ResultCache(
+                    parse_ttls(config.get('CACHE_TTLS', '')),
+                    stale_while_revalidate=config.get('CACHE_STALE_WHILE_REVALIDATE', 10),
+                    max_stale=config.get('CACHE_MAX_STALE', 300)
+                )
+                _cache_pid = pid
+    return _cache
+
+def note_cache_status(status, age=None):
+    """Remember how the current request's data was served, for the X-Cache / Age headers"""
+    if has_request_context():
+        g.cache_status = (status, age)
+
+def init_result_cache(app):
+    """Register the hook that invalidates on writes and labels cached responses"""
+    @app.after_request
+    def apply_result_cache(response):
+        resources = mutation_resources(request.method, request.path)
+        cache = get_result_cache() if resources else None
+        if cache is not None:
+            cache.invalidate(*resources)
+            if response.is_streamed:
+                # Streamed pulls, builds and bulk actions keep changing things until the body is done
+                response.call_on_close(lambda: cache.invalidate(*resources))
+        status = g.get('cache_status')
+        if status:
+            response.headers['X-Cache'] = status[0]
+            if status[1] is not None:
+                response.headers['Age'] = str(int(status[1]))
+        return response
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import shlex
+import tempfile
+import threading
+import time
+from flask import current_app
+
+# docker CLI commands that only read daemon state and may share one execution
+READ_COMMANDS = {'ps', 'images', 'info', 'version', 'inspect', 'stats', 'logs'}
+READ_SUBCOMMANDS = {
+    ('container', 'ls'), ('container', 'inspect'), ('image', 'ls'), ('image', 'inspect'),
+    ('network', 'ls'), ('network', 'inspect'), ('volume', 'ls'), ('volume', 'inspect'), ('system', 'df')
+}
+# Result files older than this are left from earlier flights and can go
+STALE_RESULT_SECONDS = 60
+
+def read_command_key(command):
+    """Normalized argv tuple of a read-only docker command, or None for anything else
+
+    `docker stats` and `docker logs` only qualify when they do not follow.
+    """
+    try:
+        argv = tuple(command) if isinstance(command, list) else tuple(shlex.split(command))
+    except ValueError:
+        return None
+    if len(argv) < 2 or argv[0] != 'docker':
+        return None
+    if argv[1] in READ_COMMANDS:
+        if argv[1] == 'stats' and '--no-stream' not in argv:
+            return None
+        if argv[1] == 'logs' and ('-f' in argv or '--follow' in argv):
+            return None
+        return argv
+    if len(argv) > 2 and (argv[1], argv[2]) in READ_SUBCOMMANDS:
+        return argv
+    return None
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution
+
+    The first caller for a key runs it; callers arriving while it is in
+    flight wait and get the same result (or exception). Nothing is kept
+    once the flight lands, so this never serves an answer older than the
+    request asking for it. With a shared_dir, workers of the same host
+    also elect one leader per key through an flock'ed file and hand its
+    (JSON) result to the others through a result file next to it.
+    """
+
+    def __init__(self, shared_dir=None):
+        self.shared_dir = shared_dir
+        self.stats = {"executions": 0, "collapsed": 0, "collapsed_across_workers": 0, "errors": 0}
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._pruned_at = 0
+        if shared_dir:
+            os.makedirs(shared_dir, mode=0o700, exist_ok=True)
+
+    def do(self, key, fn, shared=False):
+        """Return fn(), sharing it with every concurrent caller for key
+
+        shared=True also coalesces with other workers; fn's result must then
+        be JSON serializable (and comes back as decoded JSON for followers).
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.stats["collapsed"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            if shared and self.shared_dir:
+                flight.result = self._do_shared(key, fn)
+            else:
+                self.stats["executions"] += 1
+                flight.result = fn()
+            return flight.result
+        except Exception as e:
+            self.stats["errors"] += 1
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _do_shared(self, key, fn):
+        started = time.time()
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        lock_path = os.path.join(self.shared_dir, f"{digest}.lock")
+        result_path = os.path.join(self.shared_dir, f"{digest}.json")
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES):
+                    raise
+                # Another worker is running it: wait for it to land and take its result
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                shared = self._read_result(result_path, key, started)
+                if shared is not None:
+                    self.stats["collapsed_across_workers"] += 1
+                    return shared["result"]
+            # Holding the lock: this worker runs it and publishes the result
+            self.stats["executions"] += 1
+            result = fn()
+            self._write_result(result_path, key, result)
+            return result
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _read_result(self, path, key, started):
+        # Only a result that landed after this caller arrived is shared
+        try:
+            with open(path) as f:
+                shared = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if shared.get("key") != repr(key) or shared.get("finished_at", 0) < started:
+            return None
+        return shared
+
+    def _write_result(self, path, key, result):
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.shared_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"key": repr(key), "finished_at": time.time(), "result": result}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            current_app.logger.warning(f"Could not share coalesced result: {e}")
+        self._prune()
+
+    def _prune(self):
+        now = time.time()
+        if now - self._pruned_at < STALE_RESULT_SECONDS:
+            return
+        self._pruned_at = now
+        try:
+            names = os.listdir(self.shared_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(('.json', '.tmp')):
+                continue
+            path = os.path.join(self.shared_dir, name)
+            try:
+                if now - os.path.getmtime(path) > STALE_RESULT_SECONDS:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+    def snapshot(self):
+        with self._lock:
+            in_flight = len(self._flights)
+        calls = self.stats["executions"] + self.stats["collapsed"] + self.stats["collapsed_across_workers"]
+        collapsed = self.stats["collapsed"] + self.stats["collapsed_across_workers"]
+        return {
+            "in_flight": in_flight,
+            "across_workers": bool(self.shared_dir),
+            "collapse_ratio": round(collapsed / calls, 3) if calls else None,
+            **self.stats
+        }
+
+_flights = None
+_flights_pid = None
+_flights_lock = threading.Lock()
+
+def get_single_flight():
+    """Per-process SingleFlight, or None when DOKEMON_COALESCE is off"""
+    global _flights, _flights_pid
+    config = current_app.config
+    if not config.get('COALESCE_ENABLED', True):
+        return None
+    pid = os.getpid()
+    if _flights is None or _flights_pid != pid:
+        with _flights_lock:
+            if _flights is None or _flights_pid != pid:
+                shared_dir = None
+                if config.get('COALESCE_ACROSS_WORKERS', False):
+                    shared_dir = config.get('COALESCE_DIR') or os.path.join(tempfile.gettempdir(), 'dokemon-coalesce')
+                _flights = SingleFlight(shared_dir)
+                _flights_pid = pid
+    return _flights
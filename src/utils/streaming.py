@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import queue
+import threading
+from flask import current_app, request, stream_with_context
+
+# Yielded by StreamPump.events() when nothing arrived for a heartbeat interval
+HEARTBEAT = object()
+_DONE = object()
+
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+class StreamPump:
+    """Drain blocking iterators (pipes, sockets) on daemon threads into one bounded queue
+
+    Readers block once `maxsize` items are waiting, which pushes back on the
+    upstream process or connection instead of buffering without limit. The
+    consumer gets HEARTBEAT markers while the sources are idle, so that a
+    disconnected client is noticed on the next write even when no data flows.
+    """
+
+    def __init__(self, sources, maxsize=256, on_close=None):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._closed = threading.Event()
+        self._close_lock = threading.Lock()
+        self._on_close = on_close
+        self._pending = len(sources)
+        app = current_app._get_current_object()
+        for source in sources:
+            threading.Thread(target=self._drain, args=(app, source), daemon=True).start()
+
+    def _put(self, item):
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _drain(self, app, source):
+        with app.app_context():
+            try:
+                for item in source:
+                    if not self._put(item):
+                        return
+            except Exception as e:
+                # Reads fail once close() tears the source down; only report real errors
+                if not self._closed.is_set():
+                    self._put(_Failure(e))
+            finally:
+                self._put(_DONE)
+
+    def events(self, heartbeat=15):
+        """Yield items as they arrive (and HEARTBEAT when idle) until every source ends"""
+        remaining = self._pending
+        while remaining:
+            try:
+                item = self._queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield HEARTBEAT
+                continue
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, _Failure):
+                raise item.error
+            else:
+                yield item
+
+    def close(self):
+        """Stop the readers and the upstream; safe to call more than once"""
+        with self._close_lock:
+            if self._closed.is_set():
+                return
+            self._closed.set()
+        if self._on_close:
+            self._on_close()
+
+def stream_format():
+    """'sse' or 'ndjson' from ?format= or the Accept header; None if unsupported"""
+    fmt = request.args.get('format')
+    if fmt:
+        fmt = fmt.lower()
+        return fmt if fmt in STREAM_FORMATS else None
+    if request.accept_mimetypes.best_match(['application/x-ndjson', 'text/event-stream']) == 'text/event-stream':
+        return 'sse'
+    return 'ndjson'
+
+def encode_event(item, fmt, event=None):
+    """One NDJSON line or SSE message for a JSON-able item"""
+    data = json.dumps(item, separators=(',', ':'))
+    if fmt == 'sse':
+        return f"event: {event}\ndata: {data}\n\n" if event else f"data: {data}\n\n"
+    return data + '\n'
+
+def stream_response(pump, fmt, heartbeat=15, on_close=None):
+    """Chunked Response that relays a StreamPump as NDJSON or Server-Sent Events
+
+    The pump (and with it the upstream process or connection) is closed when
+    the stream ends or the WSGI server closes the response because the client
+    went away. Errors after the headers are sent are reported in-band.
+    """
+    def generate():
+        try:
+            for item in pump.events(heartbeat):
+                if item is HEARTBEAT:
+                    # Blank NDJSON lines and SSE comments are ignored by clients
+                    yield ': keepalive\n\n' if fmt == 'sse' else '\n'
+                else:
+                    yield encode_event(item, fmt)
+            if fmt == 'sse':
+                yield encode_event({"success": True}, fmt, event='end')
+        except Exception as e:
+            current_app.logger.error(f"Stream failed: {e}")
+            yield encode_event({"error": str(e), "success": False}, fmt, event='error')
+        finally:
+            pump.close()
+
+    response = current_app.response_class(stream_with_context(generate()), mimetype=STREAM_FORMATS[fmt])
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(pump.close)
+    if on_close:
+        response.call_on_close(on_close)
+    return response
+
+class StreamSlots:
+    """Non-blocking cap on concurrent long-lived streams in one worker
+
+    Every stream holds a gunicorn thread for its whole lifetime, so the cap
+    keeps some threads free for ordinary requests.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.active >= self.limit:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active = max(self.active - 1, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {"active": self.active, "limit": self.limit, "rejected": self.rejected}
+
+# Stream kind -> config key holding its per-worker limit
+STREAM_LIMITS = {
+    'logs': 'LOG_MAX_FOLLOWERS',
+    'pulls': 'PULL_MAX_STREAMS',
+    'builds': 'BUILD_MAX_STREAMS',
+    'bulk': 'BULK_MAX_STREAMS'
+}
+
+_slots = {}
+_slots_pid = None
+_slots_lock = threading.Lock()
+
+def get_stream_slots(kind):
+    """Per-process StreamSlots for one kind of stream ('logs', 'pulls', 'builds', 'bulk')"""
+    global _slots, _slots_pid
+    pid = os.getpid()
+    with _slots_lock:
+        if _slots_pid != pid:
+            _slots = {}
+            _slots_pid = pid
+        if kind not in _slots:
+            _slots[kind] = StreamSlots(current_app.config.get(STREAM_LIMITS[kind], 4))
+        return _slots[kind]
+
+def stream_slots_snapshot():
+    """Active/limit/rejected counts for every kind of stream in this worker"""
+    return {kind: get_stream_slots(kind).snapshot() for kind in STREAM_LIMITS}
+
+def wants_stream():
+    """True when the request asked for a streamed response (?stream=true, ?format= or Accept)"""
+    return (request.args.get('stream', 'false').lower() == 'true' or 'format' in request.args
+            or 'text/event-stream' in request.headers.get('Accept', ''))
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# The application imports its modules relative to src/ (from utils... / from routes...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+# utils.auth_db creates data/ in the working directory on import
+os.chdir(tempfile.mkdtemp(prefix='dokemon-tests-'))
@@ -0,0 +1,63 @@
+import pytest
+
+from utils.admission import AdmissionControl, AdmissionTimeout, command_class, parse_admission_limits, request_class
+
+def test_parse_admission_limits():
+    assert parse_admission_limits("read=16, mutate=8,,long=") == {"read": 16, "mutate": 8}
+    assert parse_admission_limits(None) == {}
+
+@pytest.mark.parametrize("command, klass", [
+    ("docker ps -a", 'read'),
+    (["docker", "inspect", "web"], 'read'),
+    ("docker rm web", 'mutate'),
+    ("docker network create backend", 'mutate'),
+    ("docker pull nginx", 'long'),
+    ("docker image pull nginx", 'long'),
+    ("docker image build .", 'long'),
+    ("docker system prune -f", 'long'),
+    ("docker image prune -a", 'long'),
+    ("docker ps 'unterminated", 'mutate')
+])
+def test_command_class(command, klass):
+    assert command_class(command) == klass
+
+def test_streaming_watchers_are_unmetered():
+    assert command_class(["docker", "logs", "-f", "web"], process=True) is None
+    assert command_class(["docker", "events"], process=True) is None
+    assert command_class(["docker", "pull", "nginx"], process=True) == 'long'
+
+@pytest.mark.parametrize("method, path, stream, klass", [
+    ("GET", "/containers/json?all=1", False, 'read'),
+    ("GET", "/containers/web/stats?stream=0", False, 'read'),
+    ("POST", "/containers/web/restart", False, 'mutate'),
+    ("DELETE", "/volumes/data", False, 'mutate'),
+    ("POST", "/containers/prune", False, 'long'),
+    ("GET", "/images/get?names=nginx", False, 'long'),
+    ("POST", "/images/create?fromImage=nginx", True, 'long'),
+    ("POST", "/build?t=app", True, 'long'),
+    ("GET", "/containers/web/logs?follow=1", True, None),
+    ("GET", "/events", True, None)
+])
+def test_request_class(method, path, stream, klass):
+    assert request_class(method, path, stream) == klass
+
+def test_slots_are_shared_by_instances_on_one_directory(tmp_path):
+    first = AdmissionControl(str(tmp_path), {"long": 2})
+    second = AdmissionControl(str(tmp_path), {"long": 2})
+    slots = [first.acquire('long'), second.acquire('long')]
+    assert second.busy('long') == 2
+    with pytest.raises(AdmissionTimeout):
+        second.acquire('long', timeout=0.05)
+    first.release('long', slots[0])
+    slot = second.acquire('long', timeout=0.05)
+    assert slot is not None
+    second.release('long', slot)
+    second.release('long', slots[1])
+    assert first.busy('long') == 0
+    stats = second.snapshot()["classes"]["long"]
+    assert (stats["admitted"], stats["timeouts"], stats["active"]) == (2, 1, 0)
+
+def test_unlimited_classes_need_no_slot(tmp_path):
+    admission = AdmissionControl(str(tmp_path), {"read": 0})
+    assert admission.acquire('read') is None
+    assert admission.acquire('mutate') is None
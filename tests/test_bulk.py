@@ -0,0 +1,23 @@
+import pytest
+
+from utils.bulk import CONTAINER_REF_PATTERN
+
+@pytest.mark.parametrize("ref", [
+    "web",
+    "3f4e8a1c9b2d",
+    "my_app.web-1"
+])
+def test_container_ref_pattern_accepts_ids_and_names(ref):
+    assert CONTAINER_REF_PATTERN.fullmatch(ref)
+
+@pytest.mark.parametrize("ref", [
+    "",
+    "-web",
+    "web; rm -rf /",
+    "$(reboot)",
+    "web other",
+    "--force",
+    "web\n"
+])
+def test_container_ref_pattern_rejects_everything_else(ref):
+    assert not CONTAINER_REF_PATTERN.fullmatch(ref)
@@ -0,0 +1,113 @@
+import pytest
+
+from utils import cgroup_metrics
+from utils.cgroup_metrics import CgroupReader, _requested_key
+
+FULL_ID = 'a' * 64
+OTHER_ID = 'ab' + 'c' * 62
+
+def write_cgroup(directory, usage_usec=1000000, memory='4096', memory_max='8192', inactive_file=1024,
+                 io='8:0 rbytes=100 wbytes=200 rios=1 wios=2\n8:16 rbytes=1 wbytes=2 rios=1 wios=1\n', pids='3'):
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / 'cpu.stat').write_text(f"usage_usec {usage_usec}\nuser_usec 10\nthrottled_usec 2500000\n")
+    (directory / 'memory.current').write_text(f"{memory}\n")
+    (directory / 'memory.max').write_text(f"{memory_max}\n")
+    (directory / 'memory.stat').write_text(f"anon 100\ninactive_file {inactive_file}\n")
+    if io is not None:
+        (directory / 'io.stat').write_text(io)
+    if pids is not None:
+        (directory / 'pids.current').write_text(f"{pids}\n")
+    return directory
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / 'cgroup.controllers').write_text('cpu io memory pids\n')
+    return tmp_path
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cgroup_metrics.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_available_needs_a_unified_hierarchy(root, tmp_path_factory):
+    assert CgroupReader(str(root)).available()
+    assert not CgroupReader(str(tmp_path_factory.mktemp('v1'))).available()
+
+def test_cgroup_path_finds_systemd_and_cgroupfs_layouts(root):
+    systemd = write_cgroup(root / 'system.slice' / f'docker-{FULL_ID}.scope')
+    cgroupfs = write_cgroup(root / 'docker' / OTHER_ID)
+    reader = CgroupReader(str(root))
+    assert reader.cgroup_path(FULL_ID) == str(systemd)
+    assert reader.cgroup_path('aaaaaaaaaaaa') == str(systemd)
+    assert reader.cgroup_path(OTHER_ID[:12]) == str(cgroupfs)
+    assert reader.cgroup_path('f' * 12) is None
+
+def test_cgroup_path_rejects_ambiguous_prefixes(root):
+    write_cgroup(root / 'system.slice' / f'docker-{FULL_ID}.scope')
+    write_cgroup(root / 'system.slice' / f'docker-{OTHER_ID}.scope')
+    assert CgroupReader(str(root)).cgroup_path('a') is None
+
+def test_read_reports_counters_and_leaves_page_cache_out(root, clock):
+    write_cgroup(root / 'system.slice' / f'docker-{FULL_ID}.scope')
+    row = CgroupReader(str(root)).read(FULL_ID[:12])
+    assert row["container_id"] == FULL_ID
+    assert row["memory_bytes"] == 4096 - 1024
+    assert row["memory_limit_bytes"] == 8192
+    assert row["memory_fraction"] == round(3072 / 8192, 6)
+    assert row["cpu_usage_seconds"] == 1.0
+    assert row["cpu_throttled_seconds"] == 2.5
+    assert (row["block_read_bytes"], row["block_write_bytes"]) == (101, 202)
+    assert row["pids"] == 3
+    assert row["network_rx_bytes"] is None and row["network_tx_bytes"] is None
+    # No baseline yet
+    assert row["cpu_fraction"] is None and row["rate_window_seconds"] is None
+
+def test_read_unlimited_memory_uses_host_memory(root, clock):
+    write_cgroup(root / 'docker' / FULL_ID, memory_max='max')
+    reader = CgroupReader(str(root))
+    reader.host_memory = 16384
+    row = reader.read(FULL_ID)
+    assert row["memory_limit_bytes"] == 16384
+    assert row["memory_fraction"] == round(3072 / 16384, 6)
+
+def test_read_without_io_stat_or_pids_current(root, clock):
+    write_cgroup(root / 'docker' / FULL_ID, io=None, pids=None)
+    row = CgroupReader(str(root)).read(FULL_ID)
+    assert (row["block_read_bytes"], row["block_write_bytes"]) == (0, 0)
+    assert row["pids"] is None
+
+def test_read_missing_container(root):
+    reader = CgroupReader(str(root))
+    assert reader.read(FULL_ID) is None
+    assert reader.stats["not_found"] == 1
+
+def test_rates_use_a_baseline_replaced_after_the_interval(root, clock):
+    path = root / 'docker' / FULL_ID
+    write_cgroup(path, usage_usec=1000000, io='8:0 rbytes=0 wbytes=0\n')
+    reader = CgroupReader(str(root), rate_interval=1.0)
+    reader.read(FULL_ID)
+
+    # Inside the interval: still no completed window
+    clock[0] += 0.5
+    write_cgroup(path, usage_usec=1200000, io='8:0 rbytes=500 wbytes=0\n')
+    assert reader.read(FULL_ID)["cpu_fraction"] is None
+
+    clock[0] += 1.5
+    write_cgroup(path, usage_usec=2000000, io='8:0 rbytes=4000 wbytes=2000\n')
+    row = reader.read(FULL_ID)
+    assert row["rate_window_seconds"] == 2.0
+    assert row["cpu_fraction"] == 0.5
+    assert row["block_read_bytes_per_second"] == 2000.0
+    assert row["block_write_bytes_per_second"] == 1000.0
+
+    # The next read within the interval reports the last completed window
+    clock[0] += 0.2
+    write_cgroup(path, usage_usec=2100000)
+    assert reader.read(FULL_ID)["cpu_fraction"] == 0.5
+
+def test_requested_key_matches_id_prefix_or_name():
+    row = {"container_id": FULL_ID, "name": "web"}
+    assert _requested_key(row, ['db', 'web']) == 'web'
+    assert _requested_key(row, ['bbb', FULL_ID[:12]]) == FULL_ID[:12]
+    assert _requested_key(row, ['bbb', 'db']) is None
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+from flask import Flask
+
+from utils import circuit_breaker
+from utils.circuit_breaker import CircuitBreaker, circuit_open_response
+
+@pytest.fixture(autouse=True)
+def app_context():
+    # Transitions are logged through current_app
+    with Flask(__name__).app_context():
+        yield
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', lambda: now[0])
+    return now
+
+def in_thread(fn):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure("down")
+    breaker.record_failure("down")
+    breaker.record_success()
+    breaker.record_failure("down")
+    breaker.record_failure("down")
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure("down")
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.retry_after() == 31
+    assert breaker.snapshot()["rejected"] == 1
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure("down")
+    clock[0] += 30
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    # Other threads keep failing fast while the probe runs
+    assert not in_thread(breaker.allow)
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert in_thread(breaker.allow)
+    assert [t["to"] for t in breaker.transitions] == ['open', 'half_open', 'closed']
+
+def test_failed_probe_opens_again(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure("down")
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure("still down")
+    assert breaker.state == 'open'
+    assert breaker.stats["opened"] == 2
+    assert not breaker.allow()
+
+def test_a_lost_probe_is_replaced(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure("down")
+    clock[0] += 30
+    assert breaker.allow()
+    clock[0] += 30
+    assert in_thread(breaker.allow)
+
+def test_threshold_zero_disables_it():
+    breaker = CircuitBreaker(failure_threshold=0)
+    for _ in range(10):
+        breaker.record_failure("down")
+    assert breaker.state == 'closed' and breaker.allow()
+    assert breaker.snapshot()["enabled"] is False
+
+def test_circuit_open_response(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure("down")
+    clock[0] += 10
+    response, status = circuit_open_response(breaker)
+    assert status == 503
+    assert response["success"] is False
+    assert (response["circuit"], response["retry_after"]) == ('open', 21)
@@ -0,0 +1,89 @@
+import os
+import socket
+import threading
+
+import pytest
+
+from utils.admission import AdmissionControl, AdmissionTimeout
+from utils.docker_api import DockerAPIClient, DockerAPIError
+
+class FakeDaemon:
+    """Answers each connection's first request, then hangs up like an idle keep-alive timeout"""
+
+    def __init__(self, path):
+        self.requests = []
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen(8)
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.answer, args=(conn,), daemon=True).start()
+
+    def answer(self, conn):
+        with conn:
+            data = b''
+            while b'\r\n\r\n' not in data:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+            if not data:
+                return
+            self.requests.append(data.split(b' ', 2)[:2])
+            body = b'{"ok": true}'
+            conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                         b'Content-Length: %d\r\n\r\n%s' % (len(body), body))
+            # Let the client pool the connection before it is closed under it
+            conn.recv(1)
+
+    def close(self):
+        self.sock.close()
+
+@pytest.fixture
+def daemon(tmp_path):
+    path = os.path.join(tmp_path, 'docker.sock')
+    daemon = FakeDaemon(path)
+    client = DockerAPIClient(f"unix://{path}", timeout=5)
+    yield daemon, client
+    client.close()
+    daemon.close()
+
+def test_gets_are_retried_on_a_dead_pooled_connection(daemon):
+    daemon, client = daemon
+    assert client.get('/containers/json') == (200, {"ok": True})
+    assert client.get('/containers/json') == (200, {"ok": True})
+    assert client.stats["connections_reused"] == 1
+    assert client.stats["connections_opened"] == 2
+    assert len(daemon.requests) == 2
+
+def test_sent_posts_are_not_repeated(daemon):
+    daemon, client = daemon
+    client.get('/_ping')
+    with pytest.raises(DockerAPIError) as error:
+        client.post('/containers/web/restart')
+    assert error.value.status == 502
+    assert error.value.connection_lost
+    assert "may or may not have been applied" in error.value.message
+    assert [method for method, _ in daemon.requests] == [b'GET']
+
+def test_requests_hold_an_admission_slot(daemon, tmp_path):
+    daemon, client = daemon
+    client.admission = AdmissionControl(str(tmp_path / 'slots'), {"read": 1, "long": 1}, queue_timeout=0.05)
+    assert client.get('/_ping') == (200, {"ok": True})
+    assert client.admission.busy('read') == 0
+    with client.stream('POST', '/images/create', params={"fromImage": "nginx"}) as response:
+        assert response.status == 200
+        assert client.admission.busy('long') == 1
+    assert client.admission.busy('long') == 0
+    with client.admitted('read'):
+        with pytest.raises(AdmissionTimeout):
+            client.get('/_ping')
+        # Requests sharing the held slot go through
+        assert client.get('/_ping', metered=False) == (200, {"ok": True})
+    assert client.admission.snapshot()["classes"]["read"]["timeouts"] == 1
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+from flask import Flask
+
+from utils import circuit_breaker
+from utils.docker_api import DockerAPIError, DockerAPITimeout, DockerAPIUnavailable
+from utils.docker_backend import call_backend, stream_events
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, '_breaker', None)
+    app = Flask(__name__)
+    app.config.update(DOCKER_BACKEND='api', BREAKER_THRESHOLD=2, ADMISSION_ENABLED=False)
+    with app.app_context():
+        yield app
+
+def failing(status):
+    def api(client):
+        raise DockerAPIError(status, f"Error response from daemon: {status}")
+    return api
+
+def cli():
+    raise AssertionError("the CLI must not run for errors the daemon answered with")
+
+@pytest.mark.parametrize("status, expected", [(404, 404), (409, 409), (400, 400), (403, 400), (500, 500), (503, 503)])
+def test_daemon_errors_keep_their_status(app, monkeypatch, status, expected):
+    monkeypatch.setattr('utils.docker_backend.get_docker_api', lambda: None)
+    response, returned = call_backend(failing(status), cli)
+    assert returned == expected
+    assert response == {"success": False, "error": f"Error response from daemon: {status}"}
+
+def test_daemon_errors_do_not_count_against_the_breaker(app, monkeypatch):
+    monkeypatch.setattr('utils.docker_backend.get_docker_api', lambda: None)
+    for status in (404, 500, 500, 500):
+        call_backend(failing(status), cli)
+    assert circuit_breaker.get_circuit_breaker().snapshot()["consecutive_failures"] == 0
+    response, status = call_backend(failing(500), cli)
+    assert status == 500
+
+def test_lost_connections_and_timeouts_count_against_the_breaker(app, monkeypatch):
+    monkeypatch.setattr('utils.docker_backend.get_docker_api', lambda: None)
+
+    def lost(client):
+        raise DockerAPIError(502, "Connection to the daemon lost during POST /containers/web/start", connection_lost=True)
+
+    def timed_out(client):
+        raise DockerAPITimeout("timed out")
+
+    assert call_backend(lost, cli)[1] == 502
+    assert call_backend(timed_out, cli)[1] == 408
+    response, status = call_backend(failing(404), cli)
+    assert status == 503
+    assert response["circuit"] == 'open'
+
+def test_event_stream_falls_back_to_the_cli_without_replaying_events(app, monkeypatch):
+    events = [{"id": str(n), "time": 1700000000 + n, "timeNano": (1700000000 + n) * 10**9 + 500} for n in range(4)]
+
+    class BrokenStream:
+        def stream(self, method, path, params=None, timeout=None):
+            assert params["since"] == "1700000000.000"
+            return self
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def __iter__(self):
+            yield (json.dumps(events[0]) + '\n').encode()
+            yield (json.dumps(events[1]) + '\n').encode()
+            raise DockerAPIUnavailable("connection reset")
+
+    class Process:
+        stdout = [json.dumps(event) + '\n' for event in events]
+        returncode = 0
+
+        def wait(self):
+            return 0
+
+    started = []
+    monkeypatch.setattr('utils.docker_backend.get_docker_api', BrokenStream)
+    monkeypatch.setattr('utils.docker_backend.start_docker_process', lambda args, **kwargs: started.append(args) or Process())
+    monkeypatch.setattr('utils.docker_backend.stop_docker_process', lambda process: None)
+
+    assert [event["id"] for event in stream_events(1700000000, 1700000010)] == ['0', '1', '2', '3']
+    assert started[0][started[0].index('--since') + 1] == "1700000001.000"
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from utils import jobs
+from utils.jobs import JobManager
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'DATABASE_DIR', str(tmp_path))
+    monkeypatch.setattr(jobs, 'DATABASE_FILE', str(tmp_path / 'dokemon.db'))
+    manager = JobManager(Flask(__name__))
+    yield manager
+    manager._executor.shutdown(wait=False)
+
+def running_job(manager, kind, params):
+    job = manager.submit(kind, params)
+    manager._update(job["id"], status='running', started_at=time.time(), pid=os.getpid())
+    process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    manager._running[job["id"]] = process
+    return job["id"], process
+
+def test_stop_requeues_jobs_that_can_start_over(manager):
+    pull, pull_process = running_job(manager, 'pull', {"image": "nginx"})
+    run, run_process = running_job(manager, 'run', {"image": "nginx"})
+    manager.stop(grace=0)
+    assert pull_process.wait(5) is not None and run_process.wait(5) is not None
+    requeued = manager.get(pull)
+    assert requeued["status"] == 'queued'
+    assert requeued["started_at"] is None
+    failed = manager.get(run)
+    assert failed["status"] == 'failed'
+    assert failed["error"] == "Worker shut down before the job finished"
+    # The interrupted execution does not overwrite the requeued job
+    manager._update_own(pull, status='failed', error="terminated")
+    assert manager.get(pull)["status"] == 'queued'
+
+def test_stop_lets_jobs_finish_within_the_grace_period(manager):
+    pull, process = running_job(manager, 'pull', {"image": "nginx"})
+
+    def finish():
+        time.sleep(0.2)
+        manager._update_own(pull, status='succeeded', finished_at=time.time())
+        with manager._lock:
+            manager._running.pop(pull)
+
+    threading.Thread(target=finish).start()
+    started = time.monotonic()
+    manager.stop(grace=10)
+    assert time.monotonic() - started < 5
+    assert manager.get(pull)["status"] == 'succeeded'
+    assert process.poll() is None
+    process.kill()
+    process.wait()
+
+@pytest.mark.parametrize("params", ["nginx", ["nginx"], 3])
+def test_submit_rejects_params_that_are_not_an_object(manager, params):
+    with pytest.raises(ValueError, match="must be an object"):
+        manager.submit('pull', params)
+
+def test_submit_checks_required_params(manager):
+    with pytest.raises(ValueError, match="image"):
+        manager.submit('pull', None)
+    assert manager.submit('prune', None)["status"] == 'queued'
@@ -0,0 +1,127 @@
+import math
+from array import array
+
+import pytest
+
+from utils.metrics_history import (
+    MetricsHistory, Ring, counter_rate, downsample, latest_row, parse_resolutions, summarize
+)
+
+NAN = math.nan
+
+def stats_row(container_id, **values):
+    return {"container_id": container_id, "name": f"name-{container_id}", **values}
+
+def test_parse_resolutions():
+    assert parse_resolutions("1m:24h, 1s:10m") == [(1, 600), (60, 1440)]
+
+@pytest.mark.parametrize("value", ["1s", "0s:10m", "1m:10s", "x:10m"])
+def test_parse_resolutions_rejects(value):
+    with pytest.raises(ValueError):
+        parse_resolutions(value)
+
+def test_ring_averages_samples_in_one_bucket():
+    ring = Ring(10, 6)
+    ring.add(100, {"cpu_fraction": 1.0, "pids": 4})
+    ring.add(105, {"cpu_fraction": 2.0, "pids": None})
+    ring.add(109, {"cpu_fraction": 3.0, "pids": 8})
+    times, columns = ring.window(100, 109)
+    assert times == [100]
+    assert list(columns["cpu_fraction"]) == [2.0]
+    # Missing values do not drag the average down
+    assert list(columns["pids"]) == [6.0]
+    assert math.isnan(columns["memory_bytes"][0])
+
+def test_ring_wraps_around():
+    ring = Ring(1, 3)
+    for t in range(5):
+        ring.add(t, {"pids": t})
+    times, columns = ring.window(0, 4)
+    assert times == [2, 3, 4]
+    assert list(columns["pids"]) == [2.0, 3.0, 4.0]
+    # The slot of bucket 0 now holds bucket 3
+    assert ring.window(0, 0)[0] == []
+    assert ring.retention == 3
+
+def test_ring_window_skips_gaps():
+    ring = Ring(1, 10)
+    ring.add(1, {"pids": 1})
+    ring.add(4, {"pids": 4})
+    times, columns = ring.window(0, 5)
+    assert times == [1, 4]
+    assert list(columns["pids"]) == [1.0, 4.0]
+
+def test_summarize():
+    summary = summarize(array('d', [4, NAN, 1, 3, 2]))
+    assert summary == {"count": 4, "min": 1, "max": 4, "avg": 2.5, "p50": 2, "p90": 4, "p99": 4}
+
+def test_summarize_without_values():
+    summary = summarize(array('d', [NAN]))
+    assert summary["count"] == 0
+    assert summary["avg"] is None and summary["p99"] is None
+
+def test_counter_rate():
+    assert counter_rate([0, 1, 2, 4], [100, NAN, 150, 300]) == 50
+    # A counter that went backwards (container restarted) counts as no increase
+    assert counter_rate([0, 10], [500, 100]) == 0
+    assert counter_rate([0, 1], [NAN, 5]) is None
+
+def test_downsample():
+    times, columns = downsample([0, 1, 2, 3, 4], {"pids": [1, 3, NAN, NAN, 5]}, 3)
+    assert times == [0, 2, 4]
+    assert columns == {"pids": [2, None, 5]}
+
+def test_downsample_keeps_short_series():
+    times, columns = downsample([0, 1], {"pids": [1, NAN]}, 10)
+    assert times == [0, 1]
+    assert columns == {"pids": [1, None]}
+
+def test_latest_row_rates():
+    first = latest_row(100, stats_row("a", network_rx_bytes=100, network_tx_bytes=0, block_read_bytes=10, block_write_bytes=None))
+    assert first["network_bytes"] == 100
+    assert first["block_bytes"] is None
+    assert first["network_bytes_per_second"] is None
+    second = latest_row(110, stats_row("a", network_rx_bytes=400, network_tx_bytes=200), first)
+    assert second["network_bytes_per_second"] == 50.0
+
+def test_record_and_query():
+    history = MetricsHistory(None, [(1, 60), (10, 60)])
+    for t in range(100, 110):
+        history.record(t, [stats_row("abc123", cpu_fraction=t - 100, network_rx_bytes=(t - 100) * 10)])
+    result = history.query("abc", 5, metrics=("cpu_fraction", "network_rx_bytes"), max_points=2, now=109)
+    assert result["container_id"] == "abc123"
+    assert result["step_seconds"] == 1
+    assert result["buckets"] == 6
+    assert result["metrics"]["cpu_fraction"]["max"] == 9
+    assert result["metrics"]["network_rx_bytes"]["rate_per_second"] == 10
+    assert result["points"]["timestamps"] == [104, 107]
+    # A window longer than the finest ring uses the coarser one
+    assert history.query("name-abc123", 300, now=109)["step_seconds"] == 10
+    assert history.query("nope", 5) is None
+
+def test_top_ranks_containers_beyond_the_cap():
+    history = MetricsHistory(None, [(1, 10)], max_containers=2)
+    history.record(100, [stats_row(f"c{i}", cpu_fraction=i / 10) for i in range(5)])
+    top = history.top("cpu", 3)
+    assert top["ranked"] == 5
+    assert [row["container_id"] for row in top["containers"]] == ["c4", "c3", "c2"]
+    assert history.stats["untracked"] == 3
+    assert len(history._series) == 2
+
+def test_record_keeps_recurring_containers():
+    history = MetricsHistory(None, [(1, 10)], max_containers=2)
+    history.record(100, [stats_row("a"), stats_row("b"), stats_row("c")])
+    history.record(101, [stats_row("a"), stats_row("b"), stats_row("c")])
+    assert set(history._series) == {"a", "b"}
+    assert history.stats["evictions"] == 0
+    # "b" went away: the newcomer takes its place
+    history.record(102, [stats_row("a"), stats_row("c")])
+    assert set(history._series) == {"a", "c"}
+    assert history.stats["evictions"] == 1
+    assert history.stats["untracked"] == 0
+
+def test_record_expires_containers_gone_past_retention():
+    history = MetricsHistory(None, [(1, 10)])
+    history.record(100, [stats_row("a"), stats_row("b")])
+    history.record(111, [stats_row("a")])
+    assert set(history._series) == {"a"}
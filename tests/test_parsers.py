@@ -0,0 +1,155 @@
+import json
+
+from utils.parsers import (
+    iter_json_lines, parse_labels, parse_container_list, parse_image_list, parse_network_list, parse_volume_list,
+    parse_size, parse_stats_row, parse_engine_stats
+)
+
+def json_lines(*items):
+    return '\n'.join(json.dumps(item) for item in items)
+
+def test_iter_json_lines_accepts_strings_and_line_iterables():
+    assert list(iter_json_lines('{"a": 1}\n\n  {"a": 2}  \n')) == [{"a": 1}, {"a": 2}]
+    assert list(iter_json_lines(iter(['{"a": 1}\n', '\n']))) == [{"a": 1}]
+
+def test_parse_labels():
+    assert parse_labels('a=b,c=d=e,flag=') == {"a": "b", "c": "d=e", "flag": ""}
+    assert parse_labels('') == {}
+    assert parse_labels({"a": "b"}) == {"a": "b"}
+
+def test_parse_container_list_json():
+    output = json_lines({
+        "ID": "0123456789abcdef" * 4, "Image": "nginx:latest", "Command": "\"nginx\"", "RunningFor": "2 hours ago",
+        "Status": "Up 2 hours", "Ports": "0.0.0.0:80->80/tcp", "Names": "web", "State": "running",
+        "CreatedAt": "2024-01-01 10:00:00 +0100 CET", "Labels": "app=web,tier=front", "Mounts": "data,logs", "Networks": "bridge"
+    })
+    [container] = parse_container_list(output)
+    assert container["container_id"] == "0123456789ab"
+    assert container["id"] == "0123456789abcdef" * 4
+    assert container["names"] == "web"
+    assert container["state"] == "running"
+    assert container["created_at"].startswith("2024-01-01T09:00:00")
+    assert container["labels"] == {"app": "web", "tier": "front"}
+    assert container["mounts"] == ["data", "logs"]
+    assert container["networks"] == ["bridge"]
+
+def test_parse_container_list_empty_output():
+    assert parse_container_list('') == []
+    assert parse_container_list(None) == []
+
+def test_parse_image_list_json():
+    [image] = parse_image_list(json_lines({
+        "ID": "sha256:" + "f" * 64, "Repository": "nginx", "Tag": "latest", "CreatedSince": "3 weeks ago",
+        "Size": "187MB", "Digest": "<none>", "CreatedAt": "2024-01-01 10:00:00 +0000 UTC"
+    }))
+    assert image["image_id"] == "f" * 12
+    assert image["id"] == "sha256:" + "f" * 64
+    assert (image["repository"], image["tag"], image["size"]) == ("nginx", "latest", "187MB")
+
+def test_parse_network_list_json():
+    [network] = parse_network_list(json_lines({
+        "ID": "1" * 64, "Name": "backend", "Driver": "bridge", "Scope": "local", "Internal": "true", "IPv6": "false",
+        "Labels": "", "CreatedAt": "2024-01-01 10:00:00.123456 +0000 UTC"
+    }))
+    assert network["network_id"] == "1" * 12
+    assert network["internal"] is True and network["ipv6"] is False
+    assert network["labels"] == {}
+
+def test_parse_volume_list_json():
+    [volume] = parse_volume_list(json_lines({
+        "Driver": "local", "Name": "data", "Scope": "local", "Mountpoint": "/var/lib/docker/volumes/data/_data",
+        "Labels": "backup=daily"
+    }))
+    assert volume == {
+        "driver": "local", "volume_name": "data", "scope": "local",
+        "mountpoint": "/var/lib/docker/volumes/data/_data", "labels": {"backup": "daily"}
+    }
+
+def test_parse_container_list_still_reads_the_table_format():
+    columns = [('CONTAINER ID', 'abc0def45678'), ('IMAGE', 'nginx:latest'), ('COMMAND', '"nginx -g daemon"'),
+               ('CREATED', '2 hours ago'), ('STATUS', 'Up 2 hours'), ('PORTS', '0.0.0.0:80->80/tcp'), ('NAMES', 'web0')]
+    header = ''.join(name.ljust(24) for name, _ in columns)
+    row = ''.join(value.ljust(24) for _, value in columns)
+    [container] = parse_container_list(f"{header}\n{row}")
+    assert container["container_id"] == "abc0def45678"
+    assert container["image"] == "nginx:latest"
+    assert container["names"] == "web0"
+
+def test_parse_size_units():
+    assert parse_size("512B") == 512
+    assert parse_size("0B") == 0
+    assert parse_size("1.5kB") == 1500
+    assert parse_size("1.5KB") == 1500
+    assert parse_size("1.5KiB") == 1536
+    assert parse_size("4.1MB") == 4100000
+    assert parse_size(" 12.3MiB ") == round(12.3 * 1024 ** 2)
+    assert parse_size("2GiB") == 2 * 1024 ** 3
+    assert parse_size("42") == 42
+
+def test_parse_size_unparseable():
+    assert parse_size("--") is None
+    assert parse_size("") is None
+    assert parse_size(None) is None
+    assert parse_size("12 parsecs") is None
+
+def test_parse_stats_row():
+    row = parse_stats_row({
+        "ID": "abc0def45678", "Name": "web", "CPUPerc": "150.25%", "MemUsage": "12MiB / 1GiB", "MemPerc": "1.17%",
+        "NetIO": "1.5kB / 648B", "BlockIO": "4.1MB / 0B", "PIDs": "7"
+    })
+    assert row == {
+        "container_id": "abc0def45678",
+        "name": "web",
+        "cpu_fraction": 1.5025,
+        "memory_bytes": 12 * 1024 ** 2,
+        "memory_limit_bytes": 1024 ** 3,
+        "memory_fraction": 0.0117,
+        "network_rx_bytes": 1500,
+        "network_tx_bytes": 648,
+        "block_read_bytes": 4100000,
+        "block_write_bytes": 0,
+        "pids": 7
+    }
+
+def test_parse_stats_row_of_a_stopped_container():
+    row = parse_stats_row({
+        "ID": "abc0def45678", "Name": "web", "CPUPerc": "--", "MemUsage": "-- / --", "MemPerc": "--",
+        "NetIO": "--", "BlockIO": "--", "PIDs": "--"
+    })
+    assert row["cpu_fraction"] is None
+    assert row["memory_bytes"] is None and row["memory_limit_bytes"] is None
+    assert row["network_rx_bytes"] is None and row["block_write_bytes"] is None
+    assert row["pids"] is None
+
+def test_parse_engine_stats():
+    row = parse_engine_stats({
+        "id": "abc0def45678" * 5, "name": "/web",
+        "cpu_stats": {"cpu_usage": {"total_usage": 3_000_000}, "system_cpu_usage": 20_000_000, "online_cpus": 4},
+        "precpu_stats": {"cpu_usage": {"total_usage": 1_000_000}, "system_cpu_usage": 10_000_000},
+        "memory_stats": {"usage": 3000, "limit": 10000, "stats": {"inactive_file": 1000}},
+        "networks": {"eth0": {"rx_bytes": 10, "tx_bytes": 20}, "eth1": {"rx_bytes": 1, "tx_bytes": 2}},
+        "blkio_stats": {"io_service_bytes_recursive": [
+            {"op": "Read", "value": 100}, {"op": "write", "value": 50}, {"op": "read", "value": 5}, {"op": "Total", "value": 155}
+        ]},
+        "pids_stats": {"current": 3}
+    })
+    assert row["name"] == "web"
+    # (2M / 10M) of the host, times 4 CPUs
+    assert row["cpu_fraction"] == 0.8
+    assert row["memory_bytes"] == 2000
+    assert row["memory_fraction"] == 0.2
+    assert (row["network_rx_bytes"], row["network_tx_bytes"]) == (11, 22)
+    assert (row["block_read_bytes"], row["block_write_bytes"]) == (105, 50)
+    assert row["pids"] == 3
+
+def test_parse_engine_stats_idle_cgroup_v1():
+    # An idle container has no CPU delta; v1 reports the cache as total_inactive_file
+    cpu_stats = {"cpu_usage": {"total_usage": 5, "percpu_usage": [3, 2]}, "system_cpu_usage": 9}
+    row = parse_engine_stats({
+        "id": "abc", "cpu_stats": cpu_stats, "precpu_stats": cpu_stats,
+        "memory_stats": {"usage": 500, "stats": {"total_inactive_file": 200}}
+    })
+    assert row["cpu_fraction"] == 0.0
+    assert row["memory_bytes"] == 300
+    assert row["memory_limit_bytes"] is None and row["memory_fraction"] is None
+    assert row["pids"] is None
@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+from flask import Flask
+
+from utils import docker_backend
+from utils.pulls import PullRegistry, plan_pull
+
+@pytest.fixture
+def app():
+    with Flask(__name__).app_context() as context:
+        yield context.app
+
+class FakePulls:
+    """open_pull_stream stand-in: nginx blocks until released, every pull emits one layer"""
+
+    def __init__(self):
+        self.opened = []
+        self.release = threading.Event()
+        self.opening = threading.Event()
+
+    def open_pull_stream(self, image):
+        self.opened.append(image)
+        if image.startswith('nginx'):
+            self.opening.set()
+            self.release.wait(5)
+        if image.startswith('missing'):
+            return {"success": False, "error": "pull access denied"}, 400
+        events = [{"status": "Pull complete", "id": "layer1"}, {"status": f"Digest: sha256:{image}"}]
+        return {"events": iter(events), "close": lambda: None}, 200
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakePulls()
+    monkeypatch.setattr(docker_backend, 'open_pull_stream', fake.open_pull_stream)
+    return fake
+
+def in_app(app, fn):
+    def run():
+        with app.app_context():
+            fn()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def final_event(subscription):
+    return list(subscription)[-1]
+
+def test_other_images_do_not_wait_for_a_pull_being_opened(app, fake):
+    registry = PullRegistry()
+    results = {}
+    first = in_app(app, lambda: results.update(nginx=registry.attach('nginx')))
+    fake.opening.wait(5)
+    subscription, error = registry.attach('redis')
+    assert error is None
+    assert final_event(subscription)["status"] == 'complete'
+    assert registry.snapshot()["starting"] == ['nginx:latest']
+    fake.release.set()
+    first.join()
+    assert final_event(results["nginx"][0])["digest"] == 'sha256:nginx:latest'
+
+def test_callers_of_a_pull_being_opened_share_it(app, fake):
+    registry = PullRegistry()
+    results = {}
+    first = in_app(app, lambda: results.update(first=registry.attach('nginx')))
+    fake.opening.wait(5)
+    second = in_app(app, lambda: results.update(second=registry.attach('nginx:latest')))
+    second.join(0.1)
+    fake.release.set()
+    first.join()
+    second.join()
+    assert fake.opened == ['nginx:latest']
+    assert registry.stats == {"pulls_started": 1, "pulls_joined": 1}
+    for name in ('first', 'second'):
+        subscription, error = results[name]
+        assert error is None
+        assert final_event(subscription)["status"] == 'complete'
+
+def test_a_failed_start_is_reported_and_forgotten(app, fake):
+    registry = PullRegistry()
+    subscription, error = registry.attach('missing')
+    assert subscription is None
+    assert error == ({"success": False, "error": "pull access denied"}, 400)
+    assert registry.snapshot()["starting"] == [] and registry.snapshot()["in_flight"] == {}
+    registry.attach('missing')
+    assert fake.opened == ['missing:latest', 'missing:latest']
+
+@pytest.fixture
+def local_images(monkeypatch):
+    images = {"nginx:latest": ["nginx@sha256:old"]}
+    remote = {"nginx:latest": "sha256:new", "redis:latest": "sha256:redis"}
+
+    def inspect_image(image):
+        if image not in images:
+            return {"success": False, "error": f"No such image: {image}"}, 404
+        return {"success": True, "image_info": {"RepoDigests": images[image]}}, 200
+
+    monkeypatch.setattr(docker_backend, 'inspect_image', inspect_image)
+    monkeypatch.setattr(docker_backend, 'registry_digest', remote.get)
+    return images, remote
+
+def test_plan_pull(local_images):
+    images, remote = local_images
+    assert plan_pull("nginx:latest", 'always') == (True, "always")
+    assert plan_pull("redis:latest") == (True, "missing")
+    assert plan_pull("nginx:latest", 'missing') == (False, "present")
+    assert plan_pull("nginx:latest") == (True, "outdated")
+    images["nginx:latest"].append("nginx@sha256:new")
+    assert plan_pull("nginx:latest") == (False, "up to date")
+
+def test_plan_pull_keeps_local_tags_when_the_registry_digest_is_unknown(local_images):
+    images, remote = local_images
+    del remote["nginx:latest"]
+    assert plan_pull("nginx:latest") == (False, "unknown")
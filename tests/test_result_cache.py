@@ -0,0 +1,150 @@
+import threading
+
+import pytest
+from flask import Flask
+
+from utils import result_cache
+from utils.result_cache import CACHED_RESOURCES, ResultCache, mutation_resources, parse_ttls
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_parse_ttls():
+    assert parse_ttls("containers=1, images=30,,bogus") == {"containers": 1.0, "images": 30.0}
+    assert parse_ttls("") == {}
+    assert parse_ttls(None) == {}
+
+@pytest.mark.parametrize("method, path, resources", [
+    ("GET", "/api/v1/containers/list", ()),
+    ("POST", "/api/v1/containers/inspect", ()),
+    ("POST", "/api/v1/containers/start", ("containers", "info")),
+    ("DELETE", "/api/v1/images/remove", ("images", "info")),
+    ("POST", "/api/v1/volumes/create", ("volumes",)),
+    ("POST", "/api/v1/system/prune", CACHED_RESOURCES),
+    ("POST", "/api/v1/system/other", ())
+])
+def test_mutation_resources(method, path, resources):
+    assert mutation_resources(method, path) == resources
+
+def test_get_returns_entries_with_their_age(clock):
+    cache = ResultCache({"containers": 2}, stale_while_revalidate=5, max_stale=10)
+    cache.put(("containers",), {"rows": 1}, 200, cache.generation(("containers",)))
+    clock[0] += 3
+    assert cache.get(("containers",)) == ({"rows": 1}, 200, 3)
+    # Usable up to ttl + max(stale_while_revalidate, max_stale)
+    clock[0] += 9.5
+    assert cache.get(("containers",)) is None
+
+def test_resources_without_ttl_are_not_stored():
+    cache = ResultCache({"containers": 0})
+    cache.put(("containers",), {}, 200, 0)
+    cache.put(("images",), {}, 200, 0)
+    assert cache.get(("containers",)) is None
+    assert cache.get(("images",)) is None
+
+def test_invalidate_drops_entries_and_late_results():
+    cache = ResultCache({"containers": 5, "images": 5})
+    generation = cache.generation(("containers", True))
+    cache.put(("containers", True), {}, 200, generation)
+    cache.put(("images",), {}, 200, cache.generation(("images",)))
+    cache.invalidate("containers")
+    assert cache.get(("containers", True)) is None
+    assert cache.get(("images",)) is not None
+    # A read that started before the write must not store its result afterwards
+    cache.put(("containers", True), {}, 200, generation)
+    assert cache.get(("containers", True)) is None
+    assert cache.snapshot()["invalidations"] == 1
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResultCache({"containers": 5}, max_entries=2)
+    for i in range(2):
+        cache.put(("containers", i), {}, 200, 0)
+    cache.get(("containers", 0))
+    cache.put(("containers", 2), {}, 200, 0)
+    assert cache.get(("containers", 1)) is None
+    assert cache.get(("containers", 0)) is not None
+    assert cache.stats["evictions"] == 1
+
+def test_snapshot_hit_ratio():
+    cache = ResultCache({})
+    assert cache.snapshot()["hit_ratio"] is None
+    for name in ("hits", "hits", "stale_hits", "misses"):
+        cache.count(name)
+    assert cache.snapshot()["hit_ratio"] == 0.75
+
+def test_refresh_runs_once_per_key_in_the_background():
+    app = Flask(__name__)
+    cache = ResultCache({"images": 5})
+    release, done = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {"images": []}, 200
+
+    with app.app_context():
+        cache.refresh(("images",), fetch)
+        cache.refresh(("images",), fetch)
+    release.set()
+    while cache._refreshing:
+        done.wait(0.001)
+    assert calls == [1]
+    assert cache.get(("images",))[:2] == ({"images": []}, 200)
+    assert cache.stats["refreshes"] == 1
+
+def test_failed_refresh_keeps_the_old_entry():
+    app = Flask(__name__)
+    cache = ResultCache({"images": 5})
+    cache.put(("images",), {"images": ["old"]}, 200, 0)
+    with app.app_context():
+        cache.refresh(("images",), lambda: ({"error": "down"}, 500))
+    while cache._refreshing:
+        threading.Event().wait(0.001)
+    assert cache.get(("images",))[0] == {"images": ["old"]}
+    assert cache.stats["refresh_failures"] == 1
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(result_cache, '_cache', None)
+    app = Flask(__name__)
+    app.config.update(CACHE_TTLS='containers=2', CACHE_STALE_WHILE_REVALIDATE=5, CACHE_MAX_STALE=60, COALESCE_ENABLED=False)
+    return app
+
+def serve(app, key, fetch, headers=None):
+    from flask import g
+    from utils.docker_backend import shared_read
+    with app.test_request_context(headers=headers):
+        response, status = shared_read(key, fetch)
+        return response, status, g.get('cache_status', (None, None))[0]
+
+def test_shared_read_serves_fresh_then_stale_entries(app, clock):
+    fetched = []
+
+    def fetch():
+        fetched.append(1)
+        return {"success": True, "rows": len(fetched)}, 200
+
+    key = ("containers", False)
+    assert serve(app, key, fetch) == ({"success": True, "rows": 1}, 200, 'miss')
+    clock[0] += 1
+    assert serve(app, key, fetch) == ({"success": True, "rows": 1}, 200, 'hit')
+    clock[0] += 3
+    assert serve(app, key, fetch) == ({"success": True, "rows": 1}, 200, 'stale')
+    cache = result_cache._cache
+    while cache._refreshing:
+        threading.Event().wait(0.001)
+    assert serve(app, key, fetch) == ({"success": True, "rows": 2}, 200, 'hit')
+    assert serve(app, key, fetch, {"Cache-Control": "no-cache"}) == ({"success": True, "rows": 3}, 200, 'bypass')
+    assert cache.snapshot()["hits"] == 2 and cache.snapshot()["stale_hits"] == 1
+
+def test_shared_read_falls_back_to_stale_entries_on_errors(app, clock):
+    key = ("containers", False)
+    serve(app, key, lambda: ({"success": True}, 200))
+    clock[0] += 30
+    assert serve(app, key, lambda: ({"success": False, "error": "down"}, 500)) == ({"success": True}, 200, 'stale-if-error')
+    clock[0] += 60
+    assert serve(app, key, lambda: ({"success": False, "error": "down"}, 500)) == ({"success": False, "error": "down"}, 500, 'miss')
@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+from flask import Flask
+
+from utils.singleflight import SingleFlight, read_command_key
+
+@pytest.mark.parametrize("command", [
+    "docker ps -a --format '{{json .}}'",
+    ["docker", "inspect", "web"],
+    "docker image ls",
+    "docker system df",
+    "docker stats --no-stream",
+    "docker logs --tail 10 web"
+])
+def test_read_command_key_accepts_reads(command):
+    assert read_command_key(command) is not None
+
+@pytest.mark.parametrize("command", [
+    "docker rm web",
+    "docker image rm nginx",
+    "docker stats",
+    "docker logs -f web",
+    "docker logs --follow web",
+    "podman ps",
+    "docker",
+    "docker ps 'unterminated"
+])
+def test_read_command_key_rejects_everything_else(command):
+    assert read_command_key(command) is None
+
+def test_read_command_key_normalizes_strings_and_lists():
+    assert read_command_key("docker  ps   -a") == read_command_key(["docker", "ps", "-a"]) == ("docker", "ps", "-a")
+
+def run_concurrently(flights, key, fn, callers):
+    results = [None] * callers
+    errors = [None] * callers
+
+    def call(i):
+        try:
+            results[i] = flights.do(key, fn)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return {"n": len(calls)}
+
+    threads, results, errors = run_concurrently(flights, "key", fn, 5)
+    while flights.stats["collapsed"] < 4:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == [{"n": 1}] * 5
+    assert errors == [None] * 5
+    assert flights.stats["executions"] == 1
+    assert flights.snapshot()["in_flight"] == 0
+
+def test_waiters_get_the_leaders_exception():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise RuntimeError("daemon down")
+
+    threads, results, errors = run_concurrently(flights, "key", fn, 3)
+    while flights.stats["collapsed"] < 2:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert [str(e) for e in errors] == ["daemon down"] * 3
+    assert flights.stats["errors"] == 1
+
+def test_nothing_is_kept_after_a_flight_lands():
+    flights = SingleFlight()
+    assert flights.do("key", lambda: 1) == 1
+    assert flights.do("key", lambda: 2) == 2
+    assert flights.stats["executions"] == 2
+    assert flights.stats["collapsed"] == 0
+
+def test_shared_flights_across_workers(tmp_path):
+    flights = SingleFlight(str(tmp_path))
+    with Flask(__name__).app_context():
+        assert flights.do("key", lambda: {"output": "x"}, shared=True) == {"output": "x"}
+        # A result from before this call arrived is not reused
+        assert flights.do("key", lambda: {"output": "y"}, shared=True) == {"output": "y"}
+    assert flights.stats["executions"] == 2
+    assert flights.snapshot()["across_workers"] is True
+
+def test_a_second_worker_takes_the_leaders_result(tmp_path):
+    app = Flask(__name__)
+    leader, follower = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    running, release = threading.Event(), threading.Event()
+    results = {}
+
+    def fn():
+        running.set()
+        release.wait(5)
+        return {"output": "from the leader"}
+
+    def call(name, flights, fn):
+        with app.app_context():
+            results[name] = flights.do(("docker", "ps"), fn, shared=True)
+
+    first = threading.Thread(target=call, args=("leader", leader, fn))
+    first.start()
+    running.wait(5)
+    second = threading.Thread(target=call, args=("follower", follower, lambda: {"output": "from the follower"}))
+    second.start()
+    # Give the follower time to find the lock taken and queue on it
+    second.join(0.1)
+    release.set()
+    first.join()
+    second.join()
+    assert results == {"leader": {"output": "from the leader"}, "follower": {"output": "from the leader"}}
+    assert follower.stats["collapsed_across_workers"] == 1
+    assert follower.stats["executions"] == 0